@@ -0,0 +1,299 @@
+#!/usr/bin/python
+import datetime
+import numpy as np
+from os.path import splitext
+from D4RColumnar import ColumnarData, BEGINNING_DATE
+from D4ROriginDestination import SliceOf, HOURLY, DAILY, COMPACT_LIMIT
+
+# counters of the activity tensor
+CALLS    = "Calls"
+USERS    = "Users"
+COUNTERS = [CALLS, USERS]
+
+# number of previous slices forming the baseline of a slice
+DEFAULT_WINDOWS = {DAILY: 28, HOURLY: 7 * 24}
+
+# absolute z-score from which a slice is an anomaly
+DEFAULT_THRESHOLD = 3.0
+
+# smallest standard deviation of a baseline, so that a quiet district does not flag single calls
+MIN_STD = 1.0
+
+"""
+Rolling window z-scores along the last axis
+Every slice is compared with the mean and the standard deviation of the window slices before it,
+the sums come from cumulative sums so the cost does not depend on the window.
+Returns (means, zScores), slices with less than window slices of history get nan.
+series => Numpy array of counts, time on the last axis
+window => Number of previous slices of the baseline
+"""
+def RollingZScores(series, window):
+    series  = np.asarray(series, dtype=np.int64)
+    length  = series.shape[-1]
+    shape   = series.shape[:-1] + (1,)
+    sums    = np.concatenate((np.zeros(shape, dtype=np.int64), np.cumsum(series, axis=-1)), axis=-1)
+    squares = np.concatenate((np.zeros(shape, dtype=np.int64), np.cumsum(series * series, axis=-1)), axis=-1)
+    means   = np.full(series.shape, np.nan)
+    scores  = np.full(series.shape, np.nan)
+    if length <= window:
+        return means, scores
+
+    # baseline of slice t is [t - window, t)
+    total    = sums[..., window:length] - sums[..., :length - window]
+    totalSq  = squares[..., window:length] - squares[..., :length - window]
+    mean     = total / float(window)
+    std      = np.sqrt(np.maximum(totalSq / float(window) - mean * mean, 0.0))
+    means[..., window:]  = mean
+    scores[..., window:] = (series[..., window:] - mean) / np.maximum(std, MIN_STD)
+    return means, scores
+
+"""
+Exponentially weighted z-scores along the last axis
+The weighted mean and variance are updated one slice at a time for all series at once, every
+slice is compared with the state before it.
+Returns (means, zScores), the first warmUp slices get nan.
+series => Numpy array of counts, time on the last axis
+alpha  => Weight of the newest slice (between 0 and 1)
+warmUp => Number of slices before the first score
+"""
+def EwmaZScores(series, alpha, warmUp):
+    series   = np.asarray(series, dtype=np.float64)
+    means    = np.full(series.shape, np.nan)
+    scores   = np.full(series.shape, np.nan)
+    if series.shape[-1] == 0:
+        return means, scores
+    mean     = series[..., 0].copy()
+    variance = np.zeros(series.shape[:-1])
+    for t in range(1, series.shape[-1]):
+        if t >= warmUp:
+            means[..., t]  = mean
+            scores[..., t] = (series[..., t] - mean) / np.maximum(np.sqrt(variance), MIN_STD)
+        delta     = series[..., t] - mean
+        mean     += alpha * delta
+        variance  = (1.0 - alpha) * (variance + alpha * delta * delta)
+    return means, scores
+
+"""
+District x time activity of the refugees and the non refugees
+Calls and distinct users are counted per (slice, isRefugee, district) in a single grouped pass
+and kept as sorted sparse rows, the dense tensor is only built for the detection. Distinct users
+are counted per added batch, so the calls of a user must not be split over two batches.
+"""
+class ActivityTensor(object):
+    """
+    Constructor for the activity tensor
+    period => HOURLY or DAILY (any period of SliceOf)
+    """
+    def __init__(self, period = DAILY):
+        self.Period       = period
+        self.Slice        = np.zeros(0, dtype=np.int64)
+        self.IsRefugee    = np.zeros(0, dtype=np.int8)
+        self.District     = np.zeros(0, dtype=np.int64)
+        self.Calls        = np.zeros(0, dtype=np.int64)
+        self.Users        = np.zeros(0, dtype=np.int64)
+        self.Pending      = []
+        self.PendingCount = 0
+
+    """
+    Build the tensor of all users in a single pass over the columnar data
+    columnar => ColumnarData sorted by caller and time
+    period   => HOURLY or DAILY
+    """
+    @staticmethod
+    def Build(columnar, period = DAILY):
+        tensor = ActivityTensor(period)
+        tensor.AddColumnar(columnar)
+        tensor.Compact()
+        return tensor
+
+    """
+    Add the calls of complete users
+    columnar => ColumnarData sorted by caller and time
+    """
+    def AddColumnar(self, columnar):
+        if len(columnar) == 0:
+            return
+        slices, sliceCodes = np.unique(SliceOf(columnar.Minute, self.Period), return_inverse=True)
+        districts, codes   = np.unique(columnar.Location, return_inverse=True)
+        size  = 2 * len(districts) * len(slices)
+        cells = (sliceCodes * 2 + columnar.IsRefugee.astype(np.int64)) * len(districts) + codes
+
+        # every (user, slice, district) is counted once for the users
+        visits = np.unique(columnar.GetUserIndex() * size + cells) % size
+        calls  = np.bincount(cells, minlength=size)
+        users  = np.bincount(visits, minlength=size)
+        cells  = np.flatnonzero(calls)
+        self.Pending.append((slices[cells // (2 * len(districts))], ((cells // len(districts)) % 2).astype(np.int8),
+                             districts[cells % len(districts)].astype(np.int64), calls[cells], users[cells]))
+        self.PendingCount += len(cells)
+        if self.PendingCount > COMPACT_LIMIT:
+            self.Compact()
+
+    """
+    Add a chunk of records of complete users
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def AddRecords(self, records):
+        self.AddColumnar(ColumnarData(records, True))
+
+    """
+    Merge the pending rows into the sorted rows
+    """
+    def Compact(self):
+        if len(self.Pending) == 0:
+            return
+        columns = [self.Slice, self.IsRefugee, self.District, self.Calls, self.Users]
+        for i in range(len(columns)):
+            columns[i] = np.concatenate([columns[i]] + [pending[i] for pending in self.Pending])
+        self.Pending      = []
+        self.PendingCount = 0
+        self.SetRows(*columns)
+
+    """
+    Sort the given rows and sum the counts of the identical keys
+    """
+    def SetRows(self, slices, isRefugee, district, calls, users):
+        order = np.lexsort((district, isRefugee, slices))
+        slices, isRefugee, district, calls, users = slices[order], isRefugee[order], district[order], calls[order], users[order]
+        if len(order) > 0:
+            new = np.ones(len(order), dtype=bool)
+            new[1:] = (slices[1:] != slices[:-1]) | (isRefugee[1:] != isRefugee[:-1]) | (district[1:] != district[:-1])
+            starts = np.flatnonzero(new)
+            slices, isRefugee, district = slices[starts], isRefugee[starts], district[starts]
+            calls, users = np.add.reduceat(calls, starts), np.add.reduceat(users, starts)
+        self.Slice, self.IsRefugee, self.District, self.Calls, self.Users = slices, isRefugee, district, calls, users
+
+    """
+    Merge the tensor of another set of users (e.g. a previous month) into this one
+    other => ActivityTensor with the same period
+    """
+    def Merge(self, other):
+        other.Compact()
+        self.Pending.append((other.Slice, other.IsRefugee, other.District, other.Calls, other.Users))
+        self.PendingCount += len(other.Slice)
+        self.Compact()
+
+    """
+    Dense tensor of a counter
+    Returns (districts, slices, tensor) where tensor[isRefugee, district, slice] holds the counts,
+    slices cover the whole range between the first and the last active slice
+    counter => CALLS or USERS
+    """
+    def GetTensor(self, counter):
+        self.Compact()
+        districts = np.unique(self.District)
+        if len(self.Slice) == 0:
+            return districts, np.zeros(0, dtype=np.int64), np.zeros((2, 0, 0), dtype=np.int64)
+        first  = self.Slice[0]
+        slices = np.arange(first, self.Slice[-1] + 1)
+        tensor = np.zeros((2, len(districts), len(slices)), dtype=np.int64)
+        tensor[self.IsRefugee, np.searchsorted(districts, self.District), self.Slice - first] = self.Calls if counter == CALLS else self.Users
+        return districts, slices, tensor
+
+    """
+    Start time of a slice
+    index => Slice index of the period
+    """
+    def GetSliceTime(self, index):
+        if self.Period == HOURLY:
+            return BEGINNING_DATE + datetime.timedelta(hours=int(index))
+        elif self.Period == DAILY:
+            return (BEGINNING_DATE + datetime.timedelta(days=int(index))).date()
+        return index
+
+    """
+    Write the tensor in compressed binary format
+    fileName => Full Path of the output file (.npz)
+    """
+    def WriteBinary(self, fileName):
+        self.Compact()
+        np.savez_compressed(fileName, Slice=self.Slice, IsRefugee=self.IsRefugee, District=self.District,
+                            Calls=self.Calls, Users=self.Users, Period=np.array(self.Period))
+
+    """
+    Read a tensor written by WriteBinary
+    fileName => Full Path of the input file (.npz)
+    """
+    @staticmethod
+    def ReadBinary(fileName):
+        with np.load(fileName) as data:
+            tensor = ActivityTensor(str(data['Period']))
+            tensor.SetRows(data['Slice'], data['IsRefugee'], data['District'], data['Calls'], data['Users'])
+        return tensor
+
+"""
+Anomalies of the district activity
+Every (isRefugee, district) series of calls and distinct users is scored with a rolling window
+z-score and an exponentially weighted z-score, a slice is flagged if either of them departs
+from the baseline by at least the threshold.
+"""
+class ActivityAnomalies(object):
+    """
+    Constructor for the anomaly detection
+    period    => HOURLY or DAILY
+    window    => Number of previous slices of the baseline (if left blank the default of the period)
+    threshold => Absolute z-score from which a slice is an anomaly
+    """
+    def __init__(self, period = DAILY, window = None, threshold = DEFAULT_THRESHOLD):
+        self.Tensor    = ActivityTensor(period)
+        self.Window    = DEFAULT_WINDOWS.get(period, 28) if window is None else window
+        self.Threshold = threshold
+
+    """
+    Add a chunk of records of complete users
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def AddRecords(self, records):
+        self.Tensor.AddRecords(records)
+
+    """
+    Merge the activity of another set of users into this one
+    other => ActivityAnomalies with the same period
+    """
+    def Merge(self, other):
+        self.Tensor.Merge(other.Tensor)
+
+    """
+    Flagged slices of a counter as a list of (slice, isRefugee, district, count, mean, zScore, ewmaMean, ewmaZScore)
+    counter => CALLS or USERS
+    """
+    def Detect(self, counter):
+        districts, slices, tensor = self.Tensor.GetTensor(counter)
+        means, scores         = RollingZScores(tensor, self.Window)
+        ewmaMeans, ewmaScores = EwmaZScores(tensor, 2.0 / (self.Window + 1.0), self.Window)
+        with np.errstate(invalid='ignore'):
+            flagged = (np.abs(scores) >= self.Threshold) | (np.abs(ewmaScores) >= self.Threshold)
+        isRefugee, district, position = np.nonzero(flagged)
+        order = np.lexsort((district, isRefugee, position))
+        cells = (isRefugee[order], district[order], position[order])
+        return list(zip(slices[cells[2]].tolist(), cells[0].tolist(), districts[cells[1]].tolist(), tensor[cells].tolist(),
+                        means[cells].tolist(), scores[cells].tolist(), ewmaMeans[cells].tolist(), ewmaScores[cells].tolist()))
+
+    """
+    Write the anomalies of all counters in csv format (one row per flagged slice)
+    fileName => Full Path of the output file
+    """
+    def WriteCsv(self, fileName):
+        with open(fileName, "w+") as f:
+            f.write(str(self.Tensor.Period) + ";IsRefugee;District;Counter;Count;Mean;ZScore;EwmaMean;EwmaZScore\n")
+            for counter in COUNTERS:
+                for index, isRefugee, district, count, mean, score, ewmaMean, ewmaScore in self.Detect(counter):
+                    f.write(str(self.Tensor.GetSliceTime(index)) + ";" + str(isRefugee) + ";" + str(district) + ";" + counter + ";" + str(count) + ";" +
+                            "%.3f;%.3f;%.3f;%.3f\n" % (mean, score, ewmaMean, ewmaScore))
+
+    """
+    Full Path of the activity tensor written next to an anomalies file ("Activity.npz" replaces the extension)
+    fileName => Full Path of the anomalies file
+    """
+    @staticmethod
+    def GetTensorFile(fileName):
+        return splitext(fileName)[0] + "Activity.npz"
+
+    """
+    Write the anomalies to a file (csv) and the activity tensor next to it (see GetTensorFile), so the
+    activity can be rolled up to other levels later without parsing the data again
+    fileName => Full Path of the output file
+    """
+    def Write(self, fileName):
+        self.WriteCsv(fileName)
+        self.Tensor.WriteBinary(ActivityAnomalies.GetTensorFile(fileName))
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+import numpy as np
+from D4ROriginDestination import OriginDestinationMatrix
+
+# probability that a random walk continues to the next district
+DEFAULT_DAMPING = 0.85
+
+# power iterations stop once the change of the vector falls below this (L1 norm)
+DEFAULT_TOLERANCE = 1e-10
+MAX_ITERATIONS    = 1000
+
+"""
+Weighted directed district graph stored sparsely as (origin, destination, weight) edges
+Districts are kept sorted and edges refer to them by position, a vector times the row normalized
+transition matrix is a single bincount over the edges, so a power iteration step costs O(edges).
+"""
+class SparseGraph(object):
+    """
+    Constructor for the sparse graph
+    districts   => Sorted numpy array of district ids
+    origin      => Numpy array of edge origins (positions in districts)
+    destination => Numpy array of edge destinations (positions in districts)
+    weight      => Numpy array of edge weights (e.g. transition counts)
+    """
+    def __init__(self, districts, origin, destination, weight):
+        self.Districts   = np.asarray(districts, dtype=np.int64)
+        self.Origin      = np.asarray(origin, dtype=np.int64)
+        self.Destination = np.asarray(destination, dtype=np.int64)
+        self.Weight      = np.asarray(weight, dtype=np.float64)
+        self.OutStrength = np.bincount(self.Origin, weights=self.Weight, minlength=len(self.Districts))
+        self.InStrength  = np.bincount(self.Destination, weights=self.Weight, minlength=len(self.Districts))
+
+        # transition probability of every edge
+        self.Probability = self.Weight / np.where(self.OutStrength > 0, self.OutStrength, 1.0)[self.Origin]
+
+    """
+    Graph of a population of an origin destination matrix, all time slices are summed up
+    matrix    => OriginDestinationMatrix
+    isRefugee => Population (boolean) or None for all users
+    districts => Sorted numpy array of district ids (if left blank the districts of the matrix)
+    """
+    @staticmethod
+    def FromOriginDestination(matrix, isRefugee = None, districts = None):
+        matrix.Compact()
+        if districts is None:
+            districts = matrix.GetDistricts()
+        selected = np.ones(len(matrix.Count), dtype=bool) if isRefugee is None else matrix.IsRefugee == int(isRefugee)
+        origin      = np.searchsorted(districts, matrix.Origin[selected])
+        destination = np.searchsorted(districts, matrix.Destination[selected])
+
+        # time slices of the same edge are summed
+        size  = max(1, len(districts))
+        edges, weight = np.unique(origin * size + destination, return_inverse=True)
+        weight = np.bincount(weight, weights=matrix.Count[selected], minlength=len(edges))
+        return SparseGraph(districts, edges // size, edges % size, weight)
+
+    def __len__(self):
+        return len(self.Districts)
+
+    """
+    Vector times the transition matrix (probability mass moved one step along the edges)
+    vector => Numpy array with a value per district
+    """
+    def Step(self, vector):
+        return np.bincount(self.Destination, weights=vector[self.Origin] * self.Probability, minlength=len(self.Districts))
+
+    """
+    PageRank of the districts by power iteration
+    The mass of districts without outgoing transitions is spread uniformly.
+    damping   => Probability that the walk follows a transition instead of jumping
+    tolerance => Change of the ranks (L1 norm) below which the iteration stops
+    """
+    def PageRank(self, damping = DEFAULT_DAMPING, tolerance = DEFAULT_TOLERANCE):
+        n = len(self.Districts)
+        if n == 0:
+            return np.zeros(0)
+        dangling = self.OutStrength == 0
+        rank     = np.full(n, 1.0 / n)
+        for iteration in range(MAX_ITERATIONS):
+            previous = rank
+            rank = damping * self.Step(rank) + (damping * rank[dangling].sum() + 1.0 - damping) / n
+            if np.abs(rank - previous).sum() < tolerance:
+                break
+        return rank
+
+    """
+    Random walk betweenness of the districts
+    Walks start at a district in proportion to its out strength and follow a transition with the
+    damping probability at every step. A district scores the expected number of times a walk passes
+    through it, that is arrives at it and moves on, so sources and sinks of the flows score low and
+    districts bridging them score high. The geometric series is summed by power iteration and
+    normalized to one.
+    damping   => Probability that the walk follows another transition
+    tolerance => Remaining passing mass below which the series is cut
+    """
+    def Betweenness(self, damping = DEFAULT_DAMPING, tolerance = DEFAULT_TOLERANCE):
+        n = len(self.Districts)
+        if n == 0 or self.OutStrength.sum() == 0:
+            return np.zeros(n)
+        canLeave = (self.OutStrength > 0).astype(np.float64)
+        visits   = self.OutStrength / self.OutStrength.sum()
+        through  = np.zeros(n)
+        for iteration in range(MAX_ITERATIONS):
+            visits   = damping * self.Step(visits)
+            passing  = damping * visits * canLeave
+            through += passing
+            if passing.sum() < tolerance:
+                break
+        return through / through.sum() if through.sum() > 0 else through
+
+"""
+Centrality of the districts in the aggregate transition graph of the refugees and the non refugees
+The transitions are collected in an origin destination matrix without time slicing and the graphs
+are only built when the centrality is written.
+"""
+class DistrictCentrality(object):
+    """
+    Constructor for the district centrality
+    damping => Probability that the walks follow a transition
+    """
+    def __init__(self, damping = DEFAULT_DAMPING):
+        self.Damping = damping
+        self.Matrix  = OriginDestinationMatrix()
+
+    """
+    Add a chunk of records grouped by caller and ordered by time
+    records => Numpy array of RECORD_TYPE
+    """
+    def AddRecords(self, records):
+        self.Matrix.AddRecords(records)
+
+    """
+    Merge the transitions of another set of users into this one
+    other => DistrictCentrality
+    """
+    def Merge(self, other):
+        self.Matrix.Merge(other.Matrix)
+
+    """
+    Centrality of every district of a population
+    Returns (districts, {measure: numpy array}) with the measures InStrength, OutStrength, PageRank
+    and Betweenness
+    isRefugee => Population (boolean)
+    """
+    def GetCentrality(self, isRefugee):
+        self.Matrix.Compact()
+        graph = SparseGraph.FromOriginDestination(self.Matrix, isRefugee, self.Matrix.GetDistricts())
+        return graph.Districts, {"InStrength":  graph.InStrength,
+                                 "OutStrength": graph.OutStrength,
+                                 "PageRank":    graph.PageRank(self.Damping),
+                                 "Betweenness": graph.Betweenness(self.Damping)}
+
+    """
+    Write the centrality in csv format (one row per population and district)
+    fileName => Full Path of the output file
+    """
+    def Write(self, fileName):
+        with open(fileName, "w+") as f:
+            f.write("IsRefugee;District;InStrength;OutStrength;PageRank;Betweenness\n")
+            for isRefugee in (False, True):
+                districts, measures = self.GetCentrality(isRefugee)
+                for i, district in enumerate(districts.tolist()):
+                    f.write(str(int(isRefugee)) + ";" + str(district) + ";%d;%d;%.8f;%.8f\n" %
+                            (measures["InStrength"][i], measures["OutStrength"][i], measures["PageRank"][i], measures["Betweenness"][i]))
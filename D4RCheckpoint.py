@@ -0,0 +1,177 @@
+#!/usr/bin/python
+import os
+import numpy as np
+from os.path import join, abspath, getsize, getmtime
+
+# manifest of a checkpoint folder, it is replaced atomically and only lists complete files
+MANIFEST_FILE = "Checkpoint.npz"
+
+# prefix of the files holding the parsed data of a single input file
+FILE_PREFIX = "File"
+
+# extension of all checkpoint files
+EXTENSION = ".npz"
+
+"""
+Write numpy arrays to a npz file atomically, a crash while writing leaves the previous file intact
+fileName => Full Path of the file
+arrays   => Dict of name => numpy array
+"""
+def WriteArrays(fileName, arrays):
+    temporary = fileName + ".tmp"
+    with open(temporary, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temporary, fileName)
+
+"""
+Read all arrays of a npz file written by WriteArrays
+fileName => Full Path of the file
+"""
+def ReadArrays(fileName):
+    with np.load(fileName) as data:
+        return dict((name, data[name]) for name in data.files)
+
+"""
+Checkpoints of a long run that is resumed after a crash
+The parsed data of every completed input file is written to its own file as soon as the file is
+done, and the state after a major phase (e.g. the columnar data or the running statistics) is
+written under the name of the phase. Files are plain (uncompressed) npz so that writing a
+checkpoint costs about as much as copying its arrays. The manifest lists the completed input
+files with their size and modification time and is replaced last, so a checkpoint either exists
+completely or not at all. Checkpoints of other settings or of input files that have changed
+since are dropped, phases are only kept while every input file is completed.
+"""
+class Checkpoint(object):
+    """
+    Constructor for the checkpoints, the checkpoints of a previous run in the folder are taken over
+    if they are still valid
+    folder   => Folder of the checkpoints (created if it does not exist)
+    files    => List of Full Paths of the input files of the run
+    settings => Text describing the settings the checkpoints depend on
+    """
+    def __init__(self, folder, files, settings = ""):
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.Folder   = folder
+        self.Settings = settings
+        self.Files    = []
+        self.Phases   = []
+        if os.path.isfile(join(folder, MANIFEST_FILE)):
+            self.Load(files)
+
+    """
+    Take over the manifest of a previous run, invalid checkpoints are removed
+    files => List of Full Paths of the input files of the run
+    """
+    def Load(self, files):
+        manifest  = ReadArrays(join(self.Folder, MANIFEST_FILE))
+        current   = dict(Checkpoint.GetFileKey(fileName) for fileName in files)
+        completed = list(zip(manifest['Files'].tolist(), manifest['Sizes'].tolist(), manifest['Times'].tolist()))
+        self.Files  = [name for name, size, time in completed]
+        self.Phases = manifest['Phases'].tolist()
+        if str(manifest['Settings']) != self.Settings or any(current.get(name) != (size, time) for name, size, time in completed):
+            print("Checkpoints in ", self.Folder, " do not match the run and are dropped")
+            self.Remove()
+            return
+        # phases only hold the data of all input files
+        if len(self.Phases) > 0 and len(self.Files) < len(current):
+            self.RemovePhases()
+
+    """
+    Identity of an input file as (absolute path, (size, modification time))
+    fileName => Full Path of the input file
+    """
+    @staticmethod
+    def GetFileKey(fileName):
+        return abspath(fileName), (int(getsize(fileName)), int(getmtime(fileName) * 1e6))
+
+    """
+    Replace the manifest with the current state
+    """
+    def Save(self):
+        keys = [Checkpoint.GetFileKey(name)[1] for name in self.Files]
+        WriteArrays(join(self.Folder, MANIFEST_FILE), {
+            "Settings" : np.array(self.Settings),
+            "Files"    : np.array(self.Files, dtype=str),
+            "Sizes"    : np.array([size for size, time in keys], dtype=np.int64),
+            "Times"    : np.array([time for size, time in keys], dtype=np.int64),
+            "Phases"   : np.array(self.Phases, dtype=str)})
+
+    """
+    Shows whether the data of the input file is already in the checkpoints
+    fileName => Full Path of the input file
+    """
+    def IsCompleted(self, fileName):
+        return abspath(fileName) in self.Files
+
+    """
+    Store the data of a completed input file, phases written before are dropped
+    fileName => Full Path of the input file
+    arrays   => Dict of name => numpy array (e.g. the parsed records)
+    """
+    def AddFile(self, fileName, arrays):
+        self.RemovePhases()
+        WriteArrays(join(self.Folder, FILE_PREFIX + str(len(self.Files)) + EXTENSION), arrays)
+        self.Files.append(abspath(fileName))
+        self.Save()
+
+    """
+    Data of the completed input files in the order they were added
+    Yields (fileName, arrays) one file at a time
+    """
+    def IterateFiles(self):
+        for i, fileName in enumerate(self.Files):
+            yield fileName, ReadArrays(join(self.Folder, FILE_PREFIX + str(i) + EXTENSION))
+
+    """
+    Store the state after a phase
+    name   => Name of the phase
+    arrays => Dict of name => numpy array
+    """
+    def SavePhase(self, name, arrays):
+        WriteArrays(join(self.Folder, name + EXTENSION), arrays)
+        if name not in self.Phases:
+            self.Phases.append(name)
+        self.Save()
+
+    """
+    State stored after a phase (None if the phase was not completed)
+    name => Name of the phase
+    """
+    def GetPhase(self, name):
+        if name not in self.Phases:
+            return None
+        return ReadArrays(join(self.Folder, name + EXTENSION))
+
+    """
+    Drop the states of all phases
+    """
+    def RemovePhases(self):
+        if len(self.Phases) == 0:
+            return
+        phases, self.Phases = self.Phases, []
+        self.Save()
+        for name in phases:
+            self.RemoveFile(name + EXTENSION)
+
+    """
+    Remove all checkpoints (e.g. once the run is complete)
+    Only the files listed in the manifest are removed, anything else in the folder is kept
+    """
+    def Remove(self):
+        self.RemoveFile(MANIFEST_FILE)
+        for i in range(len(self.Files)):
+            self.RemoveFile(FILE_PREFIX + str(i) + EXTENSION)
+        for name in self.Phases:
+            self.RemoveFile(name + EXTENSION)
+        self.Files  = []
+        self.Phases = []
+
+    """
+    Remove a checkpoint file and its temporary copy if they exist
+    fileName => Name of the file in the checkpoint folder
+    """
+    def RemoveFile(self, fileName):
+        for path in [join(self.Folder, fileName), join(self.Folder, fileName + ".tmp")]:
+            if os.path.isfile(path):
+                os.remove(path)
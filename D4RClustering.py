@@ -0,0 +1,277 @@
+#!/usr/bin/python
+import numpy as np
+from os.path import splitext
+from D4RColumnar import ColumnarData
+from D4RRanking import UserCounters, CALLS, TRANSITIONS, ACTIVE_DAYS, DISTRICTS
+
+# columns of the user feature matrix
+HOUR_FEATURES  = ["Hour" + str(hour) for hour in range(24)]
+FEATURE_NAMES  = HOUR_FEATURES + ["CallsPerDay", "TransitionRate", "Districts", "DistancePerDay"]
+FEATURE_TYPE   = np.float32
+
+# heavy tailed features are clustered on a log scale
+LOG_FEATURES = ["CallsPerDay", "Districts", "DistancePerDay"]
+
+# defaults of the clustering
+DEFAULT_CLUSTERS   = 8
+DEFAULT_BATCH_SIZE = 4096
+DEFAULT_ITERATIONS = 200
+DEFAULT_TOLERANCE  = 1e-4
+DEFAULT_SEED       = 0
+
+# number of calls collected before the features of the users are calculated
+FEATURE_BATCH_SIZE = 1024 * 1024
+
+"""
+Feature matrix of the users of the columnar data
+Returns (users, features) where features is a float32 array with a row per user (in the order of
+GetUsers) and the columns of FEATURE_NAMES: the share of the calls in every hour of the day, calls
+per active day, share of the consecutive calls changing district, distinct districts and the
+travelled distance per active day.
+columnar  => ColumnarData sorted by caller and time
+distances => DistanceMatrix of the districts, unknown distances count as zero (optional)
+"""
+def UserFeatures(columnar, distances = None):
+    users, counters = UserCounters(columnar)
+    userIndex = columnar.GetUserIndex()
+    calls     = counters[CALLS].astype(np.float64)
+    days      = np.maximum(counters[ACTIVE_DAYS], 1).astype(np.float64)
+
+    features = np.zeros((len(users), len(FEATURE_NAMES)), dtype=FEATURE_TYPE)
+    hourly   = np.bincount(userIndex * 24 + columnar.GetHours(), minlength=len(users) * 24).reshape(len(users), 24)
+    features[:, :24] = hourly / np.maximum(calls, 1.0)[:, None]
+    features[:, 24]  = calls / days
+    features[:, 25]  = counters[TRANSITIONS] / np.maximum(calls - 1.0, 1.0)
+    features[:, 26]  = counters[DISTRICTS]
+    if distances is not None and len(columnar) > 1:
+        same      = columnar.GetTransitionMask()
+        location  = columnar.Location
+        travelled = np.nan_to_num(distances.Lookup(location[:-1][same], location[1:][same]))
+        features[:, 27] = np.bincount(userIndex[1:][same], weights=travelled, minlength=len(users)) / days
+    return users, features
+
+"""
+Scaling of the feature columns to zero mean and unit variance, log scaled columns first
+"""
+class FeatureScaler(object):
+    """
+    Constructor for the scaler
+    features => Feature matrix the means and deviations are taken from
+    logMask  => Boolean numpy array of the columns that are log scaled
+    """
+    def __init__(self, features, logMask):
+        self.LogMask = np.asarray(logMask, dtype=bool)
+        values       = self.Log(features)
+        self.Mean    = values.mean(axis=0) if len(values) > 0 else np.zeros(values.shape[1])
+        self.Std     = values.std(axis=0) if len(values) > 0 else np.ones(values.shape[1])
+        self.Std[self.Std == 0] = 1.0
+
+    """
+    Copy of a feature matrix with the log scaled columns replaced by log(1 + value)
+    features => Feature matrix
+    """
+    def Log(self, features):
+        values = np.array(features, dtype=np.float64)
+        values[:, self.LogMask] = np.log1p(np.maximum(values[:, self.LogMask], 0.0))
+        return values
+
+    """
+    Scaled copy of a feature matrix (float32)
+    features => Feature matrix
+    """
+    def Transform(self, features):
+        return ((self.Log(features) - self.Mean) / self.Std).astype(FEATURE_TYPE)
+
+    """
+    Feature values of scaled rows (e.g. centroids)
+    values => Scaled matrix
+    """
+    def Inverse(self, values):
+        features = np.asarray(values, dtype=np.float64) * self.Std + self.Mean
+        features[:, self.LogMask] = np.expm1(features[:, self.LogMask])
+        return features
+
+"""
+Mini batch k-means
+Every iteration assigns a random batch of rows to the nearest centroids and moves every centroid
+towards the mean of its rows with a step of (rows in the batch / rows seen so far), so the cost
+of an iteration only depends on the batch size. Centroids start with k-means++ on a sample.
+"""
+class MiniBatchKMeans(object):
+    """
+    Constructor for the clustering
+    numberOfClusters => Number of clusters (k)
+    batchSize        => Number of rows of every iteration
+    iterations       => Maximum number of iterations
+    tolerance        => Mean centroid movement (relative to the data spread) below which the iteration stops
+    seed             => Seed of the random batches
+    """
+    def __init__(self, numberOfClusters = DEFAULT_CLUSTERS, batchSize = DEFAULT_BATCH_SIZE, iterations = DEFAULT_ITERATIONS,
+                 tolerance = DEFAULT_TOLERANCE, seed = DEFAULT_SEED):
+        self.NumberOfClusters = numberOfClusters
+        self.BatchSize        = batchSize
+        self.Iterations       = iterations
+        self.Tolerance        = tolerance
+        self.Random           = np.random.default_rng(seed)
+        self.Centroids        = None
+        self.Counts           = None
+
+    """
+    Nearest centroid of every row and the squared distance to it
+    rows      => Numpy array of rows
+    centroids => Numpy array of centroids
+    """
+    @staticmethod
+    def Nearest(rows, centroids):
+        distances = (rows * rows).sum(axis=1)[:, None] - 2.0 * rows.dot(centroids.T) + (centroids * centroids).sum(axis=1)[None, :]
+        labels    = np.argmin(distances, axis=1)
+        return labels, np.maximum(distances[np.arange(len(rows)), labels], 0.0)
+
+    """
+    K-means++ seeding on a sample of the rows
+    rows => Numpy array of rows
+    """
+    def Initialize(self, rows):
+        sample    = rows[self.Random.choice(len(rows), min(len(rows), max(self.BatchSize, 10 * self.NumberOfClusters)), replace=False)]
+        centroids = [sample[self.Random.integers(len(sample))]]
+        closest   = ((sample - centroids[0]) ** 2).sum(axis=1)
+        for i in range(1, min(self.NumberOfClusters, len(sample))):
+            total = closest.sum()
+            index = self.Random.choice(len(sample), p=closest / total) if total > 0 else self.Random.integers(len(sample))
+            centroids.append(sample[index])
+            closest = np.minimum(closest, ((sample - sample[index]) ** 2).sum(axis=1))
+        return np.array(centroids, dtype=np.float64)
+
+    """
+    Fit the centroids to the rows
+    rows => Numpy array of (scaled) rows
+    """
+    def Fit(self, rows):
+        if len(rows) == 0:
+            self.Centroids = np.zeros((0, rows.shape[1]))
+            self.Counts    = np.zeros(0)
+            return self
+        self.Centroids = self.Initialize(rows)
+        self.Counts    = np.zeros(len(self.Centroids))
+        spread         = max(float(np.asarray(rows, dtype=np.float64).var(axis=0).sum()), 1e-12)
+        for iteration in range(self.Iterations):
+            batch  = np.asarray(rows[self.Random.integers(0, len(rows), min(self.BatchSize, len(rows)))], dtype=np.float64)
+            labels = MiniBatchKMeans.Nearest(batch, self.Centroids)[0]
+            counts = np.bincount(labels, minlength=len(self.Centroids)).astype(np.float64)
+            sums   = np.zeros(self.Centroids.shape)
+            np.add.at(sums, labels, batch)
+            self.Counts += counts
+            moved = counts > 0
+            step  = np.zeros(self.Centroids.shape)
+            step[moved] = (sums[moved] / counts[moved, None] - self.Centroids[moved]) * (counts[moved] / self.Counts[moved])[:, None]
+            self.Centroids += step
+            if (step * step).sum() / len(self.Centroids) < self.Tolerance * spread:
+                break
+        return self
+
+    """
+    Cluster of every row, assigned in chunks of the batch size to bound the memory
+    Returns (labels, inertia)
+    rows => Numpy array of (scaled) rows
+    """
+    def Predict(self, rows):
+        labels  = np.zeros(len(rows), dtype=np.int64)
+        inertia = 0.0
+        for begin in range(0, len(rows), self.BatchSize):
+            chunk = np.asarray(rows[begin:begin + self.BatchSize], dtype=np.float64)
+            labels[begin:begin + len(chunk)], distances = MiniBatchKMeans.Nearest(chunk, self.Centroids)
+            inertia += distances.sum()
+        return labels, inertia
+
+"""
+Clusters of the users by their mobility features
+Records of complete users are collected and turned into features in batches, the clustering
+runs on the scaled feature matrix when the clusters are written.
+"""
+class UserClusters(object):
+    """
+    Constructor for the user clusters
+    numberOfClusters => Number of clusters (k)
+    distances        => DistanceMatrix of the districts for the travelled distance (optional)
+    batchSize        => Number of calls collected before the features are calculated
+    """
+    def __init__(self, numberOfClusters = DEFAULT_CLUSTERS, distances = None, batchSize = FEATURE_BATCH_SIZE):
+        self.NumberOfClusters = numberOfClusters
+        self.Distances        = distances
+        self.BatchSize        = batchSize
+        self.Users            = []
+        self.Features         = []
+        self.Pending          = []
+        self.PendingCount     = 0
+        self.Labels           = None
+        self.Model            = None
+        self.Scaler           = None
+
+    """
+    Add a chunk of records of complete users
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def AddRecords(self, records):
+        self.Pending.append(records)
+        self.PendingCount += len(records)
+        if self.PendingCount > self.BatchSize:
+            self.Compact()
+
+    """
+    Calculate the features of the pending users
+    """
+    def Compact(self):
+        if len(self.Pending) == 0:
+            return
+        users, features = UserFeatures(ColumnarData.FromChunks(self.Pending, True), self.Distances)
+        self.Users.append(users)
+        self.Features.append(features)
+        self.Pending      = []
+        self.PendingCount = 0
+
+    """
+    Merge the users of another set into this one
+    other => UserClusters
+    """
+    def Merge(self, other):
+        other.Compact()
+        self.Users.extend(other.Users)
+        self.Features.extend(other.Features)
+
+    """
+    Caller ids and feature matrix of all users
+    """
+    def GetFeatures(self):
+        self.Compact()
+        if len(self.Features) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(FEATURE_NAMES)), dtype=FEATURE_TYPE)
+        self.Users    = [np.concatenate(self.Users)]
+        self.Features = [np.concatenate(self.Features)]
+        return self.Users[0], self.Features[0]
+
+    """
+    Cluster the users
+    Returns (users, labels)
+    """
+    def Fit(self):
+        users, features = self.GetFeatures()
+        self.Scaler = FeatureScaler(features, [name in LOG_FEATURES for name in FEATURE_NAMES])
+        scaled      = self.Scaler.Transform(features)
+        self.Model  = MiniBatchKMeans(self.NumberOfClusters).Fit(scaled)
+        self.Labels = self.Model.Predict(scaled)[0]
+        return users, self.Labels
+
+    """
+    Write the cluster of every user in csv format, the centroid profiles in feature units
+    are written next to it ("Centroids" is appended to the name)
+    fileName => Full Path of the output file
+    """
+    def Write(self, fileName):
+        users, labels = self.Fit()
+        np.savetxt(fileName, np.column_stack((users, labels)), fmt='%d', delimiter=';', comments='', header="Caller;Cluster")
+        name, extension = splitext(fileName)
+        centroids = self.Scaler.Inverse(self.Model.Centroids)
+        sizes     = np.bincount(labels, minlength=len(centroids))
+        rows      = np.column_stack((np.arange(len(centroids)), sizes, centroids))
+        np.savetxt(name + "Centroids" + extension, rows, fmt=['%d', '%d'] + ['%.6f'] * len(FEATURE_NAMES), delimiter=';', comments='',
+                   header="Cluster;Size;" + ";".join(FEATURE_NAMES))
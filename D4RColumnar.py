@@ -0,0 +1,129 @@
+#!/usr/bin/python
+import datetime
+import numpy as np
+from D4RExternalSort import RECORD_TYPE, SortRecords
+
+# beginning of the time axis, call times are stored as minutes passed since this date
+BEGINNING_DATE = datetime.datetime(2017, 1, 1, 0, 0)
+
+# related with time
+MINUTES_IN_AN_HOUR = 60
+MINUTES_IN_A_DAY   = 24 * 60
+
+"""
+Columnar storage of the whole data set
+All calls are kept in a single record array sorted by caller and call time so that
+per user computations become vectorized operations over user segments
+"""
+class ColumnarData(object):
+    """
+    Constructor for the columnar data
+    records  => Numpy array of RECORD_TYPE
+    isSorted => Shows whether the records are already sorted by caller and time (boolean)
+    """
+    def __init__(self, records, isSorted = False):
+        self.Records    = records if isSorted else SortRecords(records)
+        self.UserStarts = None
+
+    """
+    Create the columnar data from record chunks
+    chunks   => Iterable of numpy arrays of RECORD_TYPE
+    isSorted => Shows whether the chunks are already sorted by caller and time (boolean)
+    """
+    @staticmethod
+    def FromChunks(chunks, isSorted = False):
+        chunks = list(chunks)
+        if len(chunks) == 0:
+            return ColumnarData(np.empty(0, dtype=RECORD_TYPE), True)
+        return ColumnarData(np.concatenate(chunks), isSorted)
+
+    def __len__(self):
+        return len(self.Records)
+
+    @property
+    def Caller(self):
+        return self.Records['Caller']
+
+    @property
+    def Minute(self):
+        return self.Records['Minute']
+
+    @property
+    def Location(self):
+        return self.Records['Location']
+
+    @property
+    def IsRefugee(self):
+        return self.Records['IsRefugee']
+
+    """
+    Indexes where the records of each user begin, followed by the number of records
+    The records of user i are Records[starts[i]:starts[i + 1]]
+    """
+    def GetUserStarts(self):
+        if self.UserStarts is None:
+            caller = self.Caller
+            self.UserStarts = np.concatenate(([0], np.flatnonzero(caller[1:] != caller[:-1]) + 1, [len(caller)])).astype(np.int64)
+            if len(caller) == 0:
+                self.UserStarts = np.zeros(1, dtype=np.int64)
+        return self.UserStarts
+
+    """
+    Caller id of every user (in the order of GetUserStarts)
+    """
+    def GetUsers(self):
+        return self.Caller[self.GetUserStarts()[:-1]]
+
+    """
+    Refugee flag of every user (in the order of GetUserStarts)
+    """
+    def GetUserIsRefugee(self):
+        return self.IsRefugee[self.GetUserStarts()[:-1]].astype(bool)
+
+    """
+    User index (position in GetUsers) of every record
+    """
+    def GetUserIndex(self):
+        starts = self.GetUserStarts()
+        return np.repeat(np.arange(len(starts) - 1), np.diff(starts))
+
+    """
+    Day index (days passed since the beginning date) of every record
+    """
+    def GetDays(self):
+        return self.Minute // MINUTES_IN_A_DAY
+
+    """
+    Hour of the day of every record
+    """
+    def GetHours(self):
+        return (self.Minute // MINUTES_IN_AN_HOUR) % 24
+
+    """
+    Month index (months passed since the beginning month, may span several years) of every record
+    """
+    def GetMonths(self):
+        return MinutesToMonths(self.Minute)
+
+    """
+    Mask of the consecutive record pairs (i, i + 1) that belong to the same user
+    """
+    def GetTransitionMask(self):
+        caller = self.Caller
+        return caller[1:] == caller[:-1]
+
+"""
+Month index (months passed since the beginning month) of the given minutes
+minutes => Numpy array of minutes passed since the beginning date
+"""
+def MinutesToMonths(minutes):
+    times  = np.datetime64(BEGINNING_DATE, 'm') + np.asarray(minutes).astype('timedelta64[m]')
+    months = times.astype('datetime64[M]').astype(np.int64)
+    return months - np.datetime64(BEGINNING_DATE, 'M').astype(np.int64)
+
+"""
+Calendar month (1 - 12) of the given month indexes
+months => Numpy array of month indexes (months passed since the beginning month)
+"""
+def MonthOfYear(months):
+    return (np.asarray(months) + BEGINNING_DATE.month - 1) % 12 + 1
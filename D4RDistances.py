@@ -0,0 +1,147 @@
+#!/usr/bin/python
+import os, hashlib
+import numpy as np
+from os.path import join, dirname, basename
+
+# version of the cached matrix format, part of the cache key
+CACHE_VERSION = 1
+
+# number of bytes hashed at once
+HASH_BLOCK_SIZE = 1024 * 1024
+
+"""
+Dense district to district distance matrix
+Districts are kept sorted so that ids are turned into rows and columns with a binary search,
+unknown distances are infinite.
+"""
+class DistanceMatrix(object):
+    """
+    Constructor for the distance matrix
+    districts => Sorted numpy array of district ids
+    matrix    => Numpy array (len(districts) x len(districts)) of distances, inf if unknown
+    """
+    def __init__(self, districts, matrix):
+        self.Districts = np.asarray(districts, dtype=np.int64)
+        self.Matrix    = np.asarray(matrix, dtype=np.float64)
+
+    """
+    Create the matrix from parsed distances
+    Distances are symmetric, if both directions are given the smaller one is used
+    distances => Dict of {id1: {id2: distance}}
+    """
+    @staticmethod
+    def FromDict(distances):
+        ids = set(distances.keys())
+        for row in distances.values():
+            ids.update(row.keys())
+        districts = np.array(sorted(ids), dtype=np.int64)
+        matrix    = np.full((len(districts), len(districts)), np.inf)
+        origins, destinations, values = [], [], []
+        for id1, row in distances.items():
+            for id2, distance in row.items():
+                origins.append(id1)
+                destinations.append(id2)
+                values.append(distance)
+        if len(values) > 0:
+            rows    = np.searchsorted(districts, origins)
+            columns = np.searchsorted(districts, destinations)
+            np.minimum.at(matrix, (rows, columns), values)
+            np.minimum.at(matrix, (columns, rows), values)
+        np.fill_diagonal(matrix, 0.0)
+        return DistanceMatrix(districts, matrix)
+
+    """
+    Complete the missing distances with the shortest paths over the known ones (Floyd Warshall)
+    Every step relaxes all pairs through one intermediate district at once.
+    Known distances are kept, only the missing ones are filled in.
+    """
+    def Complete(self):
+        known    = np.isfinite(self.Matrix)
+        shortest = self.Matrix.copy()
+        for k in range(len(self.Districts)):
+            np.minimum(shortest, shortest[:, k, None] + shortest[None, k, :], out=shortest)
+        self.Matrix = np.where(known, self.Matrix, shortest)
+        return self
+
+    """
+    Rows (columns) of the given district ids, -1 for unknown districts
+    ids => Numpy array of district ids
+    """
+    def GetIndexes(self, ids):
+        ids     = np.asarray(ids, dtype=np.int64)
+        indexes = np.minimum(np.searchsorted(self.Districts, ids), max(0, len(self.Districts) - 1))
+        if len(self.Districts) == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        return np.where(self.Districts[indexes] == ids, indexes, -1)
+
+    """
+    Distances of many district pairs at once, nan if the distance is unknown
+    origins      => Numpy array of district ids
+    destinations => Numpy array of district ids
+    """
+    def Lookup(self, origins, destinations):
+        rows      = self.GetIndexes(origins)
+        columns   = self.GetIndexes(destinations)
+        distances = np.full(rows.shape, np.nan)
+        valid     = (rows >= 0) & (columns >= 0)
+        distances[valid] = self.Matrix[rows[valid], columns[valid]]
+        distances[np.isinf(distances)] = np.nan
+        same = np.asarray(origins) == np.asarray(destinations)
+        distances[same] = 0.0
+        return distances
+
+    """
+    Distance between two districts, -1 if unknown (same convention as the parsed distances)
+    id1 => id of the first district
+    id2 => id of the second district
+    """
+    def Get(self, id1, id2):
+        distance = self.Lookup(np.array([id1]), np.array([id2]))[0]
+        return -1 if np.isnan(distance) else float(distance)
+
+    """
+    Write the matrix in compressed binary format
+    fileName => Full Path of the output file (.npz)
+    """
+    def Save(self, fileName):
+        np.savez_compressed(fileName, Districts=self.Districts, Matrix=self.Matrix)
+
+    """
+    Read a matrix written by Save
+    fileName => Full Path of the input file (.npz)
+    """
+    @staticmethod
+    def Load(fileName):
+        with np.load(fileName) as data:
+            return DistanceMatrix(data['Districts'], data['Matrix'])
+
+"""
+Hex digest (sha256) of the contents of a file
+fileName => Full Path of the file
+"""
+def FileHash(fileName):
+    digest = hashlib.sha256()
+    with open(fileName, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+"""
+Completed distance matrix of a distances file, cached on disk
+The cache file name carries the hash of the distances file, so an edited file is completed again
+and an unchanged one is loaded without the shortest path calculation.
+fileName    => Full Path of the distances file
+distances   => Parsed distances of the file {id1: {id2: distance}}
+cacheFolder => Folder of the cache files (if left blank the folder of the distances file)
+"""
+def LoadCompletedDistances(fileName, distances, cacheFolder = None):
+    if cacheFolder is None:
+        cacheFolder = dirname(os.path.abspath(fileName))
+    cacheFile = join(cacheFolder, basename(fileName) + "." + FileHash(fileName)[:16] + ".v" + str(CACHE_VERSION) + ".npz")
+    if os.path.isfile(cacheFile):
+        return DistanceMatrix.Load(cacheFile)
+    matrix = DistanceMatrix.FromDict(distances).Complete()
+    if not os.path.isdir(cacheFolder):
+        os.makedirs(cacheFolder)
+    matrix.Save(cacheFile)
+    return matrix
@@ -0,0 +1,228 @@
+#!/usr/bin/python
+import numpy as np
+from os.path import splitext
+from D4RColumnar import ColumnarData
+
+# measured time distributions
+GAP   = "InterCallGap"
+DWELL = "DwellTime"
+MEASURES = [GAP, DWELL]
+
+# histogram resolution, every doubling of the time is split into this many bins
+DEFAULT_BINS_PER_OCTAVE = 4
+
+# quantiles of the summary
+SUMMARY_QUANTILES = [0.5, 0.9, 0.99]
+
+# number of calls collected before the times of the users are calculated
+TIME_BATCH_SIZE = 1024 * 1024
+
+"""
+Time between consecutive calls of the same user
+Returns (gaps, isRefugee) in minutes, one entry per pair of consecutive calls
+columnar => ColumnarData sorted by caller and time
+"""
+def InterCallGaps(columnar):
+    same = columnar.GetTransitionMask()
+    return np.diff(columnar.Minute)[same], columnar.IsRefugee[1:][same].astype(bool)
+
+"""
+Dwell time of the stays of the users
+A stay is a run of consecutive calls of a user from the same district, it lasts from its first
+call until the first call from the next district. The last stay of every user is cut off by the
+end of the data and left out.
+Returns (dwells, isRefugee) in minutes, one entry per completed stay
+columnar => ColumnarData sorted by caller and time
+"""
+def DwellTimes(columnar):
+    if len(columnar) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    same     = columnar.GetTransitionMask()
+    location = columnar.Location
+    newStay  = np.ones(len(columnar), dtype=bool)
+    newStay[1:] = ~same | (location[1:] != location[:-1])
+    starts   = np.flatnonzero(newStay)
+
+    # a stay is completed if the next stay belongs to the same user
+    completed = same[starts[1:] - 1]
+    dwells    = (columnar.Minute[starts[1:]] - columnar.Minute[starts[:-1]])[completed]
+    return dwells, columnar.IsRefugee[starts[:-1]][completed].astype(bool)
+
+"""
+Logarithmically binned histogram of non negative times with exact summary sums
+Zero gets its own bin, the value v >= 1 goes to bin 1 + floor(binsPerOctave * log2(v)).
+"""
+class LogHistogram(object):
+    """
+    Constructor for the histogram
+    binsPerOctave => Number of bins for every doubling of the value
+    """
+    def __init__(self, binsPerOctave = DEFAULT_BINS_PER_OCTAVE):
+        self.BinsPerOctave = binsPerOctave
+        self.Counts        = np.zeros(1, dtype=np.int64)
+        self.Count         = 0
+        self.Sum           = 0.0
+        self.SumOfSquares  = 0.0
+        self.Min           = np.inf
+        self.Max           = -np.inf
+
+    """
+    Bin index of the given values
+    values => Numpy array of non negative values
+    """
+    def GetBins(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        bins   = np.zeros(len(values), dtype=np.int64)
+        positive = values >= 1
+        bins[positive] = 1 + np.floor(self.BinsPerOctave * np.log2(values[positive]) + 1e-9).astype(np.int64)
+        return bins
+
+    """
+    Lower edges of the bins (the edge of bin i + 1 is the upper edge of bin i)
+    """
+    def GetEdges(self):
+        edges = np.power(2.0, (np.arange(len(self.Counts) + 1) - 1) / float(self.BinsPerOctave))
+        edges[0] = 0.0
+        return edges
+
+    """
+    Add values
+    values => Numpy array of non negative values
+    """
+    def Add(self, values):
+        values = np.asarray(values)
+        if len(values) == 0:
+            return
+        bins = np.bincount(self.GetBins(values))
+        if len(bins) > len(self.Counts):
+            self.Counts = np.pad(self.Counts, (0, len(bins) - len(self.Counts)))
+        self.Counts[:len(bins)] += bins
+        values = values.astype(np.float64)
+        self.Count        += len(values)
+        self.Sum          += values.sum()
+        self.SumOfSquares += (values * values).sum()
+        self.Min           = min(self.Min, values.min())
+        self.Max           = max(self.Max, values.max())
+
+    """
+    Merge the histogram of another set of values into this one
+    other => LogHistogram with the same number of bins per octave
+    """
+    def Merge(self, other):
+        if len(other.Counts) > len(self.Counts):
+            self.Counts = np.pad(self.Counts, (0, len(other.Counts) - len(self.Counts)))
+        self.Counts[:len(other.Counts)] += other.Counts
+        self.Count        += other.Count
+        self.Sum          += other.Sum
+        self.SumOfSquares += other.SumOfSquares
+        self.Min           = min(self.Min, other.Min)
+        self.Max           = max(self.Max, other.Max)
+
+    """
+    Mean of the values (nan if empty)
+    """
+    def GetMean(self):
+        return self.Sum / self.Count if self.Count > 0 else np.nan
+
+    """
+    Population standard deviation of the values (nan if empty)
+    """
+    def GetStd(self):
+        if self.Count == 0:
+            return np.nan
+        mean = self.GetMean()
+        return np.sqrt(max(0.0, self.SumOfSquares / self.Count - mean * mean))
+
+    """
+    Quantile from the histogram, interpolated geometrically inside the bin of the quantile
+    The error is bounded by the width of a bin (a factor of 2 ** (1 / binsPerOctave))
+    quantile => Requested quantile between 0 and 1
+    """
+    def GetQuantile(self, quantile):
+        if self.Count == 0:
+            return np.nan
+        rank       = quantile * (self.Count - 1)
+        cumulative = np.cumsum(self.Counts)
+        found      = int(np.argmax(cumulative > rank))
+        if found == 0:
+            return 0.0
+        edges    = self.GetEdges()
+        fraction = (rank - (cumulative[found] - self.Counts[found])) / float(self.Counts[found])
+        value    = edges[found] * np.power(edges[found + 1] / edges[found], fraction)
+        return float(min(max(value, self.Min), self.Max))
+
+"""
+Inter-call gap and dwell time distributions of the refugees and the non refugees
+Records of complete users are collected and measured in batches with vectorized differences
+over the user segments.
+"""
+class TimeDistributions(object):
+    """
+    Constructor for the time distributions
+    binsPerOctave => Number of histogram bins for every doubling of the time
+    batchSize     => Number of calls collected before the times are calculated
+    """
+    def __init__(self, binsPerOctave = DEFAULT_BINS_PER_OCTAVE, batchSize = TIME_BATCH_SIZE):
+        self.BatchSize    = batchSize
+        self.Histograms   = dict(((measure, isRefugee), LogHistogram(binsPerOctave)) for measure in MEASURES for isRefugee in (False, True))
+        self.Pending      = []
+        self.PendingCount = 0
+
+    """
+    Add a chunk of records of complete users
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def AddRecords(self, records):
+        self.Pending.append(records)
+        self.PendingCount += len(records)
+        if self.PendingCount > self.BatchSize:
+            self.Compact()
+
+    """
+    Add the calls of complete users
+    columnar => ColumnarData sorted by caller and time
+    """
+    def AddColumnar(self, columnar):
+        for measure, (times, isRefugee) in ((GAP, InterCallGaps(columnar)), (DWELL, DwellTimes(columnar))):
+            self.Histograms[(measure, False)].Add(times[~isRefugee])
+            self.Histograms[(measure, True)].Add(times[isRefugee])
+
+    """
+    Measure the pending users
+    """
+    def Compact(self):
+        if len(self.Pending) == 0:
+            return
+        self.AddColumnar(ColumnarData.FromChunks(self.Pending, True))
+        self.Pending      = []
+        self.PendingCount = 0
+
+    """
+    Merge the distributions of another set of users into this one
+    other => TimeDistributions
+    """
+    def Merge(self, other):
+        other.Compact()
+        for key, histogram in other.Histograms.items():
+            self.Histograms[key].Merge(histogram)
+
+    """
+    Write the histograms in csv format (one row per measure, population and bin), the summary
+    statistics are written next to it ("Summary" is appended to the name)
+    fileName => Full Path of the output file
+    """
+    def Write(self, fileName):
+        self.Compact()
+        with open(fileName, "w+") as f:
+            f.write("Measure;IsRefugee;From;To;Count\n")
+            for (measure, isRefugee), histogram in sorted(self.Histograms.items()):
+                edges = histogram.GetEdges()
+                for i in np.flatnonzero(histogram.Counts).tolist():
+                    f.write(measure + ";" + str(int(isRefugee)) + ";%.3f;%.3f;%d\n" % (edges[i], edges[i + 1], histogram.Counts[i]))
+        name, extension = splitext(fileName)
+        with open(name + "Summary" + extension, "w+") as f:
+            f.write("Measure;IsRefugee;Count;Mean;Std;Min;Max;" + ";".join("P" + str(int(q * 100)) for q in SUMMARY_QUANTILES) + "\n")
+            for (measure, isRefugee), histogram in sorted(self.Histograms.items()):
+                f.write(measure + ";" + str(int(isRefugee)) + ";%d;%.3f;%.3f;%.3f;%.3f;" % (histogram.Count, histogram.GetMean(), histogram.GetStd(),
+                        histogram.Min if histogram.Count > 0 else np.nan, histogram.Max if histogram.Count > 0 else np.nan) +
+                        ";".join("%.3f" % histogram.GetQuantile(q) for q in SUMMARY_QUANTILES) + "\n")
@@ -0,0 +1,234 @@
+#!/usr/bin/python
+import os, tempfile, itertools
+import numpy as np
+
+# binary layout of a single call record stored in the sorted runs
+RECORD_TYPE = np.dtype([('Caller', '<i8'), ('Minute', '<i8'), ('Location', '<i4'), ('IsRefugee', '<i1')])
+
+# default memory budget of the in memory buffer (in bytes)
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# maximum number of records read at once from each run while merging
+DEFAULT_MERGE_BLOCK_SIZE = 64 * 1024
+
+# maximum number of runs merged at once, more runs are merged in several passes
+DEFAULT_MAX_FAN_IN = 64
+
+"""
+Sort the given records according to caller and then call time
+The sort is stable, calls of a caller within the same minute keep their input order like in the
+time sorted users of the other runs
+records => Numpy array of RECORD_TYPE
+"""
+def SortRecords(records):
+    order = np.lexsort((records['Minute'], records['Caller']))
+    return records[order]
+
+"""
+Out of core sorter for the (caller, minute, location) records
+Records are buffered in memory until the memory budget is exhausted, then the buffer
+is sorted and spilled to a temporary binary file (a run). Merging the runs gives a
+stream grouped by caller and ordered by call time. At most maxFanIn runs are merged at
+once (more runs are first merged into longer runs), block by block with numpy, and the
+blocks are sized so that the merge stays within the memory budget as well.
+"""
+class ExternalSorter(object):
+    """
+    Constructor for the external sorter
+    memoryBudget   => Maximum number of bytes used by the in memory buffer
+    tempFolder     => Folder of the temporary run files (if left blank system default is used)
+    mergeBlockSize => Maximum number of records read from each run at once while merging
+    maxFanIn       => Maximum number of runs merged at once
+    """
+    def __init__(self, memoryBudget = DEFAULT_MEMORY_BUDGET, tempFolder = None, mergeBlockSize = DEFAULT_MERGE_BLOCK_SIZE, maxFanIn = DEFAULT_MAX_FAN_IN):
+        self.MemoryBudget    = max(1, int(memoryBudget))
+        self.Capacity        = max(1, self.MemoryBudget // RECORD_TYPE.itemsize)
+        self.TempFolder      = tempFolder
+        self.MergeBlockSize  = max(1, int(mergeBlockSize))
+        self.MaxFanIn        = max(2, int(maxFanIn))
+        self.Buffer          = np.empty(self.Capacity, dtype=RECORD_TYPE)
+        self.Count           = 0
+        self.Runs            = []
+        self.NumberOfRecords = 0
+
+    """
+    Add a single record to the sorter
+    callerId  => Id of the caller (integer)
+    minute    => Number of minutes passed since the beginning date (integer)
+    location  => Id of the location of the call (integer)
+    isRefugee => Shows whether the user is a refugee (boolean)
+    """
+    def AddRecord(self, callerId, minute, location, isRefugee):
+        if self.Count == self.Capacity:
+            self.Spill()
+        self.Buffer[self.Count] = (callerId, minute, location, isRefugee)
+        self.Count += 1
+        self.NumberOfRecords += 1
+
+    """
+    Add a block of records to the sorter
+    records => Numpy array of RECORD_TYPE
+    """
+    def AddRecords(self, records):
+        begin = 0
+        while begin < len(records):
+            if self.Count == self.Capacity:
+                self.Spill()
+            # copy as much as the buffer can take
+            end = min(len(records), begin + self.Capacity - self.Count)
+            self.Buffer[self.Count:self.Count + end - begin] = records[begin:end]
+            self.Count += end - begin
+            self.NumberOfRecords += end - begin
+            begin = end
+
+    """
+    Sort the in memory buffer and write it out as a new run
+    """
+    def Spill(self):
+        if self.Count == 0:
+            return
+        self.Runs.append(self.WriteRun([SortRecords(self.Buffer[:self.Count])]))
+        self.Count = 0
+
+    """
+    Write sorted records to a new temporary run file
+    Returns (fileName, length) of the run
+    chunks => Iterable of numpy arrays of RECORD_TYPE in sorted order
+    """
+    def WriteRun(self, chunks):
+        handle, fileName = tempfile.mkstemp(prefix="D4RRun", suffix=".bin", dir=self.TempFolder)
+        length = 0
+        with os.fdopen(handle, "wb") as f:
+            for records in chunks:
+                records.tofile(f)
+                length += len(records)
+        return fileName, length
+
+    """
+    Read a run block by block
+    fileName  => Full Path of the run file
+    length    => Number of records in the run
+    blockSize => Number of records in a block
+    """
+    def ReadRun(self, fileName, length, blockSize):
+        run = np.memmap(fileName, dtype=RECORD_TYPE, mode='r', shape=(length,))
+        for begin in range(0, length, blockSize):
+            # copy the block so that the memory map is not kept alive by the records
+            yield np.array(run[begin:begin + blockSize])
+        del run
+
+    """
+    Number of records read at once from each of the merged runs
+    Every run holds a block and the records taken from the blocks are copied twice more (concatenated
+    and sorted), so the blocks of all runs take about a third of the memory budget
+    fanIn => Number of runs merged at once
+    """
+    def GetMergeBlockSize(self, fanIn):
+        return max(1, min(self.MergeBlockSize, self.MemoryBudget // (3 * fanIn * RECORD_TYPE.itemsize)))
+
+    """
+    Merge sorted runs into sorted chunks of records
+    Every step takes the records of all blocks up to the smallest last record of the blocks, so the
+    run holding it reads its next block. Ties are taken from the earlier runs first, so calls within
+    the same minute keep their input order.
+    runs => List of (fileName, length) of the runs in the order they were written
+    """
+    def MergeRuns(self, runs):
+        blockSize = self.GetMergeBlockSize(len(runs))
+        readers   = [self.ReadRun(fileName, length, blockSize) for fileName, length in runs]
+        blocks    = [next(reader, None) for reader in readers]
+        while True:
+            active = [i for i, block in enumerate(blocks) if block is not None]
+            if len(active) == 0:
+                return
+            bound = min(active, key=lambda i: (int(blocks[i]['Caller'][-1]), int(blocks[i]['Minute'][-1]), i))
+            boundCaller, boundMinute = blocks[bound]['Caller'][-1], blocks[bound]['Minute'][-1]
+            pieces = []
+            for i in active:
+                block = blocks[i]
+                if i == bound:
+                    count = len(block)
+                else:
+                    # the taken records are a prefix of the sorted block
+                    callers, minutes = block['Caller'], block['Minute']
+                    taken = (callers < boundCaller) | ((callers == boundCaller) & ((minutes < boundMinute) | ((minutes == boundMinute) & (i < bound))))
+                    count = int(np.count_nonzero(taken))
+                pieces.append(block[:count])
+                blocks[i] = block[count:] if count < len(block) else next(readers[i], None)
+            # the stable sort keeps the run order of the ties
+            yield SortRecords(np.concatenate(pieces))
+
+    """
+    Merge the runs in passes of at most MaxFanIn runs until MaxFanIn runs are left
+    Consecutive runs are merged so the ties keep their input order
+    """
+    def ReduceRuns(self):
+        while len(self.Runs) > self.MaxFanIn:
+            runs, merged = self.Runs, []
+            for begin in range(0, len(runs), self.MaxFanIn):
+                group = runs[begin:begin + self.MaxFanIn]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                merged.append(self.WriteRun(self.MergeRuns(group)))
+                # the merged runs and the ones left are removed by Close if something fails
+                self.Runs = merged + runs[begin + self.MaxFanIn:]
+                for fileName, length in group:
+                    os.remove(fileName)
+            self.Runs = merged
+
+    """
+    Merge all records as (caller, minute, location, isRefugee) tuples in sorted order
+    """
+    def Merge(self):
+        # everything fits in memory, there is no need to touch the disk
+        if len(self.Runs) == 0:
+            records = SortRecords(self.Buffer[:self.Count])
+            return zip(records['Caller'].tolist(), records['Minute'].tolist(), records['Location'].tolist(), records['IsRefugee'].tolist())
+
+        # spill the remaining records, the buffer is not used any more and its memory goes to the merge
+        self.Spill()
+        self.Buffer = None
+        self.ReduceRuns()
+        return self.IterateRecords(self.MergeRuns(self.Runs))
+
+    """
+    Records of sorted chunks as (caller, minute, location, isRefugee) tuples
+    At most MergeBlockSize records are turned into tuples at once
+    chunks => Iterable of numpy arrays of RECORD_TYPE
+    """
+    def IterateRecords(self, chunks):
+        for records in chunks:
+            for begin in range(0, len(records), self.MergeBlockSize):
+                block = records[begin:begin + self.MergeBlockSize]
+                for record in zip(block['Caller'].tolist(), block['Minute'].tolist(), block['Location'].tolist(), block['IsRefugee'].tolist()):
+                    yield record
+
+    """
+    Merge the runs and group the records by caller
+    Yields (callerId, isRefugee, minutes, locations) for every caller where minutes and locations
+    are time ordered numpy arrays. Only the records of a single caller are held in memory.
+    """
+    def GroupByCaller(self):
+        for callerId, records in itertools.groupby(self.Merge(), key=lambda record: record[0]):
+            records   = list(records)
+            minutes   = np.fromiter((record[1] for record in records), dtype=np.int64, count=len(records))
+            locations = np.fromiter((record[2] for record in records), dtype=np.int32, count=len(records))
+            yield callerId, bool(records[0][3]), minutes, locations
+
+    """
+    Remove all temporary run files
+    """
+    def Close(self):
+        for fileName, length in self.Runs:
+            if os.path.exists(fileName):
+                os.remove(fileName)
+        self.Runs  = []
+        self.Count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.Close()
+        return False
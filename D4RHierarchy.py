@@ -0,0 +1,181 @@
+#!/usr/bin/python
+import numpy as np
+from D4ROriginDestination import OriginDestinationMatrix, TransitionTensor
+from D4RAnomaly import ActivityTensor
+
+# levels of the district hierarchy
+DISTRICT = "District"
+PROVINCE = "Province"
+REGION   = "Region"
+LEVELS   = [DISTRICT, PROVINCE, REGION]
+
+# group of the districts that are missing from the hierarchy file
+UNKNOWN_GROUP = -1
+
+# largest number of cells summed with a dense bincount, larger cell ranges are summed over their distinct cells
+DENSE_CELL_LIMIT = 16 * 1024 * 1024
+
+"""
+Sum weights per cell
+Returns (cells, sums) where cells are the sorted cells that occur and sums holds the sums of every weight
+cells   => Numpy array of non negative cell indexes
+size    => Number of possible cells
+weights => List of numpy arrays of the weights of every cell index
+"""
+def SumCells(cells, size, weights):
+    if size <= DENSE_CELL_LIMIT:
+        occuring = np.flatnonzero(np.bincount(cells, minlength=size))
+        return occuring, [np.bincount(cells, weights=weight, minlength=size)[occuring].astype(np.int64) for weight in weights]
+    occuring, inverse = np.unique(cells, return_inverse=True)
+    return occuring, [np.bincount(inverse, weights=weight, minlength=len(occuring)).astype(np.int64) for weight in weights]
+
+"""
+District -> province (-> region) hierarchy
+The group of every district id is precomputed in a lookup array per level, so the rows of an output
+are mapped to the groups of a level with a single indexing and summed with a single bincount over the
+(slice, isRefugee, group) cells.
+"""
+class RegionHierarchy(object):
+    """
+    Constructor for the hierarchy
+    districts => Numpy array of district ids
+    provinces => Numpy array of the province id of every district
+    regions   => Numpy array of the region id of every district (optional)
+    """
+    def __init__(self, districts, provinces, regions = None):
+        order          = np.argsort(districts, kind='stable')
+        self.Districts = np.asarray(districts, dtype=np.int64)[order]
+        if len(self.Districts) > 1 and np.any(self.Districts[1:] == self.Districts[:-1]):
+            raise ValueError("Districts are mapped more than once")
+        parents = {DISTRICT: self.Districts, PROVINCE: np.asarray(provinces, dtype=np.int64)[order]}
+        if regions is not None:
+            parents[REGION] = np.asarray(regions, dtype=np.int64)[order]
+
+        # sorted group ids of every level (including the group of the unknown districts) and the
+        # position of the group of every district id, ids are looked up from the smallest one on
+        self.Offset  = int(min(0, self.Districts.min())) if len(self.Districts) > 0 else 0
+        size         = int(self.Districts.max()) - self.Offset + 1 if len(self.Districts) > 0 else 0
+        self.Groups  = {}
+        self.Unknown = {}
+        self.Lookups = {}
+        for level, parent in parents.items():
+            groups              = np.unique(np.append(parent, UNKNOWN_GROUP))
+            self.Groups[level]  = groups
+            self.Unknown[level] = int(np.searchsorted(groups, UNKNOWN_GROUP))
+            self.Lookups[level] = np.full(size, self.Unknown[level], dtype=np.int64)
+            self.Lookups[level][self.Districts - self.Offset] = np.searchsorted(groups, parent)
+
+    """
+    Read a hierarchy file
+    Every line holds "District;Province" or "District;Province;Region" ids, lines that do not start
+    with a number (e.g. a header) are skipped
+    fileName => Full Path of the hierarchy file
+    """
+    @staticmethod
+    def Read(fileName):
+        rows = []
+        with open(fileName, "r") as f:
+            for line in f:
+                fields = [field.strip() for field in line.strip().split(";")]
+                if len(fields) < 2 or not fields[0].lstrip("-").isdigit():
+                    continue
+                rows.append([int(field) for field in fields[:3]])
+        if len(rows) > 0 and any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError("Hierarchy file mixes lines with and without regions: " + fileName)
+        rows = np.array(rows, dtype=np.int64).reshape(len(rows), -1)
+        if rows.shape[1] == 0:
+            rows = np.zeros((0, 2), dtype=np.int64)
+        return RegionHierarchy(rows[:, 0], rows[:, 1], rows[:, 2] if rows.shape[1] > 2 else None)
+
+    """
+    Shows whether the hierarchy has the given level
+    level => DISTRICT, PROVINCE or REGION
+    """
+    def HasLevel(self, level):
+        return level in self.Lookups
+
+    """
+    Sorted group ids of a level, including UNKNOWN_GROUP
+    level => DISTRICT, PROVINCE or REGION
+    """
+    def GetGroups(self, level):
+        if not self.HasLevel(level):
+            raise ValueError("The hierarchy has no level: " + str(level))
+        return self.Groups[level]
+
+    """
+    Position of the group of every given district in GetGroups(level)
+    districts => Numpy array of district ids
+    level     => DISTRICT, PROVINCE or REGION
+    """
+    def GetIndex(self, districts, level):
+        self.GetGroups(level)
+        lookup   = self.Lookups[level]
+        position = np.asarray(districts, dtype=np.int64) - self.Offset
+        known    = (position >= 0) & (position < len(lookup))
+        index    = np.full(len(position), self.Unknown[level], dtype=np.int64)
+        index[known] = lookup[position[known]]
+        return index
+
+    """
+    Group id of every given district
+    districts => Numpy array of district ids
+    level     => DISTRICT, PROVINCE or REGION
+    """
+    def GetParents(self, districts, level):
+        return self.GetGroups(level)[self.GetIndex(districts, level)]
+
+    """
+    Origin destination matrix (or transition tensor) of a level, the time slices are kept
+    Transitions within the same group become stays of the group unless they are collapsed.
+    matrix           => OriginDestinationMatrix or TransitionTensor of the districts
+    level            => DISTRICT, PROVINCE or REGION
+    collapseInternal => Drop the transitions within the same group (boolean)
+    """
+    def RollUpMatrix(self, matrix, level, collapseInternal = False):
+        matrix.Compact()
+        groups      = self.GetGroups(level)
+        size        = len(groups)
+        origin      = self.GetIndex(matrix.Origin, level)
+        destination = self.GetIndex(matrix.Destination, level)
+        kept        = origin != destination if collapseInternal else np.ones(len(origin), dtype=bool)
+        first       = int(matrix.Slice.min()) if len(matrix.Slice) > 0 else 0
+        slices      = int(matrix.Slice.max()) - first + 1 if len(matrix.Slice) > 0 else 0
+        cells = ((matrix.Slice[kept] - first) * 2 + matrix.IsRefugee[kept]) * (size * size) + origin[kept] * size + destination[kept]
+        cells, (count,) = SumCells(cells, slices * 2 * size * size, [matrix.Count[kept]])
+        if isinstance(matrix, TransitionTensor):
+            result = TransitionTensor(matrix.Period)
+        else:
+            result = OriginDestinationMatrix(matrix.Period, matrix.IncludeStays, matrix.UseOriginTime)
+        # the cells are in the order of the rows, so they are already sorted and summed
+        pairs, keys = cells % (size * size), cells // (size * size)
+        result.Slice       = keys // 2 + first
+        result.IsRefugee   = (keys % 2).astype(np.int8)
+        result.Origin      = groups[pairs // size].astype(np.int32)
+        result.Destination = groups[pairs % size].astype(np.int32)
+        result.Count       = count
+        return result
+
+    """
+    Activity tensor of a level, the time slices are kept
+    Calls add up exactly, users are summed over the districts of a group and so count a user once
+    for every district of the group it called from in a slice (an upper bound of the distinct users)
+    tensor => ActivityTensor of the districts
+    level  => DISTRICT, PROVINCE or REGION
+    """
+    def RollUpActivity(self, tensor, level):
+        tensor.Compact()
+        groups = self.GetGroups(level)
+        first  = int(tensor.Slice.min()) if len(tensor.Slice) > 0 else 0
+        slices = int(tensor.Slice.max()) - first + 1 if len(tensor.Slice) > 0 else 0
+        cells  = ((tensor.Slice - first) * 2 + tensor.IsRefugee) * len(groups) + self.GetIndex(tensor.District, level)
+        cells, (calls, users) = SumCells(cells, slices * 2 * len(groups), [tensor.Calls, tensor.Users])
+        result = ActivityTensor(tensor.Period)
+        # the cells are in the order of the rows, so they are already sorted and summed
+        keys = cells // len(groups)
+        result.Slice     = keys // 2 + first
+        result.IsRefugee = (keys % 2).astype(np.int8)
+        result.District  = groups[cells % len(groups)].astype(np.int64)
+        result.Calls     = calls
+        result.Users     = users
+        return result
@@ -0,0 +1,158 @@
+#!/usr/bin/python
+import numpy as np
+
+# maximum number of non zero transition probabilities in a single batch
+DEFAULT_BATCH_SIZE = 1024 * 1024
+
+# convergence tolerance (L1 change of a user's distribution) of the power iteration
+DEFAULT_TOLERANCE = 1e-10
+
+# maximum number of power iterations
+DEFAULT_MAX_ITERATIONS = 10000
+
+"""
+Block diagonal batch of many users' Markov matrices
+The states of all users in the batch are numbered one after the other, so the whole batch is
+a single sparse (row, column, probability) matrix and one matrix vector product advances the
+chains of every user at once.
+"""
+class MarkovBatch(object):
+    """
+    Constructor for the Markov batch
+    users => List of (userId, MarkovMatrice) pairs where MarkovMatrice is {from: {to: probability}}
+    """
+    def __init__(self, users):
+        self.UserIds = []
+        locations    = []
+        userOffsets  = [0]
+        rows, columns, probabilities = [], [], []
+
+        for userId, markovMatrice in users:
+            # local state numbers of the user, every target shall be a state as well
+            states = {}
+            for fromLocation, row in markovMatrice.items():
+                states.setdefault(fromLocation, len(states))
+                for toLocation in row:
+                    states.setdefault(toLocation, len(states))
+            offset = userOffsets[-1]
+            for fromLocation, row in markovMatrice.items():
+                for toLocation, probability in row.items():
+                    rows.append(offset + states[fromLocation])
+                    columns.append(offset + states[toLocation])
+                    probabilities.append(probability)
+            self.UserIds.append(userId)
+            locations.extend(states.keys())
+            userOffsets.append(offset + len(states))
+
+        self.Locations      = np.array(locations, dtype=np.int64)
+        self.UserOffsets    = np.array(userOffsets, dtype=np.int64)
+        self.Rows           = np.array(rows, dtype=np.int64)
+        self.Columns        = np.array(columns, dtype=np.int64)
+        self.Probabilities  = np.array(probabilities, dtype=np.float64)
+        self.NumberOfStates = int(self.UserOffsets[-1])
+        # user (position in UserIds) of every state
+        self.StateUser      = np.repeat(np.arange(len(self.UserIds)), np.diff(self.UserOffsets))
+
+    """
+    One step of all chains: distribution x (over all states of the batch) times the transition matrix
+    x => Numpy array of length NumberOfStates
+    """
+    def Step(self, x):
+        return np.bincount(self.Columns, weights=x[self.Rows] * self.Probabilities, minlength=self.NumberOfStates)
+
+    """
+    Sum of the given state values for each user
+    x => Numpy array of length NumberOfStates
+    """
+    def SumPerUser(self, x):
+        return np.bincount(self.StateUser, weights=x, minlength=len(self.UserIds))
+
+    """
+    Uniform distribution over the states of every user
+    """
+    def GetUniform(self):
+        return 1.0 / np.diff(self.UserOffsets)[self.StateUser]
+
+    """
+    Stationary distributions of all users by power iteration
+    The lazy chain (P + I) / 2 is iterated, it has the same stationary distribution but does not
+    oscillate for periodic chains. For chains with several closed classes the result depends on
+    the uniform start.
+    tolerance     => Maximum L1 change of a user's distribution at convergence
+    maxIterations => Maximum number of iterations
+    """
+    def GetStationaryDistributions(self, tolerance = DEFAULT_TOLERANCE, maxIterations = DEFAULT_MAX_ITERATIONS):
+        x = self.GetUniform()
+        for iteration in range(maxIterations):
+            y = 0.5 * (x + self.Step(x))
+            # renormalize each user against rounding drift
+            y /= self.SumPerUser(y)[self.StateUser]
+            change = self.SumPerUser(np.abs(y - x))
+            x = y
+            if len(change) == 0 or change.max() < tolerance:
+                break
+        return x
+
+    """
+    Distributions after n steps for all users
+    n     => Number of steps
+    start => Starting distribution over all states (if left blank uniform for every user)
+    """
+    def GetNStepDistributions(self, n, start = None):
+        x = self.GetUniform() if start is None else np.asarray(start, dtype=np.float64)
+        for i in range(n):
+            x = self.Step(x)
+        return x
+
+    """
+    Starting distribution that puts every user in the given location with probability one
+    startLocations => Location of each user (in the order of UserIds)
+    """
+    def GetStartDistribution(self, startLocations):
+        start = np.zeros(self.NumberOfStates)
+        isStart = self.Locations == np.asarray(startLocations, dtype=np.int64)[self.StateUser]
+        start[isStart] = 1.0
+        return start
+
+    """
+    Expected return times (1 / stationary probability) of all states, infinite for transient states
+    stationary => Stationary distributions (if left blank they are calculated)
+    """
+    def GetExpectedReturnTimes(self, stationary = None):
+        if stationary is None:
+            stationary = self.GetStationaryDistributions()
+        returnTimes = np.full(self.NumberOfStates, np.inf)
+        recurrent = stationary > 1e-12
+        returnTimes[recurrent] = 1.0 / stationary[recurrent]
+        return returnTimes
+
+    """
+    Split the state values into {location: value} dicts, one per user
+    x => Numpy array of length NumberOfStates
+    """
+    def ToDicts(self, x):
+        out = {}
+        locations = self.Locations.tolist()
+        values    = np.asarray(x).tolist()
+        for i, userId in enumerate(self.UserIds):
+            begin, end = self.UserOffsets[i], self.UserOffsets[i + 1]
+            out[userId] = dict(zip(locations[begin:end], values[begin:end]))
+        return out
+
+"""
+Group users into block diagonal batches of at most batchSize non zero probabilities
+A user larger than the batch size gets a batch on its own
+users     => Iterable of (userId, MarkovMatrice) pairs
+batchSize => Maximum number of non zero probabilities in a batch
+"""
+def MarkovBatches(users, batchSize = DEFAULT_BATCH_SIZE):
+    batch, size = [], 0
+    for userId, markovMatrice in users:
+        userSize = sum(len(row) for row in markovMatrice.values())
+        if len(batch) > 0 and size + userSize > batchSize:
+            yield MarkovBatch(batch)
+            batch, size = [], 0
+        batch.append((userId, markovMatrice))
+        size += userSize
+    if len(batch) > 0:
+        yield MarkovBatch(batch)
@@ -0,0 +1,305 @@
+#!/usr/bin/python
+import numpy as np
+from D4RColumnar import MINUTES_IN_A_DAY, MINUTES_IN_AN_HOUR, MinutesToMonths, MonthOfYear
+
+# periods the origin destination matrix can be sliced by
+HOURLY        = "Hourly"
+DAILY         = "Daily"
+MONTHLY       = "Monthly"
+HOUR_OF_DAY   = "HourOfDay"
+MONTH_OF_YEAR = "MonthOfYear"
+
+# number of pending transitions collected before they are compacted
+COMPACT_LIMIT = 4 * 1024 * 1024
+
+"""
+Slice index of the given minutes for a period
+minutes => Numpy array of minutes passed since the beginning date
+period  => HOURLY, DAILY, MONTHLY (hour, calendar day or month index), HOUR_OF_DAY (0 - 23),
+           MONTH_OF_YEAR (0 - 11) or None (single slice)
+"""
+def SliceOf(minutes, period):
+    if period == HOURLY:
+        return minutes // MINUTES_IN_AN_HOUR
+    elif period == DAILY:
+        return minutes // MINUTES_IN_A_DAY
+    elif period == MONTHLY:
+        return MinutesToMonths(minutes)
+    elif period == HOUR_OF_DAY:
+        return (minutes // MINUTES_IN_AN_HOUR) % 24
+    elif period == MONTH_OF_YEAR:
+        return MonthOfYear(MinutesToMonths(minutes)) - 1
+    elif period is None:
+        return np.zeros(len(minutes), dtype=np.int64)
+    raise ValueError("Unknown period: " + str(period))
+
+"""
+Population level district to district origin destination matrix
+Consecutive calls of the same user make a transition from the district of the first
+call to the district of the second one (counted at the time of the second call).
+Counts are stored sparsely as (slice, isRefugee, origin, destination, count) rows
+sorted in this order, so daily or monthly slices only cost memory for the pairs that occur.
+"""
+class OriginDestinationMatrix(object):
+    """
+    Constructor for the origin destination matrix
+    period        => DAILY, MONTHLY, HOUR_OF_DAY, MONTH_OF_YEAR or None (no time slicing)
+    includeStays  => Count consecutive calls from the same district as well (boolean)
+    useOriginTime => Slice by the time of the first call instead of the second one (boolean)
+    """
+    def __init__(self, period = None, includeStays = False, useOriginTime = False):
+        self.Period        = period
+        self.IncludeStays  = includeStays
+        self.UseOriginTime = useOriginTime
+        self.Slice        = np.zeros(0, dtype=np.int64)
+        self.IsRefugee    = np.zeros(0, dtype=np.int8)
+        self.Origin       = np.zeros(0, dtype=np.int32)
+        self.Destination  = np.zeros(0, dtype=np.int32)
+        self.Count        = np.zeros(0, dtype=np.int64)
+        self.Pending      = []
+        self.PendingCount = 0
+        self.Tail         = None
+
+    """
+    Build the matrix of all users in a single pass over the columnar data
+    columnar     => ColumnarData sorted by caller and time
+    period       => DAILY, MONTHLY or None (no time slicing)
+    includeStays => Count consecutive calls from the same district as well (boolean)
+    """
+    @staticmethod
+    def Build(columnar, period = None, includeStays = False):
+        matrix = OriginDestinationMatrix(period, includeStays)
+        matrix.AddRecords(columnar.Records)
+        matrix.Compact()
+        return matrix
+
+    """
+    Add a chunk of records grouped by caller and ordered by time
+    A user may continue from the previous chunk, the last record of every chunk is kept for that
+    records => Numpy array of RECORD_TYPE
+    """
+    def AddRecords(self, records):
+        if len(records) == 0:
+            return
+        if self.Tail is not None:
+            records = np.concatenate((self.Tail, records))
+        self.Tail = records[-1:].copy()
+
+        # consecutive calls of the same user
+        caller = records['Caller']
+        mask   = caller[1:] == caller[:-1]
+        origin      = records['Location'][:-1][mask]
+        destination = records['Location'][1:][mask]
+        minute      = records['Minute'][:-1][mask] if self.UseOriginTime else records['Minute'][1:][mask]
+        isRefugee   = records['IsRefugee'][1:][mask]
+        if not self.IncludeStays:
+            moved       = origin != destination
+            origin      = origin[moved]
+            destination = destination[moved]
+            minute      = minute[moved]
+            isRefugee   = isRefugee[moved]
+        if len(origin) == 0:
+            return
+
+        self.Pending.append((SliceOf(minute, self.Period), isRefugee.astype(np.int8), origin.astype(np.int32),
+                             destination.astype(np.int32), np.ones(len(origin), dtype=np.int64)))
+        self.PendingCount += len(origin)
+        if self.PendingCount > COMPACT_LIMIT:
+            self.Compact()
+
+    """
+    Merge the pending transitions into the sorted sparse rows
+    """
+    def Compact(self):
+        if len(self.Pending) == 0:
+            return
+        columns = [self.Slice, self.IsRefugee, self.Origin, self.Destination, self.Count]
+        for i in range(len(columns)):
+            columns[i] = np.concatenate([columns[i]] + [pending[i] for pending in self.Pending])
+        self.Pending      = []
+        self.PendingCount = 0
+        self.SetRows(*columns)
+
+    """
+    Sort the given rows and sum the counts of the identical keys
+    """
+    def SetRows(self, slices, isRefugee, origin, destination, count):
+        order = np.lexsort((destination, origin, isRefugee, slices))
+        slices, isRefugee, origin, destination, count = slices[order], isRefugee[order], origin[order], destination[order], count[order]
+        if len(order) > 0:
+            new = np.ones(len(order), dtype=bool)
+            new[1:] = (slices[1:] != slices[:-1]) | (isRefugee[1:] != isRefugee[:-1]) | \
+                      (origin[1:] != origin[:-1]) | (destination[1:] != destination[:-1])
+            starts = np.flatnonzero(new)
+            slices, isRefugee, origin, destination = slices[starts], isRefugee[starts], origin[starts], destination[starts]
+            count = np.add.reduceat(count, starts)
+        self.Slice, self.IsRefugee, self.Origin, self.Destination, self.Count = slices, isRefugee, origin, destination, count
+
+    """
+    Merge the matrix of another set of users (e.g. calculated by another worker) into this one
+    other => OriginDestinationMatrix with the same period
+    """
+    def Merge(self, other):
+        other.Compact()
+        self.Pending.append((other.Slice, other.IsRefugee, other.Origin, other.Destination, other.Count))
+        self.PendingCount += len(other.Count)
+        self.Compact()
+
+    """
+    Sorted ids of all districts that show up in the matrix
+    """
+    def GetDistricts(self):
+        self.Compact()
+        return np.union1d(self.Origin, self.Destination)
+
+    """
+    Sorted slice indexes that have at least one transition
+    """
+    def GetSlices(self):
+        self.Compact()
+        return np.unique(self.Slice)
+
+    """
+    Dense district x district flow matrix
+    Returns (districts, matrix) where matrix[i][j] is the flow from districts[i] to districts[j]
+    slices    => Slice index or list of slice indexes to be summed (if left blank all slices)
+    isRefugee => True for refugees, False for non refugees (if left blank everybody)
+    districts => Ids of the rows and columns (if left blank all districts in the matrix)
+    """
+    def GetMatrix(self, slices = None, isRefugee = None, districts = None):
+        self.Compact()
+        if districts is None:
+            districts = self.GetDistricts()
+        districts = np.asarray(districts)
+        selected  = np.ones(len(self.Count), dtype=bool)
+        if slices is not None:
+            selected &= np.isin(self.Slice, np.atleast_1d(slices))
+        if isRefugee is not None:
+            selected &= (self.IsRefugee == int(isRefugee))
+        matrix = np.zeros((len(districts), len(districts)), dtype=np.int64)
+        if len(districts) == 0:
+            return districts, matrix
+        origins      = self.Origin[selected]
+        destinations = self.Destination[selected]
+        origin       = np.minimum(np.searchsorted(districts, origins), len(districts) - 1)
+        destination  = np.minimum(np.searchsorted(districts, destinations), len(districts) - 1)
+        # drop districts which are not requested
+        known = (districts[origin] == origins) & (districts[destination] == destinations)
+        np.add.at(matrix, (origin[known], destination[known]), self.Count[selected][known])
+        return districts, matrix
+
+    """
+    Write the matrix in long csv format (one row per slice, group, origin and destination)
+    fileName => Full Path of the output file
+    """
+    def WriteCsv(self, fileName):
+        self.Compact()
+        rows = np.column_stack((self.Slice, self.IsRefugee, self.Origin, self.Destination, self.Count))
+        np.savetxt(fileName, rows, fmt='%d', delimiter=';', comments='',
+                   header=str(self.Period if self.Period is not None else "Total") + ";IsRefugee;Origin;Destination;Count")
+
+    """
+    Write the matrix in compressed binary format
+    fileName => Full Path of the output file (.npz)
+    """
+    def WriteBinary(self, fileName):
+        self.Compact()
+        np.savez_compressed(fileName, Slice=self.Slice, IsRefugee=self.IsRefugee, Origin=self.Origin,
+                            Destination=self.Destination, Count=self.Count,
+                            Period=np.array("" if self.Period is None else self.Period), IncludeStays=np.array(self.IncludeStays),
+                            UseOriginTime=np.array(self.UseOriginTime))
+
+    """
+    Read a matrix written by WriteBinary
+    fileName => Full Path of the input file (.npz)
+    """
+    @staticmethod
+    def ReadBinary(fileName):
+        with np.load(fileName) as data:
+            period = str(data['Period'])
+            matrix = OriginDestinationMatrix(period if period != "" else None, bool(data['IncludeStays']), 'UseOriginTime' in data and bool(data['UseOriginTime']))
+            matrix.SetRows(data['Slice'], data['IsRefugee'], data['Origin'], data['Destination'], data['Count'])
+        return matrix
+
+    """
+    Read a matrix written by WriteCsv (whether stays were included is not stored in the csv)
+    fileName => Full Path of the input file (.csv)
+    """
+    @staticmethod
+    def ReadCsv(fileName):
+        with open(fileName, "r") as f:
+            period = f.readline().split(";")[0].strip()
+        rows   = np.loadtxt(fileName, dtype=np.int64, delimiter=';', skiprows=1, ndmin=2).reshape(-1, 5)
+        matrix = OriginDestinationMatrix(period if period != "Total" else None)
+        matrix.SetRows(rows[:, 0], rows[:, 1].astype(np.int8), rows[:, 2].astype(np.int32), rows[:, 3].astype(np.int32), rows[:, 4])
+        return matrix
+
+    """
+    Read a matrix from a file, long csv for .csv files and compressed binary otherwise
+    fileName => Full Path of the input file
+    """
+    @staticmethod
+    def Read(fileName):
+        if fileName.lower().endswith(".csv"):
+            return OriginDestinationMatrix.ReadCsv(fileName)
+        return OriginDestinationMatrix.ReadBinary(fileName)
+
+    """
+    Write the matrix to a file, long csv for .csv files and compressed binary otherwise
+    fileName => Full Path of the output file
+    """
+    def Write(self, fileName):
+        if fileName.lower().endswith(".csv"):
+            self.WriteCsv(fileName)
+        else:
+            self.WriteBinary(fileName)
+
+"""
+Time sliced Markov transition tensor (slice x from x to) of all users
+Every pair of consecutive calls of a user is counted, including the ones that stay in the
+same district, in the slice of the first call (the time the user leaves the state).
+Storage is the same sparse row format as the origin destination matrix, so 24 hourly or
+12 monthly slices only cost memory for the transitions that actually occur.
+"""
+class TransitionTensor(OriginDestinationMatrix):
+    """
+    Constructor for the transition tensor
+    period => HOUR_OF_DAY or MONTH_OF_YEAR (any period of SliceOf works)
+    """
+    def __init__(self, period = HOUR_OF_DAY):
+        OriginDestinationMatrix.__init__(self, period, True, True)
+
+    """
+    Build the tensor of all users in a single pass over the columnar data
+    columnar => ColumnarData sorted by caller and time
+    period   => HOUR_OF_DAY or MONTH_OF_YEAR
+    """
+    @staticmethod
+    def Build(columnar, period = HOUR_OF_DAY):
+        tensor = TransitionTensor(period)
+        tensor.AddRecords(columnar.Records)
+        tensor.Compact()
+        return tensor
+
+    """
+    Read a tensor written by Write (see OriginDestinationMatrix.Read)
+    fileName => Full Path of the input file
+    """
+    @staticmethod
+    def Read(fileName):
+        matrix = OriginDestinationMatrix.Read(fileName)
+        tensor = TransitionTensor(matrix.Period)
+        tensor.SetRows(matrix.Slice, matrix.IsRefugee, matrix.Origin, matrix.Destination, matrix.Count)
+        return tensor
+
+    """
+    Row normalized transition probabilities of a single slice
+    Returns (districts, probabilities) where rows without any transition are left as zeros
+    slices    => Slice index or list of slice indexes to be summed (if left blank all slices)
+    isRefugee => True for refugees, False for non refugees (if left blank everybody)
+    districts => Ids of the rows and columns (if left blank all districts in the tensor)
+    """
+    def GetProbabilities(self, slices = None, isRefugee = None, districts = None):
+        districts, counts = self.GetMatrix(slices, isRefugee, districts)
+        total = counts.sum(axis=1, keepdims=True)
+        return districts, np.divide(counts, total, out=np.zeros(counts.shape), where=total > 0)
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+from D4RColumnar import MINUTES_IN_AN_HOUR, MinutesToMonths, MonthOfYear
+
+# number of user ranges given to each worker (more ranges balance the load better)
+RANGES_PER_WORKER = 4
+
+"""
+Numpy arrays placed in shared memory
+Workers attach to the blocks by name, so the arrays are never pickled
+"""
+class SharedArrays(object):
+    """
+    Constructor for the shared arrays, the given arrays are copied into new shared memory blocks
+    arrays => Dict of name => numpy array
+    """
+    def __init__(self, arrays):
+        self.Blocks = []
+        self.Spec   = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.Blocks.append(block)
+            # record arrays keep their fields
+            self.Spec[name] = (block.name, array.dtype.descr if array.dtype.names is not None else array.dtype.str, array.shape)
+
+    """
+    Release the shared memory blocks
+    """
+    def Close(self):
+        for block in self.Blocks:
+            block.close()
+            block.unlink()
+        self.Blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.Close()
+        return False
+
+"""
+Attach to shared arrays created by SharedArrays
+Returns (blocks, arrays), the blocks shall be closed once the arrays are not used anymore
+spec  => SharedArrays.Spec
+track => Register the blocks with the resource tracker of this process, which unlinks them when it
+         ends, so only processes started by the owner of the blocks shall track them (boolean)
+"""
+def AttachSharedArrays(spec, track = True):
+    blocks, arrays = [], {}
+    for name, (blockName, dtype, shape) in spec.items():
+        if track:
+            block = shared_memory.SharedMemory(name=blockName)
+        else:
+            try:
+                block = shared_memory.SharedMemory(name=blockName, track=False)
+            except TypeError:
+                # before Python 3.13 attaching always registers the block
+                block = shared_memory.SharedMemory(name=blockName)
+                resource_tracker.unregister(block._name, "shared_memory")
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+"""
+Count the transitions of the users in [userBegin, userEnd)
+Location and minute arrays are sorted by user and time, user i owns [UserStarts[i], UserStarts[i + 1]).
+As in the per user transition matrix, the last call of every user makes a transition to itself.
+Returns a dict of numpy arrays:
+ User, From, To, Count, First => transition counts and the index of the first occurence of the pair
+ Hourly* and Monthly*         => User, Slice, From, To, Count of the real consecutive call pairs
+location   => Numpy array of locations
+minute     => Numpy array of minutes passed since the beginning date
+userStarts => Numpy array of user start indexes (number of users + 1)
+userBegin  => First user of the range
+userEnd    => End of the user range (exclusive)
+"""
+def CountTransitions(location, minute, userStarts, userBegin, userEnd):
+    begin, end = int(userStarts[userBegin]), int(userStarts[userEnd])
+    location   = np.asarray(location[begin:end])
+    minute     = np.asarray(minute[begin:end])
+    starts     = np.asarray(userStarts[userBegin:userEnd + 1]) - begin
+    user       = np.repeat(np.arange(userBegin, userEnd), np.diff(starts))
+
+    # next state of every call, the last call of a user stays where it is
+    isLast = np.zeros(len(location), dtype=bool)
+    isLast[starts[1:][starts[1:] > starts[:-1]] - 1] = True
+    following = np.empty_like(location)
+    following[:-1] = location[1:]
+    following[isLast] = location[isLast]
+
+    # dense codes of the locations make a compact key
+    locations, codes = np.unique(np.concatenate((location, following)), return_inverse=True)
+    fromCode, toCode = codes[:len(location)], codes[len(location):]
+    size = max(1, len(locations))
+
+    result = {}
+    keys = (user.astype(np.int64) * size + fromCode) * size + toCode
+    unique, first, count = np.unique(keys, return_index=True, return_counts=True)
+    result['User']  = unique // (size * size)
+    result['From']  = locations[(unique // size) % size]
+    result['To']    = locations[unique % size]
+    result['Count'] = count
+    result['First'] = first + begin
+
+    # time sliced counts of the real pairs, sliced by the time the state is left
+    pairs = ~isLast
+    for name, slices, numberOfSlices in [("Hourly", (minute[pairs] // MINUTES_IN_AN_HOUR) % 24, 24),
+                                         ("Monthly", MonthOfYear(MinutesToMonths(minute[pairs])) - 1, 12)]:
+        keys = ((user[pairs].astype(np.int64) * numberOfSlices + slices) * size + fromCode[pairs]) * size + toCode[pairs]
+        unique, count = np.unique(keys, return_counts=True)
+        result[name + 'User']  = unique // (numberOfSlices * size * size)
+        result[name + 'Slice'] = (unique // (size * size)) % numberOfSlices
+        result[name + 'From']  = locations[(unique // size) % size]
+        result[name + 'To']    = locations[unique % size]
+        result[name + 'Count'] = count
+    return result
+
+"""
+Worker entry point, attaches to the shared trajectories and counts a user range
+spec      => SharedArrays.Spec with Location, Minute and UserStarts
+userBegin => First user of the range
+userEnd   => End of the user range (exclusive)
+"""
+def CountTransitionsWorker(spec, userBegin, userEnd):
+    blocks, arrays = AttachSharedArrays(spec)
+    try:
+        return CountTransitions(arrays['Location'], arrays['Minute'], arrays['UserStarts'], userBegin, userEnd)
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+"""
+Split the users into ranges with about the same number of calls
+userStarts     => Numpy array of user start indexes (number of users + 1)
+numberOfRanges => Requested number of ranges
+"""
+def SplitUsers(userStarts, numberOfRanges):
+    numberOfUsers = len(userStarts) - 1
+    targets = np.linspace(0, userStarts[-1], numberOfRanges + 1)
+    bounds  = np.unique(np.concatenate(([0], np.searchsorted(userStarts, targets[1:-1]), [numberOfUsers])))
+    return [(int(bounds[i]), int(bounds[i + 1])) for i in range(len(bounds) - 1)]
+
+"""
+Count the transitions of all users with a pool of worker processes
+Sorted trajectories are placed in shared memory and every worker handles disjoint user ranges,
+the sparse per range results are concatenated in user order (see CountTransitions for the fields)
+columnar        => ColumnarData sorted by caller and time
+numberOfWorkers => Number of worker processes
+"""
+def ParallelCountTransitions(columnar, numberOfWorkers):
+    userStarts = columnar.GetUserStarts()
+    ranges     = SplitUsers(userStarts, max(1, numberOfWorkers) * RANGES_PER_WORKER)
+    with SharedArrays({"Location": columnar.Location, "Minute": columnar.Minute, "UserStarts": userStarts}) as shared:
+        with multiprocessing.Pool(numberOfWorkers) as pool:
+            results = pool.starmap(CountTransitionsWorker, [(shared.Spec, begin, end) for begin, end in ranges])
+    if len(results) == 0:
+        results = [CountTransitions(columnar.Location, columnar.Minute, userStarts, 0, 0)]
+    return dict((name, np.concatenate([result[name] for result in results])) for name in results[0])
+
+"""
+Per user transition dicts of the counts of ParallelCountTransitions
+The counts stay in their numpy arrays and the dicts of a user are only built when they are asked
+for, in the same order as the single process version. The probabilities of all users are
+calculated once with numpy.
+"""
+class TransitionStore(object):
+    """
+    Constructor for the store
+    counts        => Dict of numpy arrays returned by ParallelCountTransitions
+    numberOfUsers => Number of users of the counts
+    """
+    def __init__(self, counts, numberOfUsers):
+        # counts are sorted by user, from and to, find the (user, from) rows
+        user, first = counts['User'], counts['First']
+        newRow      = np.ones(len(user), dtype=bool)
+        newRow[1:]  = (user[1:] != user[:-1]) | (counts['From'][1:] != counts['From'][:-1])
+        rowStarts   = np.flatnonzero(newRow)
+        rowLengths  = np.diff(np.append(rowStarts, len(user)))
+        occurences  = np.repeat(np.add.reduceat(counts['Count'], rowStarts), rowLengths) if len(user) > 0 else np.zeros(0)
+        rowFirst    = np.repeat(np.minimum.reduceat(first, rowStarts), rowLengths) if len(user) > 0 else np.zeros(0)
+
+        # rows and columns are inserted in the order of their first occurence
+        order  = np.lexsort((first, rowFirst, user))
+        users  = np.arange(numberOfUsers + 1)
+        self.Columns = {"Markov": (counts['From'][order], counts['To'][order], counts['Count'][order] / occurences[order])}
+        self.Starts  = {"Markov": np.searchsorted(user[order], users)}
+        for name in ["Hourly", "Monthly"]:
+            self.Columns[name] = tuple(counts[name + field] for field in ["Slice", "From", "To", "Count"])
+            self.Starts[name]  = np.searchsorted(counts[name + "User"], users)
+
+    """
+    Transition dict of a user
+    "Markov" gives {from: {to: probability}}, "Hourly" and "Monthly" give {(slice, from, to): count}
+    name      => "Markov", "Hourly" or "Monthly"
+    userIndex => Position of the user in the counted users
+    """
+    def GetTransitions(self, name, userIndex):
+        begin, end = self.Starts[name][userIndex], self.Starts[name][userIndex + 1]
+        columns    = [column[begin:end].tolist() for column in self.Columns[name]]
+        if name != "Markov":
+            return dict(((timeSlice, fromLocation, toLocation), count) for timeSlice, fromLocation, toLocation, count in zip(*columns))
+        matrice = {}
+        for fromLocation, toLocation, probability in zip(*columns):
+            matrice.setdefault(fromLocation, {})[toLocation] = probability
+        return matrice
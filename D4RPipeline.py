@@ -0,0 +1,135 @@
+#!/usr/bin/python
+import numpy as np
+from D4RExternalSort import RECORD_TYPE
+
+# default number of records in a single chunk passed between the pipeline stages
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# number of closed callers collected in a set before they are merged into the sorted array
+CLOSED_BUFFER_SIZE = 64 * 1024
+
+"""
+Pack a stream of (caller, minute, location, isRefugee) tuples into fixed size record chunks
+Records are only read when the consumer asks for the next chunk, so at most one chunk
+is held by this stage at any time
+records   => Iterable of (caller, minute, location, isRefugee) tuples
+chunkSize => Maximum number of records in a chunk
+"""
+def ChunkRecords(records, chunkSize = DEFAULT_CHUNK_SIZE):
+    chunkSize = max(1, int(chunkSize))
+    buffer    = np.empty(chunkSize, dtype=RECORD_TYPE)
+    count     = 0
+    for record in records:
+        buffer[count] = record
+        count += 1
+        if count == chunkSize:
+            # the buffer is reused so hand over a copy
+            yield buffer.copy()
+            count = 0
+    if count > 0:
+        yield buffer[:count].copy()
+
+"""
+Group the records of caller grouped chunks by caller
+Input chunks shall keep the records of a caller together (they may span several chunks),
+calls of a caller do not need to be time ordered. Yields (callerId, isRefugee, minutes, locations)
+for every caller as soon as its last record is seen, so only one chunk and the records
+of the current caller are held in memory.
+chunks       => Iterable of numpy arrays of RECORD_TYPE
+checkGrouped => Raise a ValueError if a caller shows up again after its group was closed (see ClosedCallers)
+"""
+def GroupCallerChunks(chunks, checkGrouped = True):
+    finished = ClosedCallers()
+    for pieces in SplitCallerChunks(chunks):
+        callerId = int(pieces[0]['Caller'][0])
+        if checkGrouped:
+            if finished.Contains(callerId):
+                raise ValueError("Input is not grouped by caller, caller " + str(callerId) + " appeared again")
+            finished.Add(callerId)
+        yield CloseGroup(pieces)
+
+"""
+Split caller grouped chunks into the pieces of every caller
+Yields the list of pieces (numpy arrays of RECORD_TYPE) of a caller as soon as its last record is seen
+chunks => Iterable of numpy arrays of RECORD_TYPE
+"""
+def SplitCallerChunks(chunks):
+    pending = []
+
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        # find the indexes where a new caller begins
+        callers = chunk['Caller']
+        starts  = np.concatenate(([0], np.flatnonzero(callers[1:] != callers[:-1]) + 1))
+        # the first group may continue the pending caller of the previous chunk
+        if len(pending) > 0 and pending[0]['Caller'][0] != callers[0]:
+            yield pending
+            pending = []
+        # every group except the last one is complete
+        ends = np.append(starts[1:], len(chunk))
+        for begin, end in zip(starts[:-1], ends[:-1]):
+            pending.append(chunk[begin:end])
+            yield pending
+            pending = []
+        # the last group may go on in the next chunk
+        pending.append(chunk[starts[-1]:])
+
+    if len(pending) > 0:
+        yield pending
+
+"""
+Build the time ordered group of a single caller from its pieces
+pieces => List of numpy arrays of RECORD_TYPE belonging to the same caller
+"""
+def CloseGroup(pieces):
+    records  = np.concatenate(pieces) if len(pieces) > 1 else pieces[0]
+    callerId = int(records['Caller'][0])
+    # stable sort keeps the file order of the calls within the same minute
+    order = np.argsort(records['Minute'], kind='stable')
+    return callerId, bool(records['IsRefugee'][0]), records['Minute'][order], records['Location'][order]
+
+"""
+Callers whose group was closed
+The callers are kept in a sorted int64 array (8 bytes per caller) and the latest ones in a small
+set that is merged into the array once it is full. A caller above all closed callers (e.g. every
+caller of a caller sorted input) is new without a lookup.
+"""
+class ClosedCallers(object):
+    """
+    Constructor for the closed callers
+    """
+    def __init__(self):
+        self.Sorted  = np.zeros(0, dtype=np.int64)
+        self.Buffer  = set()
+        self.Maximum = None
+
+    """
+    Shows whether the group of the caller was already closed
+    callerId => Id of the caller (integer)
+    """
+    def Contains(self, callerId):
+        if self.Maximum is None or callerId > self.Maximum:
+            return False
+        if callerId in self.Buffer:
+            return True
+        index = np.searchsorted(self.Sorted, callerId)
+        return index < len(self.Sorted) and self.Sorted[index] == callerId
+
+    """
+    Add a caller whose group is closed
+    callerId => Id of the caller (integer)
+    """
+    def Add(self, callerId):
+        self.Buffer.add(callerId)
+        self.Maximum = callerId if self.Maximum is None else max(self.Maximum, callerId)
+        if len(self.Buffer) >= CLOSED_BUFFER_SIZE:
+            self.Merge()
+
+    """
+    Merge the buffered callers into the sorted array
+    """
+    def Merge(self):
+        callers     = np.sort(np.fromiter(self.Buffer, dtype=np.int64, count=len(self.Buffer)))
+        self.Sorted = np.insert(self.Sorted, np.searchsorted(self.Sorted, callers), callers)
+        self.Buffer = set()
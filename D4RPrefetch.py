@@ -0,0 +1,253 @@
+#!/usr/bin/python
+import io, codecs, locale, queue, threading, time, multiprocessing
+import gzip, bz2, lzma
+from os.path import splitext
+
+# number of bytes read from a file at once
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+# number of blocks the background reader may read ahead (0 reads in the consumer thread)
+DEFAULT_QUEUE_SIZE = 8
+
+# number of files read ahead at the same time (compressed files are decompressed in their own process)
+DEFAULT_NUMBER_OF_READERS = 2
+
+# markers passed through the block queue
+END_OF_FILE = "EndOfFile"
+ERROR       = "Error"
+
+# supported compressions by file extension and by the leading magic bytes
+COMPRESSIONS  = {".gz": gzip, ".gzip": gzip, ".bz2": bz2, ".xz": lzma, ".lzma": lzma}
+MAGIC_NUMBERS = [(b"\x1f\x8b", gzip), (b"BZh", bz2), (b"\xfd7zXZ\x00", lzma)]
+
+"""
+Compression module (gzip, bz2 or lzma) of a file or None for plain files
+Files are recognized by their extension first and by their magic bytes otherwise
+fileName => Full Path of the file
+"""
+def GetCompression(fileName):
+    extension = splitext(fileName)[1].lower()
+    if extension in COMPRESSIONS:
+        return COMPRESSIONS[extension]
+    with open(fileName, "rb") as f:
+        head = f.read(8)
+    for magic, compression in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+"""
+Open a plain or compressed file for binary reading, compressed files are decompressed while read
+fileName => Full Path of the file
+"""
+def OpenInput(fileName):
+    compression = GetCompression(fileName)
+    if compression is None:
+        return open(fileName, "rb")
+    return compression.open(fileName, "rb")
+
+"""
+Read the (decompressed) blocks of a file
+Yields the blocks followed by (END_OF_FILE, bytesRead, readTime)
+fileName  => Full Path of the file
+blockSize => Number of bytes read at once
+stop      => Event that stops reading early (optional)
+"""
+def ReadFileBlocks(fileName, blockSize, stop = None):
+    bytesRead, readTime = 0, 0.0
+    with OpenInput(fileName) as f:
+        while stop is None or not stop.is_set():
+            start = time.perf_counter()
+            block = f.read(blockSize)
+            readTime  += time.perf_counter() - start
+            bytesRead += len(block)
+            if len(block) == 0:
+                break
+            yield block
+    yield (END_OF_FILE, bytesRead, readTime)
+
+"""
+Body of the background readers, puts the blocks of a file into a queue
+Errors are put into the queue as (ERROR, exception) and raised again in the consumer
+fileName  => Full Path of the file
+blockSize => Number of bytes read at once
+put       => Function putting an item into the queue
+stop      => Event that stops reading early (optional)
+"""
+def ProduceBlocks(fileName, blockSize, put, stop = None):
+    try:
+        for item in ReadFileBlocks(fileName, blockSize, stop):
+            put(item)
+    except Exception as e:
+        put((ERROR, e))
+
+"""
+Body of the decompression processes
+fileName  => Full Path of the file
+blockSize => Number of bytes read at once
+output    => multiprocessing.Queue the blocks are put into
+"""
+def DecompressFile(fileName, blockSize, output):
+    ProduceBlocks(fileName, blockSize, output.put)
+
+"""
+Pipelined reader of the dataset files
+Background readers read the next files block by block into bounded queues while the consumer
+parses the lines of the blocks read before, so disk (or network) reads overlap with parsing.
+Plain files are read by threads, gzip, bz2 and xz files are decompressed in worker processes so
+that several files are decompressed in parallel. The time spent in reads (and decompression)
+and the time the consumer had to wait for them are measured, their difference is the time
+hidden behind parsing.
+"""
+class PrefetchReader(object):
+    """
+    Constructor for the prefetch reader
+    files           => List of Full Paths of the files to be read in this order
+    blockSize       => Number of bytes read at once
+    queueSize       => Maximum number of blocks read ahead per file (0 reads the blocks when they are needed)
+    encoding        => Text encoding of the files (if left blank the default encoding of open)
+    numberOfReaders => Number of files read ahead at the same time
+    """
+    def __init__(self, files, blockSize = DEFAULT_BLOCK_SIZE, queueSize = DEFAULT_QUEUE_SIZE, encoding = None, numberOfReaders = DEFAULT_NUMBER_OF_READERS):
+        self.Files           = list(files)
+        self.BlockSize       = max(1, int(blockSize))
+        self.QueueSize       = max(0, int(queueSize))
+        self.Encoding        = encoding if encoding is not None else locale.getpreferredencoding(False)
+        self.NumberOfReaders = max(1, int(numberOfReaders))
+        self.BytesRead       = 0
+        self.ReadTime        = 0.0
+        self.WaitTime        = 0.0
+        self.Readers         = []
+        self.Stop            = threading.Event()
+
+    """
+    Start the background reader of a file
+    Returns (fileName, queue, reader)
+    fileName => Full Path of the file
+    """
+    def StartReader(self, fileName):
+        if GetCompression(fileName) is not None:
+            output = multiprocessing.Queue(self.QueueSize)
+            reader = multiprocessing.Process(target=DecompressFile, args=(fileName, self.BlockSize, output), daemon=True)
+        else:
+            output = queue.Queue(self.QueueSize)
+            reader = threading.Thread(target=ProduceBlocks, args=(fileName, self.BlockSize, lambda item: self.Put(output, item), self.Stop), daemon=True)
+        reader.start()
+        return fileName, output, reader
+
+    """
+    Put an item into a thread queue unless the consumer stopped reading
+    output => queue.Queue
+    item   => Item to be queued
+    """
+    def Put(self, output, item):
+        while not self.Stop.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    """
+    Blocks of all files in order as (fileName, block) pairs, block is END_OF_FILE after the last block of a file
+    """
+    def IterateBlocks(self):
+        try:
+            started = 0
+            for i in range(len(self.Files)):
+                if self.QueueSize == 0:
+                    # without prefetching every read is waited for
+                    fileName, blocks = self.Files[i], ReadFileBlocks(self.Files[i], self.BlockSize)
+                else:
+                    # keep the next files read in the background
+                    while started < len(self.Files) and len(self.Readers) < self.NumberOfReaders:
+                        self.Readers.append(self.StartReader(self.Files[started]))
+                        started += 1
+                    fileName, output, reader = self.Readers[0]
+                    blocks = self.IterateQueue(output)
+
+                for item in blocks:
+                    if isinstance(item, tuple):
+                        if item[0] == ERROR:
+                            raise item[1]
+                        self.BytesRead += item[1]
+                        self.ReadTime  += item[2]
+                        if self.QueueSize == 0:
+                            self.WaitTime += item[2]
+                        yield fileName, END_OF_FILE
+                        break
+                    yield fileName, item
+
+                if self.QueueSize > 0:
+                    self.Readers.pop(0)[2].join()
+        finally:
+            self.Close()
+
+    """
+    Items of a reader queue, the time spent waiting for them is measured
+    output => Queue of the reader
+    """
+    def IterateQueue(self, output):
+        while True:
+            start = time.perf_counter()
+            item  = output.get()
+            self.WaitTime += time.perf_counter() - start
+            yield item
+
+    """
+    Lines of all files, yields (fileName, lines) for every file in order
+    lines is an iterator over the lines of the file with the newlines translated as in text mode
+    """
+    def __iter__(self):
+        blocks = self.IterateBlocks()
+        for fileName, block in blocks:
+            lines = self.IterateLines(block, blocks)
+            yield fileName, lines
+            # skip whatever the consumer left of the file
+            for line in lines:
+                pass
+
+    """
+    Split the blocks of a single file into lines
+    first  => First block of the file (or END_OF_FILE for an empty file)
+    blocks => Block iterator positioned after the first block
+    """
+    def IterateLines(self, first, blocks):
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(self.Encoding)(), True)
+        pending = ""
+        block   = first
+        while True:
+            final = block is END_OF_FILE
+            lines = (pending + decoder.decode(b"" if final else block, final)).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n"
+            if final:
+                break
+            fileName, block = next(blocks)
+        if len(pending) > 0:
+            yield pending
+
+    """
+    Stop the background readers
+    """
+    def Close(self):
+        self.Stop.set()
+        for fileName, output, reader in self.Readers:
+            if isinstance(reader, multiprocessing.Process):
+                reader.terminate()
+            reader.join()
+        self.Readers = []
+
+    """
+    Read time that overlapped with parsing (seconds)
+    """
+    def GetHiddenTime(self):
+        return max(0.0, self.ReadTime - self.WaitTime)
+
+    """
+    Summary of the reads in printable format
+    """
+    def GetReport(self):
+        return "Read " + str(round(self.BytesRead / (1024.0 * 1024.0), 2)) + " MB in " + str(round(self.ReadTime, 3)) + \
+               " s of I/O and decompression, waited " + str(round(self.WaitTime, 3)) + " s, hidden " + str(round(self.GetHiddenTime(), 3)) + " s"
@@ -0,0 +1,324 @@
+#!/usr/bin/python
+import heapq
+import datetime
+import numpy as np
+from D4RColumnar import ColumnarData, BEGINNING_DATE
+from D4ROriginDestination import SliceOf, DAILY, COMPACT_LIMIT
+
+# per user counters
+CALLS         = "Calls"
+TRANSITIONS   = "Transitions"
+ACTIVE_DAYS   = "ActiveDays"
+DISTRICTS     = "Districts"
+USER_COUNTERS = [CALLS, TRANSITIONS, ACTIVE_DAYS, DISTRICTS]
+
+# per district counters
+USERS             = "Users"
+DISTRICT_COUNTERS = [CALLS, USERS]
+
+# number of entries of every ranking
+DEFAULT_TOP_K = 10
+
+"""
+Indexes of the k largest values without sorting all of them
+The k-th largest value is found with a partial selection, only the values above it and the
+ties at it are ordered. Ties are broken by the smaller key so that the result does not depend
+on the order of the input.
+values => Numpy array of values
+k      => Number of indexes to be returned
+keys   => Numpy array of unique keys of the values (if left blank the positions)
+"""
+def TopK(values, k, keys = None):
+    values = np.asarray(values)
+    keys   = np.arange(len(values)) if keys is None else np.asarray(keys)
+    k      = min(k, len(values))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(values):
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        above     = np.flatnonzero(values > threshold)
+        tied      = np.flatnonzero(values == threshold)
+        needed    = k - len(above)
+        if len(tied) > needed:
+            tied = tied[np.argpartition(keys[tied], needed - 1)[:needed]]
+        candidates = np.concatenate((above, tied))
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.lexsort((keys[candidates], -values[candidates]))]
+
+"""
+Bounded min heap keeping the k largest (key, value) pairs of a stream
+The smallest kept pair is at the top, so a new pair only costs a comparison unless it enters.
+"""
+class TopKHeap(object):
+    """
+    Constructor for the heap
+    k => Number of pairs to keep
+    """
+    def __init__(self, k = DEFAULT_TOP_K):
+        self.K    = k
+        self.Heap = []
+
+    def __len__(self):
+        return len(self.Heap)
+
+    """
+    Add a single pair
+    key   => Unique key (integer)
+    value => Value to be ranked
+    """
+    def Add(self, key, value):
+        # a larger key loses a tie, so it is the smaller item
+        item = (value, -key)
+        if len(self.Heap) < self.K:
+            heapq.heappush(self.Heap, item)
+        elif self.K > 0 and item > self.Heap[0]:
+            heapq.heapreplace(self.Heap, item)
+
+    """
+    Add many pairs at once, only the k largest of them can enter the heap
+    keys   => Numpy array of unique keys
+    values => Numpy array of values
+    """
+    def AddMany(self, keys, values):
+        keys, values = np.asarray(keys), np.asarray(values)
+        for i in TopK(values, self.K, keys).tolist():
+            self.Add(keys[i].item(), values[i].item())
+
+    """
+    Merge the pairs of another heap into this one
+    other => TopKHeap
+    """
+    def Merge(self, other):
+        for value, key in other.Heap:
+            self.Add(-key, value)
+
+    """
+    Kept pairs as a list of (key, value), largest value first
+    """
+    def GetItems(self):
+        return [(-key, value) for value, key in sorted(self.Heap, reverse=True)]
+
+"""
+Per user counters of the columnar data
+Returns (users, {counter: numpy array}) in the order of GetUsers
+columnar => ColumnarData sorted by caller and time
+"""
+def UserCounters(columnar):
+    users     = columnar.GetUsers()
+    userIndex = columnar.GetUserIndex()
+    starts    = columnar.GetUserStarts()
+    location  = columnar.Location
+    days      = columnar.GetDays()
+
+    # a transition is a change of district between consecutive calls of the same user
+    moved = columnar.GetTransitionMask() & (location[1:] != location[:-1])
+
+    # calls are time ordered, so a new active day starts wherever the day changes
+    newDay = np.ones(len(days), dtype=bool)
+    newDay[1:] = days[1:] != days[:-1]
+    newDay[starts[:-1]] = True
+
+    # distinct districts of every user
+    districts, codes = np.unique(location, return_inverse=True)
+    visited = np.unique(userIndex * max(1, len(districts)) + codes) // max(1, len(districts))
+
+    counters = {CALLS:       np.diff(starts),
+                TRANSITIONS: np.bincount(userIndex[1:][moved], minlength=len(users)),
+                ACTIVE_DAYS: np.bincount(userIndex[newDay], minlength=len(users)),
+                DISTRICTS:   np.bincount(visited, minlength=len(users))}
+    return users, counters
+
+"""
+Number of calls and distinct users of every district, sliced by time
+Rows (slice, district, calls, users) are kept sorted in this order. Distinct users are
+counted per added batch, so the calls of a user must not be split over two batches.
+"""
+class DistrictActivity(object):
+    """
+    Constructor for the district activity
+    period => DAILY, MONTHLY, HOUR_OF_DAY, MONTH_OF_YEAR or None (no time slicing)
+    """
+    def __init__(self, period = None):
+        self.Period       = period
+        self.Slice        = np.zeros(0, dtype=np.int64)
+        self.District     = np.zeros(0, dtype=np.int64)
+        self.Calls        = np.zeros(0, dtype=np.int64)
+        self.Users        = np.zeros(0, dtype=np.int64)
+        self.Pending      = []
+        self.PendingCount = 0
+
+    """
+    Add the calls of complete users
+    columnar => ColumnarData sorted by caller and time
+    """
+    def AddColumnar(self, columnar):
+        if len(columnar) == 0:
+            return
+        slices, sliceCodes = np.unique(SliceOf(columnar.Minute, self.Period), return_inverse=True)
+        districts, codes   = np.unique(columnar.Location, return_inverse=True)
+        cells = sliceCodes * len(districts) + codes
+
+        # every (user, slice, district) is counted once for the users
+        visits = np.unique(columnar.GetUserIndex() * (len(slices) * len(districts)) + cells) % (len(slices) * len(districts))
+        calls  = np.bincount(cells, minlength=len(slices) * len(districts))
+        users  = np.bincount(visits, minlength=len(slices) * len(districts))
+        cells  = np.flatnonzero(calls)
+        self.Pending.append((slices[cells // len(districts)], districts[cells % len(districts)].astype(np.int64), calls[cells], users[cells]))
+        self.PendingCount += len(cells)
+        if self.PendingCount > COMPACT_LIMIT:
+            self.Compact()
+
+    """
+    Add a chunk of records of complete users
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def AddRecords(self, records):
+        self.AddColumnar(ColumnarData(records, True))
+
+    """
+    Merge the pending rows into the sorted rows
+    """
+    def Compact(self):
+        if len(self.Pending) == 0:
+            return
+        columns = [self.Slice, self.District, self.Calls, self.Users]
+        for i in range(len(columns)):
+            columns[i] = np.concatenate([columns[i]] + [pending[i] for pending in self.Pending])
+        self.Pending      = []
+        self.PendingCount = 0
+        self.SetRows(*columns)
+
+    """
+    Sort the given rows and sum the counts of the identical keys
+    """
+    def SetRows(self, slices, district, calls, users):
+        order = np.lexsort((district, slices))
+        slices, district, calls, users = slices[order], district[order], calls[order], users[order]
+        if len(order) > 0:
+            new = np.ones(len(order), dtype=bool)
+            new[1:] = (slices[1:] != slices[:-1]) | (district[1:] != district[:-1])
+            starts = np.flatnonzero(new)
+            slices, district = slices[starts], district[starts]
+            calls, users     = np.add.reduceat(calls, starts), np.add.reduceat(users, starts)
+        self.Slice, self.District, self.Calls, self.Users = slices, district, calls, users
+
+    """
+    Merge the activity of another set of users into this one
+    other => DistrictActivity with the same period
+    """
+    def Merge(self, other):
+        other.Compact()
+        self.Pending.append((other.Slice, other.District, other.Calls, other.Users))
+        self.PendingCount += len(other.Slice)
+        self.Compact()
+
+    """
+    Top districts of every slice as a list of (slice, [(district, value)])
+    counter => CALLS or USERS
+    k       => Number of districts per slice
+    """
+    def GetTop(self, counter, k = DEFAULT_TOP_K):
+        self.Compact()
+        values = self.Calls if counter == CALLS else self.Users
+        starts = np.concatenate((np.flatnonzero(np.concatenate(([True], self.Slice[1:] != self.Slice[:-1]))), [len(self.Slice)])) \
+                 if len(self.Slice) > 0 else np.zeros(1, dtype=np.int64)
+        top = []
+        for begin, end in zip(starts[:-1].tolist(), starts[1:].tolist()):
+            districts = self.District[begin:end]
+            best      = TopK(values[begin:end], k, districts)
+            top.append((self.Slice[begin].item(), list(zip(districts[best].tolist(), values[begin:end][best].tolist()))))
+        return top
+
+"""
+Top k rankings of the users and districts of a data set
+The rankings are filled like the other population aggregates, users are ranked in bounded
+heaps and districts are ranked from their sparse activity rows when written.
+"""
+class Rankings(object):
+    """
+    Constructor for the rankings
+    k => Number of entries of every ranking
+    """
+    def __init__(self, k = DEFAULT_TOP_K):
+        self.K              = k
+        self.Users          = dict((counter, TopKHeap(k)) for counter in USER_COUNTERS)
+        self.Districts      = DistrictActivity(None)
+        self.DailyDistricts = DistrictActivity(DAILY)
+
+    """
+    Add a chunk of records of complete users
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def AddRecords(self, records):
+        if len(records) == 0:
+            return
+        columnar = ColumnarData(records, True)
+        users, counters = UserCounters(columnar)
+        for counter in USER_COUNTERS:
+            self.Users[counter].AddMany(users, counters[counter])
+        self.Districts.AddColumnar(columnar)
+        self.DailyDistricts.AddColumnar(columnar)
+
+    """
+    Merge the rankings of another set of users into this one
+    other => Rankings
+    """
+    def Merge(self, other):
+        for counter in USER_COUNTERS:
+            self.Users[counter].Merge(other.Users[counter])
+        self.Districts.Merge(other.Districts)
+        self.DailyDistricts.Merge(other.DailyDistricts)
+
+    """
+    Top users of a counter as a list of (caller, value)
+    counter => One of USER_COUNTERS
+    """
+    def GetTopUsers(self, counter):
+        return self.Users[counter].GetItems()
+
+    """
+    Top districts of a counter as a list of (district, value)
+    counter => One of DISTRICT_COUNTERS
+    """
+    def GetTopDistricts(self, counter):
+        top = self.Districts.GetTop(counter, self.K)
+        return top[0][1] if len(top) > 0 else []
+
+    """
+    Top districts of a counter for every day as a list of (date, [(district, value)])
+    counter => One of DISTRICT_COUNTERS
+    """
+    def GetTopDailyDistricts(self, counter):
+        return [((BEGINNING_DATE + datetime.timedelta(days=day)).date(), top) for day, top in self.DailyDistricts.GetTop(counter, self.K)]
+
+    def __repr__(self):
+        out = ""
+        for counter in USER_COUNTERS:
+            out += "Top Users By " + counter + "\nRank;Caller;" + counter + "\n"
+            for rank, (caller, value) in enumerate(self.GetTopUsers(counter)):
+                out += str(rank + 1) + ";" + str(caller) + ";" + str(value) + "\n"
+            out += "\n"
+        for counter in DISTRICT_COUNTERS:
+            out += "Top Districts By " + counter + "\nRank;District;" + counter + "\n"
+            for rank, (district, value) in enumerate(self.GetTopDistricts(counter)):
+                out += str(rank + 1) + ";" + str(district) + ";" + str(value) + "\n"
+            out += "\n"
+        for counter in DISTRICT_COUNTERS:
+            out += "Top Daily Districts By " + counter + "\nDay;Rank;District;" + counter + "\n"
+            for day, top in self.GetTopDailyDistricts(counter):
+                for rank, (district, value) in enumerate(top):
+                    out += str(day) + ";" + str(rank + 1) + ";" + str(district) + ";" + str(value) + "\n"
+            out += "\n"
+        return out
+
+    def __str__(self):
+        return self.__repr__()
+
+    """
+    Write the rankings in text format
+    fileName => Full Path of the output file
+    """
+    def Write(self, fileName):
+        with open(fileName, "w+") as f:
+            f.write(str(self))
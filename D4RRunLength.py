@@ -0,0 +1,109 @@
+#!/usr/bin/python
+import numpy as np
+from D4RColumnar import MINUTES_IN_AN_HOUR, MINUTES_IN_A_DAY, MinutesToMonths, MonthOfYear
+
+"""
+Counts of call times in the layout of the per user counters
+Returns (hourly, monthly, days, dailyCounts) where hourly[h] counts the calls of hour h + 1 (the calls
+of hour 0 are counted at 23 like the per call counters), monthly[m] the calls of month m + 1 and
+dailyCounts the calls of the sorted active days
+minutes => Numpy array of minutes passed since the beginning date
+"""
+def CountCallTimes(minutes):
+    minutes = np.asarray(minutes, dtype=np.int64)
+    hours   = (minutes // MINUTES_IN_AN_HOUR) % 24
+    months  = MonthOfYear(MinutesToMonths(minutes))
+    days, dailyCounts = np.unique(minutes // MINUTES_IN_A_DAY, return_counts=True)
+    return (np.bincount((hours - 1) % 24, minlength=24).tolist(), np.bincount(months - 1, minlength=12).tolist(),
+            days.tolist(), dailyCounts.tolist())
+
+"""
+Run length encoded trajectory of a user
+Consecutive calls from the same location form a stay stored as (location, number of calls), the
+call times are kept in a single integer array, so a user costs a few bytes per call and every
+transition based computation only walks the stays.
+"""
+class RunLengthTrajectory(object):
+    """
+    Constructor for the trajectory
+    minutes   => Time ordered call times as minutes passed since the beginning date
+    locations => Locations of the calls in the same order
+    """
+    def __init__(self, minutes, locations):
+        locations    = np.asarray(locations)
+        self.Minutes = np.array(minutes, dtype=np.int64)
+        new          = np.ones(len(locations), dtype=bool)
+        new[1:]      = locations[1:] != locations[:-1]
+        starts       = np.flatnonzero(new)
+        self.Locations = locations[starts].astype(np.int32)
+        self.Calls     = np.diff(np.append(starts, len(locations))).astype(np.int32)
+
+    def __len__(self):
+        return len(self.Minutes)
+
+    """
+    Index of the first call of every stay
+    """
+    def GetStarts(self):
+        return np.cumsum(self.Calls) - self.Calls
+
+    """
+    Time of the first call of every stay
+    """
+    def GetFirstMinutes(self):
+        return self.Minutes[self.GetStarts()]
+
+    """
+    Time of the last call of every stay
+    """
+    def GetLastMinutes(self):
+        return self.Minutes[np.cumsum(self.Calls) - 1]
+
+    """
+    Stays as a list of (location, first minute, last minute, number of calls)
+    """
+    def GetStays(self):
+        return list(zip(self.Locations.tolist(), self.GetFirstMinutes().tolist(), self.GetLastMinutes().tolist(), self.Calls.tolist()))
+
+    """
+    Location of every call
+    """
+    def GetLocations(self):
+        return np.repeat(self.Locations, self.Calls)
+
+    """
+    Location of the last call (-1 if there is none)
+    """
+    def GetLastLocation(self):
+        return int(self.Locations[-1]) if len(self.Locations) > 0 else -1
+
+    """
+    Transition counts of the consecutive calls in the order the pairs first occur
+    A stay of n calls makes n - 1 transitions to itself followed by one to the next stay, the last
+    call of the trajectory stays where it is.
+    Returns (occurences, transitions) as {location: calls} and {location: {nextLocation: count}}
+    """
+    def GetTransitions(self):
+        occurences, transitions = {}, {}
+        locations, calls = self.Locations.tolist(), self.Calls.tolist()
+        for i, (location, count) in enumerate(zip(locations, calls)):
+            row = transitions.setdefault(location, {})
+            occurences[location] = occurences.get(location, 0) + count
+            if count > 1:
+                row[location] = row.get(location, 0) + count - 1
+            nextLocation = locations[i + 1] if i + 1 < len(locations) else location
+            row[nextLocation] = row.get(nextLocation, 0) + 1
+        return occurences, transitions
+
+    """
+    Time sliced transition counts of the consecutive calls as {(slice, from, to): count}, every pair
+    is counted in the slice of its first call
+    slices => Numpy array of the slice of every call
+    """
+    def GetSlicedTransitions(self, slices):
+        if len(self.Minutes) < 2:
+            return {}
+        locations = self.GetLocations()
+        keys, counts = np.unique(np.column_stack((np.asarray(slices)[:-1], locations[:-1], locations[1:])), axis=0, return_counts=True)
+        return dict(((int(timeSlice), int(fromLocation), int(toLocation)), int(count))
+                    for (timeSlice, fromLocation, toLocation), count in zip(keys.tolist(), counts.tolist()))
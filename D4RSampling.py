@@ -0,0 +1,122 @@
+#!/usr/bin/python
+import numpy as np
+
+# seed of the caller hash, the same seed always selects the same callers
+DEFAULT_SEED = 0
+
+# hashes are 64 bit unsigned integers
+HASH_MASK = (1 << 64) - 1
+HASH_SIZE = 1 << 64
+
+"""
+Deterministic 64 bit hash of a caller id (splitmix64 finalizer)
+callerId => Id of the caller (integer)
+seed     => Seed of the hash
+"""
+def HashCaller(callerId, seed = DEFAULT_SEED):
+    z = (callerId + (seed + 1) * 0x9E3779B97F4A7C15) & HASH_MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+    return z ^ (z >> 31)
+
+"""
+Vectorized HashCaller of many ids at once (numpy uint64 arithmetic wraps around like the mask)
+ids  => Numpy array of non negative integers
+seed => Seed of the hash
+"""
+def HashArray(ids, seed = DEFAULT_SEED):
+    z = np.asarray(ids).astype(np.uint64) + np.uint64(((seed + 1) * 0x9E3779B97F4A7C15) & HASH_MASK)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+"""
+Stratified hash based sampling of callers
+A caller is kept if its hash falls below the fraction of its stratum (refugees and non refugees),
+so the decision does not depend on the order of the input and a smaller fraction always keeps a
+subset of the callers kept by a larger one. Only the decision of the last caller id text is
+kept, the lines of a caller mostly follow each other and the hash is cheaper than a cache of
+all callers, which would grow with the number of callers.
+"""
+class CallerSampler(object):
+    """
+    Constructor for the caller sampler
+    fraction        => Fraction of the non refugee callers to be kept (between 0 and 1)
+    refugeeFraction => Fraction of the refugee callers to be kept (if left blank the same fraction)
+    seed            => Seed of the caller hash
+    """
+    def __init__(self, fraction = 1.0, refugeeFraction = None, seed = DEFAULT_SEED):
+        self.Fractions    = {False: float(fraction), True: float(fraction if refugeeFraction is None else refugeeFraction)}
+        self.Thresholds   = dict((isRefugee, int(min(max(value, 0.0), 1.0) * HASH_SIZE)) for isRefugee, value in self.Fractions.items())
+        self.Seed         = seed
+        self.LastField    = None
+        self.LastDecision = True
+        self.KeptLines    = 0
+        self.SkippedLines = 0
+
+    """
+    Fraction of the callers kept in a stratum
+    isRefugee => Stratum of the callers (boolean)
+    """
+    def GetFraction(self, isRefugee):
+        return self.Fractions[bool(isRefugee)]
+
+    """
+    Shows whether a caller is in the sample
+    callerId  => Id of the caller (integer)
+    isRefugee => Shows whether the caller is a refugee (boolean)
+    """
+    def IsSampled(self, callerId, isRefugee):
+        return HashCaller(callerId, self.Seed) < self.Thresholds[bool(isRefugee)]
+
+    """
+    Shows whether the caller of a raw caller id field ('1' refugee or '2' non refugee prefix) is in the sample
+    Fields that are not valid caller ids are kept so that the parser can report them
+    field => Caller id field of a line
+    """
+    def IsSampledField(self, field):
+        if field == self.LastField:
+            decision = self.LastDecision
+        else:
+            try:
+                decision = self.IsSampled(int(field[1:]), field[0] == '1')
+            except (ValueError, IndexError):
+                decision = True
+            self.LastField, self.LastDecision = field, decision
+        if decision:
+            self.KeptLines += 1
+        else:
+            self.SkippedLines += 1
+        return decision
+
+"""
+Standard error of the mean of a simple random sample without replacement
+count    => Number of sampled users
+std      => Population standard deviation of the sampled values (numpy array)
+fraction => Sampling fraction (finite population correction)
+"""
+def StandardError(count, std, fraction):
+    std = np.asarray(std, dtype=np.float64)
+    if count < 2:
+        return np.full(std.shape, np.nan)
+    # unbiased sample variance from the population one
+    variance = std * std * count / (count - 1.0)
+    return np.sqrt(max(0.0, 1.0 - fraction) * variance / count)
+
+"""
+Stratified estimate of the population mean and standard deviation
+Every stratum is weighted by its estimated size (sampled users / fraction)
+Returns (mean, std, standardError) numpy arrays
+strata => List of (count, mean, std, fraction) of the strata, means and stds are numpy arrays
+"""
+def StratifiedEstimate(strata):
+    strata = [(count, np.asarray(mean, dtype=np.float64), np.asarray(std, dtype=np.float64), fraction)
+              for count, mean, std, fraction in strata if count > 0 and fraction > 0]
+    if len(strata) == 0:
+        return np.nan, np.nan, np.nan
+    sizes   = np.array([count / fraction for count, mean, std, fraction in strata])
+    weights = sizes / sizes.sum()
+    mean    = sum(weight * stratum[1] for weight, stratum in zip(weights, strata))
+    std     = np.sqrt(sum(weight * (stratum[2] * stratum[2] + (stratum[1] - mean) ** 2) for weight, stratum in zip(weights, strata)))
+    error   = np.sqrt(sum(weight * weight * StandardError(stratum[0], stratum[2], stratum[3]) ** 2 for weight, stratum in zip(weights, strata)))
+    return mean, std, error
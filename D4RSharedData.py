@@ -0,0 +1,216 @@
+#!/usr/bin/python
+import os, json, secrets
+from os.path import join, expanduser, basename
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+from D4RColumnar import ColumnarData
+from D4RParallel import SharedArrays, AttachSharedArrays
+
+# local address of the handshake
+DEFAULT_PORT = 6010
+
+# folder of the key files of the servers started by the user (only readable by the user)
+DEFAULT_KEY_FOLDER = join(expanduser("~"), ".D4RSharedData")
+
+# number of random bytes of the key every server generates
+AUTH_KEY_SIZE = 32
+
+# requests of the handshake, messages are plain bytes and json so nothing received is unpickled
+ATTACH = b"Attach"
+STOP   = b"Stop"
+
+# longest request the server reads
+MAX_REQUEST_SIZE = 64
+
+# version of the handshake, attaching to a server of another version fails
+PROTOCOL_VERSION = 2
+
+"""
+Address of a text given on the command line
+"port" and "host:port" are local TCP addresses, anything else is the path of a unix socket
+text => Address text
+"""
+def ParseAddress(text):
+    text = text.strip()
+    if text.isdigit():
+        return ("localhost", int(text))
+    host, separator, port = text.rpartition(":")
+    if separator != "" and port.isdigit():
+        return (host if host != "" else "localhost", int(port))
+    return text
+
+"""
+Default key file of the server at the given address, in a folder only the user can read
+address => Address of the handshake (see ParseAddress)
+"""
+def GetKeyFile(address):
+    if isinstance(address, tuple):
+        name = address[0] + "_" + str(address[1])
+    else:
+        name = basename(address)
+    return join(DEFAULT_KEY_FOLDER, name + ".key")
+
+"""
+Write a key to a file only the user can read, an existing file is replaced
+fileName => Full Path of the key file
+key      => Key (bytes)
+"""
+def WriteKeyFile(fileName, key):
+    folder = os.path.dirname(os.path.abspath(fileName))
+    if not os.path.isdir(folder):
+        os.makedirs(folder, mode=0o700)
+    if os.path.lexists(fileName):
+        os.remove(fileName)
+    # the file is created with restricted permissions instead of being restricted after it is written
+    descriptor = os.open(fileName, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    with os.fdopen(descriptor, "w") as f:
+        f.write(key.hex())
+
+"""
+Read a key written by WriteKeyFile
+fileName => Full Path of the key file
+"""
+def ReadKeyFile(fileName):
+    with open(fileName) as f:
+        return bytes.fromhex(f.read().strip())
+
+"""
+Long lived owner of a sorted data set in shared memory
+The records and the user starts are copied into shared memory blocks once, analysis processes
+learn the names of the blocks from a short authenticated handshake on a local socket and map the
+same pages, so any number of concurrent analyses costs a single copy of the data.
+Every server generates a random key and writes it to a key file only its user can read. The
+shared memory blocks are created with mode 0600 as well, so only the user running the server can
+attach, with the key file of the server.
+"""
+class SharedDataServer(object):
+    """
+    Constructor for the server, the data is copied into shared memory right away
+    columnar => ColumnarData sorted by caller and time
+    address  => Address of the handshake (see ParseAddress)
+    keyFile  => Full Path of the key file to be written (if left blank see GetKeyFile)
+    """
+    def __init__(self, columnar, address = ("localhost", DEFAULT_PORT), keyFile = None):
+        self.Address  = address
+        self.AuthKey  = secrets.token_bytes(AUTH_KEY_SIZE)
+        self.KeyFile  = GetKeyFile(address) if keyFile is None else keyFile
+        WriteKeyFile(self.KeyFile, self.AuthKey)
+        self.Shared   = SharedArrays({"Records": columnar.Records, "UserStarts": columnar.GetUserStarts()})
+        self.Records  = len(columnar)
+        self.Users    = len(columnar.GetUserStarts()) - 1
+        self.Attached = 0
+
+    """
+    Description of the shared data sent to the attaching processes
+    """
+    def GetDescription(self):
+        return {"Version": PROTOCOL_VERSION, "Spec": self.Shared.Spec, "Records": self.Records, "Users": self.Users}
+
+    """
+    Answer handshakes until a stop request arrives
+    Every connection carries a single request, the attached processes do not hold a connection
+    """
+    def Serve(self):
+        with Listener(self.Address, authkey=self.AuthKey) as listener:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, EOFError, OSError):
+                    continue
+                with connection:
+                    try:
+                        request = connection.recv_bytes(MAX_REQUEST_SIZE)
+                    except (EOFError, OSError):
+                        continue
+                    if request == ATTACH:
+                        connection.send_bytes(json.dumps(self.GetDescription()).encode())
+                        self.Attached += 1
+                    elif request == STOP:
+                        connection.send_bytes(json.dumps(True).encode())
+                        return
+                    else:
+                        connection.send_bytes(json.dumps(None).encode())
+
+    """
+    Release the shared memory and remove the key file, processes that are still attached keep their mapping
+    """
+    def Close(self):
+        self.Shared.Close()
+        if os.path.isfile(self.KeyFile):
+            os.remove(self.KeyFile)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.Close()
+        return False
+
+"""
+Read only view of a data set served by a SharedDataServer
+"""
+class SharedDataSet(object):
+    """
+    Constructor for the view, attaches to the served data right away
+    address => Address of the handshake (see ParseAddress)
+    keyFile => Full Path of the key file of the server (if left blank see GetKeyFile)
+    """
+    def __init__(self, address = ("localhost", DEFAULT_PORT), keyFile = None):
+        with Client(address, authkey=ReadKeyFile(GetKeyFile(address) if keyFile is None else keyFile)) as connection:
+            connection.send_bytes(ATTACH)
+            description = json.loads(connection.recv_bytes().decode())
+        if description is None or description["Version"] != PROTOCOL_VERSION:
+            raise ValueError("Unsupported shared data server at " + str(address))
+
+        # the blocks belong to the server, so they are neither tracked nor unlinked here
+        self.Blocks, arrays = AttachSharedArrays(SharedDataSet.DecodeSpec(description["Spec"]), False)
+        for array in arrays.values():
+            array.flags.writeable = False
+        self.Columnar = ColumnarData(arrays["Records"], True)
+        self.Columnar.UserStarts = arrays["UserStarts"]
+
+    """
+    Shared array spec of a description received as json (lists back to tuples)
+    spec => Spec as decoded from json
+    """
+    @staticmethod
+    def DecodeSpec(spec):
+        decoded = {}
+        for name, (blockName, dtype, shape) in spec.items():
+            if isinstance(dtype, list):
+                dtype = [tuple(field) for field in dtype]
+            decoded[name] = (blockName, dtype, tuple(shape))
+        return decoded
+
+    def __len__(self):
+        return len(self.Columnar)
+
+    """
+    Detach from the shared memory, views of the records shall not be used afterwards
+    """
+    def Close(self):
+        self.Columnar = None
+        for block in self.Blocks:
+            try:
+                block.close()
+            except BufferError:
+                # views of the records are still alive, the mapping is released with them
+                pass
+        self.Blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.Close()
+        return False
+
+"""
+Ask a server to stop answering handshakes
+address => Address of the handshake (see ParseAddress)
+keyFile => Full Path of the key file of the server (if left blank see GetKeyFile)
+"""
+def StopSharedDataServer(address = ("localhost", DEFAULT_PORT), keyFile = None):
+    with Client(address, authkey=ReadKeyFile(GetKeyFile(address) if keyFile is None else keyFile)) as connection:
+        connection.send_bytes(STOP)
+        return json.loads(connection.recv_bytes().decode())
@@ -0,0 +1,281 @@
+#!/usr/bin/python
+import numpy as np
+from D4RColumnar import ColumnarData
+from D4RSampling import HashArray
+from D4RRanking import TopK, DEFAULT_TOP_K
+
+# locality sensitive hashing, every table buckets the users by a signature of bits
+DEFAULT_TABLES         = 16
+DEFAULT_BITS_PER_TABLE = 10
+DEFAULT_SEED           = 0
+
+# number of calls collected before the vectors of the users are calculated
+VECTOR_BATCH_SIZE = 1024 * 1024
+
+# transitions (from, to) are flattened into a single key
+KEY_SHIFT = 32
+
+"""
+Flattened transition matrices of the users of the columnar data as normalized sparse vectors
+Every transition (from, to) of a user becomes the key (from << 32 | to) with the probability of
+the user's Markov matrix (the last call stays in its district), vectors are scaled to unit length.
+Returns (users, offsets, keys, values), the vector of user i is keys[offsets[i]:offsets[i + 1]]
+(sorted) and values[offsets[i]:offsets[i + 1]].
+columnar => ColumnarData sorted by caller and time
+"""
+def TransitionVectors(columnar):
+    users     = columnar.GetUsers()
+    userIndex = columnar.GetUserIndex()
+    location  = columnar.Location.astype(np.int64)
+
+    # next state of every call, the last call of a user stays where it is
+    nextLocation = location.copy()
+    same = columnar.GetTransitionMask()
+    nextLocation[:-1][same] = location[1:][same]
+    keys = (location << KEY_SHIFT) | nextLocation
+
+    # count the transitions and the occurences of every state per user
+    order = np.lexsort((keys, userIndex))
+    user, keys = userIndex[order], keys[order]
+    new = np.ones(len(keys), dtype=bool)
+    new[1:] = (user[1:] != user[:-1]) | (keys[1:] != keys[:-1])
+    starts = np.flatnonzero(new)
+    counts = np.diff(np.append(starts, len(keys))).astype(np.float64)
+    user, keys = user[starts], keys[starts]
+    state  = np.concatenate(([True], (user[1:] != user[:-1]) | ((keys[1:] >> KEY_SHIFT) != (keys[:-1] >> KEY_SHIFT)))) \
+             if len(keys) > 0 else np.zeros(0, dtype=bool)
+    stateIndex = np.cumsum(state) - 1
+    values = counts / np.bincount(stateIndex, weights=counts)[stateIndex]
+
+    # unit length vectors
+    norms   = np.sqrt(np.bincount(user, weights=values * values, minlength=len(users)))
+    values  = values / norms[user]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(user, minlength=len(users))))).astype(np.int64)
+    return users, offsets, keys, values.astype(np.float32)
+
+"""
+Random projection signatures of sparse vectors
+Every bit is the sign of the dot product with a random +1/-1 vector whose entries are hashed
+from the key and the bit, so no projection matrix is stored and any key can be projected.
+Returns a boolean numpy array (vectors x numberOfBits)
+offsets      => Numpy array of the vector offsets
+keys         => Numpy array of the keys of all vectors
+values       => Numpy array of the values of all vectors
+numberOfBits => Number of bits of the signatures
+seed         => Seed of the random vectors
+"""
+def RandomProjections(offsets, keys, values, numberOfBits, seed = DEFAULT_SEED):
+    owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    bits  = np.zeros((len(offsets) - 1, numberOfBits), dtype=bool)
+    for bit in range(numberOfBits):
+        sign = 1.0 - 2.0 * (HashArray(keys, seed * numberOfBits + bit) >> np.uint64(63)).astype(np.float64)
+        bits[:, bit] = np.bincount(owner, weights=values * sign, minlength=len(offsets) - 1) >= 0
+    return bits
+
+"""
+Bucket codes of the signatures, one integer of bitsPerTable bits per table
+Returns an int64 numpy array (vectors x tables)
+bits         => Boolean numpy array of signatures (vectors x tables * bitsPerTable)
+bitsPerTable => Number of bits of every table
+"""
+def BucketCodes(bits, bitsPerTable):
+    weights = np.int64(1) << np.arange(bitsPerTable, dtype=np.int64)
+    tables  = bits.shape[1] // bitsPerTable
+    return (bits.reshape(len(bits), tables, bitsPerTable).astype(np.int64) * weights).sum(axis=2)
+
+"""
+Locality sensitive hashing index of the users' transition matrices
+Users with a similar (cosine) flattened Markov matrix share the bucket of a table with a high
+probability. A query only looks at the users in its buckets and ranks them by their exact cosine
+similarity, buckets are found by binary search in the codes of every table sorted once.
+"""
+class TransitionIndex(object):
+    """
+    Constructor for the index
+    numberOfTables => Number of hash tables, more tables find more of the similar users
+    bitsPerTable   => Number of bits of a bucket, more bits make the buckets smaller
+    seed           => Seed of the random projections
+    batchSize      => Number of calls collected before the vectors of the users are calculated
+    """
+    def __init__(self, numberOfTables = DEFAULT_TABLES, bitsPerTable = DEFAULT_BITS_PER_TABLE, seed = DEFAULT_SEED, batchSize = VECTOR_BATCH_SIZE):
+        self.NumberOfTables = numberOfTables
+        self.BitsPerTable   = bitsPerTable
+        self.Seed           = seed
+        self.BatchSize      = batchSize
+        self.Parts          = []
+        self.Pending        = []
+        self.PendingCount   = 0
+        self.Users          = None
+        self.Offsets        = None
+        self.Keys           = None
+        self.Values         = None
+        self.Codes          = None
+        self.Tables         = None
+
+    """
+    Add a chunk of records of complete users
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def AddRecords(self, records):
+        self.Pending.append(records)
+        self.PendingCount += len(records)
+        if self.PendingCount > self.BatchSize:
+            self.Compact()
+
+    """
+    Calculate the vectors and bucket codes of the pending users
+    """
+    def Compact(self):
+        if len(self.Pending) == 0:
+            return
+        users, offsets, keys, values = TransitionVectors(ColumnarData.FromChunks(self.Pending, True))
+        codes = self.GetCodes(offsets, keys, values)
+        self.Parts.append((users, offsets, keys, values, codes))
+        self.Pending      = []
+        self.PendingCount = 0
+        self.Tables       = None
+
+    """
+    Bucket codes of sparse vectors (vectors x tables)
+    offsets => Numpy array of the vector offsets
+    keys    => Numpy array of the keys of all vectors
+    values  => Numpy array of the values of all vectors
+    """
+    def GetCodes(self, offsets, keys, values):
+        bits = RandomProjections(offsets, keys, values.astype(np.float64), self.NumberOfTables * self.BitsPerTable, self.Seed)
+        return BucketCodes(bits, self.BitsPerTable)
+
+    """
+    Merge the users of another index with the same parameters into this one
+    other => TransitionIndex
+    """
+    def Merge(self, other):
+        other.Compact()
+        self.Parts.extend(other.Parts)
+        self.Tables = None
+
+    """
+    Join the added parts, sort the users by caller and the codes of every table
+    """
+    def Build(self):
+        self.Compact()
+        if self.Tables is not None:
+            return self
+        if self.Users is not None:
+            self.Parts.insert(0, (self.Users, self.Offsets, self.Keys, self.Values, self.Codes))
+        users   = np.concatenate([part[0] for part in self.Parts]) if len(self.Parts) > 0 else np.zeros(0, dtype=np.int64)
+        lengths = np.concatenate([np.diff(part[1]) for part in self.Parts]) if len(self.Parts) > 0 else np.zeros(0, dtype=np.int64)
+        keys    = np.concatenate([part[2] for part in self.Parts]) if len(self.Parts) > 0 else np.zeros(0, dtype=np.int64)
+        values  = np.concatenate([part[3] for part in self.Parts]) if len(self.Parts) > 0 else np.zeros(0, dtype=np.float32)
+        codes   = np.concatenate([part[4] for part in self.Parts]) if len(self.Parts) > 0 else np.zeros((0, self.NumberOfTables), dtype=np.int64)
+        self.Parts = []
+
+        # users sorted by caller, their entries move with them
+        order   = np.argsort(users, kind='stable')
+        starts  = np.concatenate(([0], np.cumsum(lengths)))[:-1]
+        entries = np.repeat(starts[order] - np.concatenate(([0], np.cumsum(lengths[order])))[:-1], lengths[order]) + np.arange(lengths.sum())
+        self.Users   = users[order]
+        self.Offsets = np.concatenate(([0], np.cumsum(lengths[order]))).astype(np.int64)
+        self.Keys    = keys[entries]
+        self.Values  = values[entries]
+        self.Codes   = codes[order]
+
+        # every table keeps the users ordered by their bucket code
+        self.Tables = []
+        for table in range(self.NumberOfTables):
+            members = np.argsort(self.Codes[:, table], kind='stable')
+            self.Tables.append((self.Codes[members, table], members))
+        return self
+
+    def __len__(self):
+        self.Build()
+        return len(self.Users)
+
+    """
+    Position of a caller in the index or None if the caller is not in the index
+    callerId => Id of the caller (integer)
+    """
+    def Find(self, callerId):
+        self.Build()
+        position = int(np.searchsorted(self.Users, callerId))
+        if position < len(self.Users) and self.Users[position] == callerId:
+            return position
+        return None
+
+    """
+    Positions of the users sharing at least one bucket with the given codes
+    codes => Numpy array of bucket codes (one per table)
+    """
+    def GetCandidates(self, codes):
+        candidates = []
+        for table, (sortedCodes, members) in enumerate(self.Tables):
+            begin = np.searchsorted(sortedCodes, codes[table], side='left')
+            end   = np.searchsorted(sortedCodes, codes[table], side='right')
+            candidates.append(members[begin:end])
+        return np.unique(np.concatenate(candidates)) if len(candidates) > 0 else np.zeros(0, dtype=np.int64)
+
+    """
+    Cosine similarity of a sparse vector with the users at the given positions
+    keys      => Sorted numpy array of the keys of the vector
+    values    => Numpy array of the values of the vector (unit length)
+    positions => Numpy array of user positions
+    """
+    def GetSimilarities(self, keys, values, positions):
+        lengths = self.Offsets[positions + 1] - self.Offsets[positions]
+        owner   = np.repeat(np.arange(len(positions)), lengths)
+        entries = np.repeat(self.Offsets[positions] - np.concatenate(([0], np.cumsum(lengths)))[:-1], lengths) + np.arange(lengths.sum())
+        match   = np.minimum(np.searchsorted(keys, self.Keys[entries]), max(0, len(keys) - 1))
+        common  = (keys[match] == self.Keys[entries]) if len(keys) > 0 else np.zeros(len(entries), dtype=bool)
+        products = np.where(common, values[match] * self.Values[entries], 0.0) if len(keys) > 0 else np.zeros(len(entries))
+        return np.bincount(owner, weights=products, minlength=len(positions))
+
+    """
+    Most similar users of a sparse vector as a list of (caller, similarity)
+    keys    => Sorted numpy array of the keys of the vector
+    values  => Numpy array of the values of the vector (unit length)
+    k       => Number of users
+    exclude => Position of a user that is left out (e.g. the queried user itself)
+    """
+    def QueryVector(self, keys, values, k = DEFAULT_TOP_K, exclude = None):
+        self.Build()
+        codes      = self.GetCodes(np.array([0, len(keys)]), keys, values.astype(np.float64))[0]
+        candidates = self.GetCandidates(codes)
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        similarities = self.GetSimilarities(keys, values.astype(np.float64), candidates)
+        best = TopK(similarities, k, self.Users[candidates])
+        return list(zip(self.Users[candidates[best]].tolist(), similarities[best].tolist()))
+
+    """
+    Most similar users of a user of the index as a list of (caller, similarity)
+    Returns None if the caller is not in the index
+    callerId => Id of the caller (integer)
+    k        => Number of users
+    """
+    def Query(self, callerId, k = DEFAULT_TOP_K):
+        position = self.Find(callerId)
+        if position is None:
+            return None
+        begin, end = self.Offsets[position], self.Offsets[position + 1]
+        return self.QueryVector(self.Keys[begin:end], self.Values[begin:end], k, position)
+
+    """
+    Write the index in compressed binary format (npz, whatever the extension)
+    fileName => Full Path of the output file
+    """
+    def Write(self, fileName):
+        self.Build()
+        with open(fileName, "wb") as f:
+            np.savez_compressed(f, Users=self.Users, Offsets=self.Offsets, Keys=self.Keys, Values=self.Values, Codes=self.Codes,
+                                NumberOfTables=np.array(self.NumberOfTables), BitsPerTable=np.array(self.BitsPerTable), Seed=np.array(self.Seed))
+
+    """
+    Read an index written by Write
+    fileName => Full Path of the input file (.npz)
+    """
+    @staticmethod
+    def Read(fileName):
+        with np.load(fileName) as data:
+            index = TransitionIndex(int(data['NumberOfTables']), int(data['BitsPerTable']), int(data['Seed']))
+            index.Parts.append((data['Users'], data['Offsets'], data['Keys'], data['Values'], data['Codes']))
+        return index.Build()
@@ -0,0 +1,493 @@
+#!/usr/bin/python
+import bisect
+import numpy as np
+
+"""
+Running statistics of a fixed number of buckets (hours, months, days...)
+Users are added one at a time so that mean, standard deviation, min, max and quantiles
+of every bucket can be calculated without keeping the values of all users in memory
+"""
+class BucketStatistics(object):
+    """
+    Constructor for the bucket statistics
+    numberOfBuckets => Number of buckets (e.g. NUMBER_OF_HOURS_IN_A_DAY)
+    """
+    def __init__(self, numberOfBuckets):
+        self.NumberOfBuckets = numberOfBuckets
+        self.Count           = 0
+        self.Sum             = np.zeros(numberOfBuckets, dtype=np.float64)
+        self.SumOfSquares    = np.zeros(numberOfBuckets, dtype=np.float64)
+        self.Min             = np.full(numberOfBuckets, np.inf)
+        self.Max             = np.full(numberOfBuckets, -np.inf)
+        self.Sketch          = QuantileSketch()
+
+    """
+    Add the bucket values of a single user
+    values => Values of the user for each bucket (list or numpy array)
+    """
+    def Add(self, values):
+        values = np.asarray(values, dtype=np.float64)[:self.NumberOfBuckets]
+        self.Count        += 1
+        self.Sum          += values
+        self.SumOfSquares += values * values
+        np.minimum(self.Min, values, out=self.Min)
+        np.maximum(self.Max, values, out=self.Max)
+        self.Sketch.Add(values)
+
+    """
+    Merge the statistics of another set of users into this one
+    other => BucketStatistics with the same number of buckets
+    """
+    def Merge(self, other):
+        self.Count        += other.Count
+        self.Sum          += other.Sum
+        self.SumOfSquares += other.SumOfSquares
+        np.minimum(self.Min, other.Min, out=self.Min)
+        np.maximum(self.Max, other.Max, out=self.Max)
+        self.Sketch.Merge(other.Sketch)
+
+    """
+    Accumulators as a dict of numpy arrays (e.g. for a checkpoint)
+    """
+    def GetState(self):
+        state = dict(("Sketch" + name, value) for name, value in self.Sketch.GetState().items())
+        state.update(Count=np.array(self.Count), Sum=self.Sum, SumOfSquares=self.SumOfSquares, Min=self.Min, Max=self.Max)
+        return state
+
+    """
+    Restore the accumulators from a state returned by GetState
+    state => Dict of numpy arrays
+    """
+    def SetState(self, state):
+        self.Count        = int(state['Count'])
+        self.Sum          = np.array(state['Sum'], dtype=np.float64)
+        self.SumOfSquares = np.array(state['SumOfSquares'], dtype=np.float64)
+        self.Min          = np.array(state['Min'], dtype=np.float64)
+        self.Max          = np.array(state['Max'], dtype=np.float64)
+        self.Sketch.SetState(dict((name[len("Sketch"):], value) for name, value in state.items() if name.startswith("Sketch")))
+
+    """
+    Mean of each bucket
+    """
+    def GetMean(self):
+        if self.Count == 0:
+            return [np.nan] * self.NumberOfBuckets
+        return list(self.Sum / self.Count)
+
+    """
+    Standard deviation (population) of each bucket
+    """
+    def GetStd(self):
+        if self.Count == 0:
+            return [np.nan] * self.NumberOfBuckets
+        mean = self.Sum / self.Count
+        # rounding errors may make the variance slightly negative
+        return list(np.sqrt(np.maximum(self.SumOfSquares / self.Count - mean * mean, 0)))
+
+    """
+    Min of each bucket
+    """
+    def GetMin(self):
+        if self.Count == 0:
+            return [np.nan] * self.NumberOfBuckets
+        return [int(x) for x in self.Min]
+
+    """
+    Max of each bucket
+    """
+    def GetMax(self):
+        if self.Count == 0:
+            return [np.nan] * self.NumberOfBuckets
+        return [int(x) for x in self.Max]
+
+    """
+    Approximate quantile of each bucket (see QuantileSketch for the error bound)
+    quantile => Requested quantile between 0 and 1 (e.g. 0.5 for the median)
+    """
+    def GetQuantile(self, quantile):
+        return self.Sketch.GetQuantile(quantile, 0, self.NumberOfBuckets - 1)
+
+"""
+Sparse counter of calendar days
+Only the days with a non zero count are stored as sorted (day index, count) pairs, so the
+memory of a user scales with the number of active days instead of the length of the data set
+"""
+class SparseDailyCounter(object):
+    __slots__ = ("Days", "Counts")
+
+    """
+    Constructor for the sparse daily counter
+    """
+    def __init__(self):
+        self.Days   = []
+        self.Counts = []
+
+    """
+    Increment the count of the given day
+    day    => Day index (number of days passed since the beginning date, may span several years)
+    amount => Amount to be added (default 1)
+    """
+    def Increment(self, day, amount = 1):
+        # time ordered input only touches the end of the lists
+        if len(self.Days) == 0 or self.Days[-1] < day:
+            self.Days.append(day)
+            self.Counts.append(amount)
+        elif self.Days[-1] == day:
+            self.Counts[-1] += amount
+        else:
+            index = bisect.bisect_left(self.Days, day)
+            if self.Days[index] == day:
+                self.Counts[index] += amount
+            else:
+                self.Days.insert(index, day)
+                self.Counts.insert(index, amount)
+
+    """
+    Count of the given day (zero for inactive days)
+    day => Day index
+    """
+    def __getitem__(self, day):
+        index = bisect.bisect_left(self.Days, day)
+        if index < len(self.Days) and self.Days[index] == day:
+            return self.Counts[index]
+        return 0
+
+    def __len__(self):
+        return len(self.Days)
+
+    def __iter__(self):
+        return zip(self.Days, self.Counts)
+
+    def __repr__(self):
+        return str(dict(zip(self.Days, self.Counts)))
+
+    """
+    Dense list of counts of the given day range
+    firstDay => First day index of the range
+    lastDay  => Last day index of the range (inclusive)
+    """
+    def ToDense(self, firstDay, lastDay):
+        dense = [0] * (lastDay - firstDay + 1)
+        for day, count in zip(self.Days, self.Counts):
+            if firstDay <= day <= lastDay:
+                dense[day - firstDay] = count
+        return dense
+
+"""
+Running statistics of calendar days fed by sparse daily counters
+Inactive days of a user count as zero without being stored, only the population
+accumulators cover the whole day range
+"""
+class SparseBucketStatistics(object):
+    """
+    Constructor for the sparse bucket statistics
+    """
+    def __init__(self):
+        self.Count        = 0
+        self.FirstDay     = 0
+        self.Sum          = np.zeros(0, dtype=np.float64)
+        self.SumOfSquares = np.zeros(0, dtype=np.float64)
+        self.Active       = np.zeros(0, dtype=np.int64)
+        self.Min          = np.zeros(0, dtype=np.float64)
+        self.Max          = np.zeros(0, dtype=np.float64)
+        self.Sketch       = QuantileSketch()
+
+    """
+    Grow the accumulators so that they cover the given day range
+    firstDay => First day index to be covered
+    lastDay  => Last day index to be covered (inclusive)
+    """
+    def Cover(self, firstDay, lastDay):
+        if len(self.Sum) > 0:
+            firstDay = min(firstDay, self.FirstDay)
+            lastDay  = max(lastDay, self.FirstDay + len(self.Sum) - 1)
+        before = self.FirstDay - firstDay if len(self.Sum) > 0 else 0
+        after  = lastDay - firstDay + 1 - before - len(self.Sum)
+        if before == 0 and after == 0:
+            return
+        self.Sum          = np.pad(self.Sum, (before, after))
+        self.SumOfSquares = np.pad(self.SumOfSquares, (before, after))
+        self.Active       = np.pad(self.Active, (before, after))
+        self.Min          = np.pad(self.Min, (before, after), constant_values=np.inf)
+        self.Max          = np.pad(self.Max, (before, after), constant_values=-np.inf)
+        self.FirstDay     = firstDay
+
+    """
+    Add the daily counts of a single user
+    counter => SparseDailyCounter of the user
+    """
+    def Add(self, counter):
+        self.Count += 1
+        self.Sketch.Add(counter.Counts, counter.Days)
+        if len(counter.Days) == 0:
+            return
+        self.Cover(counter.Days[0], counter.Days[-1])
+        index  = np.asarray(counter.Days, dtype=np.int64) - self.FirstDay
+        values = np.asarray(counter.Counts, dtype=np.float64)
+        self.Sum[index]          += values
+        self.SumOfSquares[index] += values * values
+        self.Active[index]       += 1
+        self.Min[index]           = np.minimum(self.Min[index], values)
+        self.Max[index]           = np.maximum(self.Max[index], values)
+
+    """
+    Merge the statistics of another set of users into this one
+    other => SparseBucketStatistics
+    """
+    def Merge(self, other):
+        self.Count += other.Count
+        self.Sketch.Merge(other.Sketch)
+        if len(other.Sum) == 0:
+            return
+        self.Cover(other.FirstDay, other.FirstDay + len(other.Sum) - 1)
+        index = slice(other.FirstDay - self.FirstDay, other.FirstDay - self.FirstDay + len(other.Sum))
+        self.Sum[index]          += other.Sum
+        self.SumOfSquares[index] += other.SumOfSquares
+        self.Active[index]       += other.Active
+        self.Min[index]           = np.minimum(self.Min[index], other.Min)
+        self.Max[index]           = np.maximum(self.Max[index], other.Max)
+
+    """
+    Accumulators as a dict of numpy arrays (e.g. for a checkpoint)
+    """
+    def GetState(self):
+        state = dict(("Sketch" + name, value) for name, value in self.Sketch.GetState().items())
+        state.update(Count=np.array(self.Count), FirstDay=np.array(self.FirstDay), Sum=self.Sum, SumOfSquares=self.SumOfSquares,
+                     Active=self.Active, Min=self.Min, Max=self.Max)
+        return state
+
+    """
+    Restore the accumulators from a state returned by GetState
+    state => Dict of numpy arrays
+    """
+    def SetState(self, state):
+        self.Count        = int(state['Count'])
+        self.FirstDay     = int(state['FirstDay'])
+        self.Sum          = np.array(state['Sum'], dtype=np.float64)
+        self.SumOfSquares = np.array(state['SumOfSquares'], dtype=np.float64)
+        self.Active       = np.array(state['Active'], dtype=np.int64)
+        self.Min          = np.array(state['Min'], dtype=np.float64)
+        self.Max          = np.array(state['Max'], dtype=np.float64)
+        self.Sketch.SetState(dict((name[len("Sketch"):], value) for name, value in state.items() if name.startswith("Sketch")))
+
+    """
+    First and last active day of the population ((None, None) if there is no activity)
+    """
+    def GetRange(self):
+        active = np.flatnonzero(self.Active)
+        if len(active) == 0:
+            return None, None
+        return self.FirstDay + int(active[0]), self.FirstDay + int(active[-1])
+
+    """
+    Select the accumulator values of the given day range, days outside the covered range are zero
+    values   => Accumulator array
+    firstDay => First day index of the range
+    lastDay  => Last day index of the range (inclusive)
+    fill     => Value of the days which are not covered
+    """
+    def Select(self, values, firstDay, lastDay, fill = 0):
+        out   = np.full(lastDay - firstDay + 1, fill, dtype=values.dtype)
+        begin = max(firstDay, self.FirstDay)
+        end   = min(lastDay, self.FirstDay + len(values) - 1)
+        if begin <= end:
+            out[begin - firstDay:end - firstDay + 1] = values[begin - self.FirstDay:end - self.FirstDay + 1]
+        return out
+
+    """
+    Mean of each day in the range
+    firstDay => First day index of the range
+    lastDay  => Last day index of the range (inclusive)
+    """
+    def GetMean(self, firstDay, lastDay):
+        if self.Count == 0:
+            return [np.nan] * (lastDay - firstDay + 1)
+        return list(self.Select(self.Sum, firstDay, lastDay) / self.Count)
+
+    """
+    Standard deviation (population) of each day in the range
+    firstDay => First day index of the range
+    lastDay  => Last day index of the range (inclusive)
+    """
+    def GetStd(self, firstDay, lastDay):
+        if self.Count == 0:
+            return [np.nan] * (lastDay - firstDay + 1)
+        mean = self.Select(self.Sum, firstDay, lastDay) / self.Count
+        # rounding errors may make the variance slightly negative
+        return list(np.sqrt(np.maximum(self.Select(self.SumOfSquares, firstDay, lastDay) / self.Count - mean * mean, 0)))
+
+    """
+    Min of each day in the range (zero whenever a user is inactive on that day)
+    firstDay => First day index of the range
+    lastDay  => Last day index of the range (inclusive)
+    """
+    def GetMin(self, firstDay, lastDay):
+        if self.Count == 0:
+            return [np.nan] * (lastDay - firstDay + 1)
+        active = self.Select(self.Active, firstDay, lastDay)
+        low    = self.Select(self.Min, firstDay, lastDay, np.inf)
+        return [int(x) for x in np.where(active < self.Count, 0, low)]
+
+    """
+    Max of each day in the range
+    firstDay => First day index of the range
+    lastDay  => Last day index of the range (inclusive)
+    """
+    def GetMax(self, firstDay, lastDay):
+        if self.Count == 0:
+            return [np.nan] * (lastDay - firstDay + 1)
+        high = self.Select(self.Max, firstDay, lastDay, -np.inf)
+        return [int(x) for x in np.maximum(high, 0)]
+
+    """
+    Approximate quantile of each day in the range (see QuantileSketch for the error bound)
+    quantile => Requested quantile between 0 and 1 (e.g. 0.5 for the median)
+    firstDay => First day index of the range
+    lastDay  => Last day index of the range (inclusive)
+    """
+    def GetQuantile(self, quantile, firstDay, lastDay):
+        return self.Sketch.GetQuantile(quantile, firstDay, lastDay)
+
+# default relative accuracy of the quantile sketches
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# values below this limit are counted exactly by the quantile sketches
+DEFAULT_EXACT_LIMIT = 128
+
+"""
+Mergeable quantile sketch of non negative integer values for a set of buckets
+Small values get one bin each, larger values are binned logarithmically (as in DDSketch)
+with a growth factor of (1 + a) / (1 - a) for the relative accuracy a. The sketch of
+a bucket is just a histogram, so adding users is a single scatter add, merging the
+sketches of two workers is an addition and memory does not depend on the number of users.
+Error bound: quantiles are rank exact (lower quantile) as long as the answer is below
+exactLimit, above it the reported value is within a relative error of a of the exact
+lower quantile. Zeros are not stored, they are derived from the number of users.
+"""
+class QuantileSketch(object):
+    """
+    Constructor for the quantile sketch
+    relativeAccuracy => Relative accuracy a of the values above the exact limit
+    exactLimit       => Values below this limit are counted exactly
+    """
+    def __init__(self, relativeAccuracy = DEFAULT_RELATIVE_ACCURACY, exactLimit = DEFAULT_EXACT_LIMIT):
+        self.RelativeAccuracy = relativeAccuracy
+        self.ExactLimit       = exactLimit
+        self.Gamma            = (1.0 + relativeAccuracy) / (1.0 - relativeAccuracy)
+        self.LogGamma         = np.log(self.Gamma)
+        self.Count            = 0
+        self.FirstBucket      = 0
+        self.Bins             = np.zeros((0, exactLimit), dtype=np.int64)
+
+    """
+    Bin index of the given positive values
+    values => Numpy array of positive values
+    """
+    def GetBins(self, values):
+        bins  = values.astype(np.int64)
+        large = values >= self.ExactLimit
+        if large.any():
+            bins[large] = self.ExactLimit + np.floor(np.log(values[large] / self.ExactLimit) / self.LogGamma).astype(np.int64)
+        return bins
+
+    """
+    Representative value of the given bin indexes
+    bins => Numpy array of bin indexes
+    """
+    def GetValues(self, bins):
+        values = bins.astype(np.float64)
+        large  = bins >= self.ExactLimit
+        # the value in the middle (relatively) of [low, low * gamma)
+        low = self.ExactLimit * np.power(self.Gamma, bins[large] - self.ExactLimit)
+        values[large] = 2.0 * low * self.Gamma / (1.0 + self.Gamma)
+        return values
+
+    """
+    Grow the histogram so that it covers the given buckets and bins
+    firstBucket => First bucket to be covered
+    lastBucket  => Last bucket to be covered (inclusive)
+    lastBin     => Last bin to be covered (inclusive)
+    """
+    def Cover(self, firstBucket, lastBucket, lastBin):
+        if len(self.Bins) > 0:
+            firstBucket = min(firstBucket, self.FirstBucket)
+            lastBucket  = max(lastBucket, self.FirstBucket + len(self.Bins) - 1)
+        before = self.FirstBucket - firstBucket if len(self.Bins) > 0 else 0
+        after  = lastBucket - firstBucket + 1 - before - len(self.Bins)
+        right  = max(0, lastBin + 1 - self.Bins.shape[1])
+        if before > 0 or after > 0 or right > 0:
+            self.Bins        = np.pad(self.Bins, ((before, after), (0, right)))
+            self.FirstBucket = firstBucket
+
+    """
+    Add the values of a single user
+    values  => Values of the user (list or numpy array)
+    buckets => Buckets of the values (if left blank the values belong to buckets 0, 1, 2 ...)
+    """
+    def Add(self, values, buckets = None):
+        self.Count += 1
+        values = np.asarray(values, dtype=np.float64)
+        if buckets is None:
+            buckets = np.arange(len(values))
+        else:
+            buckets = np.asarray(buckets, dtype=np.int64)
+        # zeros are implied by the number of users
+        nonZero = values > 0
+        if not nonZero.any():
+            return
+        values  = values[nonZero]
+        buckets = buckets[nonZero]
+        bins    = self.GetBins(values)
+        self.Cover(int(buckets.min()), int(buckets.max()), int(bins.max()))
+        np.add.at(self.Bins, (buckets - self.FirstBucket, bins), 1)
+
+    """
+    Merge the sketch of another set of users into this one
+    other => QuantileSketch with the same accuracy settings
+    """
+    def Merge(self, other):
+        self.Count += other.Count
+        if len(other.Bins) == 0:
+            return
+        self.Cover(other.FirstBucket, other.FirstBucket + len(other.Bins) - 1, other.Bins.shape[1] - 1)
+        begin = other.FirstBucket - self.FirstBucket
+        self.Bins[begin:begin + len(other.Bins), :other.Bins.shape[1]] += other.Bins
+
+    """
+    Histogram as a dict of numpy arrays, the accuracy settings are not included
+    """
+    def GetState(self):
+        return {"Count": np.array(self.Count), "FirstBucket": np.array(self.FirstBucket), "Bins": self.Bins}
+
+    """
+    Restore the histogram from a state returned by GetState
+    state => Dict of numpy arrays
+    """
+    def SetState(self, state):
+        self.Count       = int(state['Count'])
+        self.FirstBucket = int(state['FirstBucket'])
+        self.Bins        = np.array(state['Bins'], dtype=np.int64)
+
+    """
+    Quantile of each bucket in the range
+    quantile    => Requested quantile between 0 and 1 (e.g. 0.5 for the median)
+    firstBucket => First bucket of the range
+    lastBucket  => Last bucket of the range (inclusive)
+    """
+    def GetQuantile(self, quantile, firstBucket, lastBucket):
+        if self.Count == 0:
+            return [np.nan] * (lastBucket - firstBucket + 1)
+        # histogram of the requested buckets
+        bins  = np.zeros((lastBucket - firstBucket + 1, self.Bins.shape[1]), dtype=np.int64)
+        begin = max(firstBucket, self.FirstBucket)
+        end   = min(lastBucket, self.FirstBucket + len(self.Bins) - 1)
+        if begin <= end:
+            bins[begin - firstBucket:end - firstBucket + 1] = self.Bins[begin - self.FirstBucket:end - self.FirstBucket + 1]
+        # cumulative counts including the implied zeros
+        zeros      = self.Count - bins.sum(axis=1)
+        cumulative = zeros[:, None] + np.cumsum(bins, axis=1)
+        rank       = int(np.floor(quantile * (self.Count - 1)))
+        found      = np.argmax(cumulative > rank, axis=1)
+        values     = self.GetValues(found)
+        values[zeros > rank] = 0
+        return [float(x) for x in values]
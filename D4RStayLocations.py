@@ -0,0 +1,161 @@
+#!/usr/bin/python
+import numpy as np
+from D4RColumnar import BEGINNING_DATE, MINUTES_IN_A_DAY, MINUTES_IN_AN_HOUR
+
+# names of the default time of day windows
+HOME = "Home"
+WORK = "Work"
+
+# time of day windows as (name, hours of the day, weekdays only)
+# nights are spent at home, weekday office hours at work
+DEFAULT_WINDOWS = [(HOME, [22, 23, 0, 1, 2, 3, 4, 5], False),
+                   (WORK, [9, 10, 11, 12, 13, 14, 15, 16], True)]
+
+# number of calls collected before the users of a stream are processed together
+DEFAULT_STAY_BATCH_SIZE = 1024 * 1024
+
+# largest dense (user, location) count array, larger batches are counted by sorting
+BINCOUNT_LIMIT = 16 * 1024 * 1024
+
+"""
+Mask of the calls inside a time of day window
+minutes      => Numpy array of minutes passed since the beginning date
+hours        => List of hours of the day (0 - 23) of the window
+weekdaysOnly => Only count Monday to Friday (boolean)
+"""
+def WindowMask(minutes, hours, weekdaysOnly):
+    isHour = np.zeros(24, dtype=bool)
+    isHour[list(hours)] = True
+    mask = isHour[(minutes // MINUTES_IN_AN_HOUR) % 24]
+    if weekdaysOnly:
+        # Monday is 0, the beginning date is not necessarily a Monday
+        mask &= ((minutes // MINUTES_IN_A_DAY + BEGINNING_DATE.weekday()) % 7) < 5
+    return mask
+
+"""
+Most frequent location of every user with a grouped count over (user, location) codes
+Returns (locations, counts), users without any call get location -1 and count 0.
+Ties go to the smallest location id.
+userIndex     => Numpy array of the user index (0 - numberOfUsers - 1) of every call
+locations     => Numpy array of the location of every call
+numberOfUsers => Number of users
+"""
+def ModalLocations(userIndex, locations, numberOfUsers):
+    modal  = np.full(numberOfUsers, -1, dtype=np.int64)
+    counts = np.zeros(numberOfUsers, dtype=np.int64)
+    if len(locations) == 0:
+        return modal, counts
+
+    # dense location codes keep the keys small
+    districts, codes = np.unique(locations, return_inverse=True)
+    size = len(districts)
+    keys = np.asarray(userIndex, dtype=np.int64) * size + codes
+    if numberOfUsers * size <= BINCOUNT_LIMIT:
+        binned = np.bincount(keys, minlength=numberOfUsers * size)
+        keys   = np.flatnonzero(binned)
+        count  = binned[keys]
+    else:
+        keys, count = np.unique(keys, return_counts=True)
+    user, code = keys // size, keys % size
+
+    # best location first within every user
+    order = np.lexsort((code, -count, user))
+    user, code, count = user[order], code[order], count[order]
+    first = np.concatenate(([True], user[1:] != user[:-1]))
+    modal[user[first]]  = districts[code[first]]
+    counts[user[first]] = count[first]
+    return modal, counts
+
+"""
+Stay locations (e.g. home and work) of a set of users
+Every time of day window gets the modal location of each user's calls inside the window
+"""
+class StayLocations(object):
+    """
+    Constructor for the stay locations
+    users     => Numpy array of caller ids
+    isRefugee => Numpy array of refugee flags of the users
+    windows   => List of (name, hours, weekdaysOnly) time of day windows
+    """
+    def __init__(self, users, isRefugee, windows = DEFAULT_WINDOWS):
+        self.Users     = np.asarray(users, dtype=np.int64)
+        self.IsRefugee = np.asarray(isRefugee, dtype=bool)
+        self.Windows   = windows
+        self.Locations = {}
+        self.Counts    = {}
+
+    """
+    Detect the stay locations of all users of the columnar data at once
+    columnar => ColumnarData sorted by caller and time
+    windows  => List of (name, hours, weekdaysOnly) time of day windows
+    """
+    @staticmethod
+    def Detect(columnar, windows = DEFAULT_WINDOWS):
+        stays     = StayLocations(columnar.GetUsers(), columnar.GetUserIsRefugee(), windows)
+        userIndex = columnar.GetUserIndex()
+        for name, hours, weekdaysOnly in windows:
+            mask = WindowMask(columnar.Minute, hours, weekdaysOnly)
+            stays.Locations[name], stays.Counts[name] = ModalLocations(userIndex[mask], columnar.Location[mask], len(stays.Users))
+        return stays
+
+    """
+    Number of users staying in each district, split by refugee status
+    Returns (districts, nonRefugees, refugees), users without a location in the window are left out
+    window => Name of the window (default HOME)
+    """
+    def GetPopulation(self, window = HOME):
+        locations = self.Locations[window]
+        known     = locations >= 0
+        districts, codes = np.unique(locations[known], return_inverse=True)
+        refugees    = np.bincount(codes[self.IsRefugee[known]], minlength=len(districts))
+        nonRefugees = np.bincount(codes[~self.IsRefugee[known]], minlength=len(districts))
+        return districts, nonRefugees, refugees
+
+"""
+District level population of a stay window accumulated over batches of users
+"""
+class DistrictPopulation(object):
+    """
+    Constructor for the district population
+    window => Name of the window that is counted (default HOME)
+    """
+    def __init__(self, window = HOME):
+        self.Window      = window
+        self.Districts   = np.zeros(0, dtype=np.int64)
+        self.NonRefugees = np.zeros(0, dtype=np.int64)
+        self.Refugees    = np.zeros(0, dtype=np.int64)
+
+    """
+    Add the users of a batch
+    stays => StayLocations
+    """
+    def Add(self, stays):
+        self.AddCounts(*stays.GetPopulation(self.Window))
+
+    """
+    Add district counts
+    districts   => Numpy array of district ids
+    nonRefugees => Numpy array of non refugee counts
+    refugees    => Numpy array of refugee counts
+    """
+    def AddCounts(self, districts, nonRefugees, refugees):
+        districts, codes  = np.unique(np.concatenate((self.Districts, districts)), return_inverse=True)
+        self.NonRefugees  = np.bincount(codes, weights=np.concatenate((self.NonRefugees, nonRefugees)), minlength=len(districts)).astype(np.int64)
+        self.Refugees     = np.bincount(codes, weights=np.concatenate((self.Refugees, refugees)), minlength=len(districts)).astype(np.int64)
+        self.Districts    = districts
+
+    """
+    Merge the population of another set of users into this one
+    other => DistrictPopulation of the same window
+    """
+    def Merge(self, other):
+        self.AddCounts(other.Districts, other.NonRefugees, other.Refugees)
+
+    """
+    Write the population in csv format (one row per district)
+    fileName => Full Path of the output file
+    """
+    def WriteCsv(self, fileName):
+        rows = np.column_stack((self.Districts, self.NonRefugees, self.Refugees, self.NonRefugees + self.Refugees))
+        np.savetxt(fileName, rows, fmt='%d', delimiter=';', comments='',
+                   header="District;" + self.Window + " NonRefugee;" + self.Window + " Refugee;" + self.Window + " Total")
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+import os
+import numpy as np
+from os.path import join
+
+# files of a trajectory store folder
+INDEX_FILE    = "Index.npy"
+MINUTE_FILE   = "Minute.bin"
+LOCATION_FILE = "Location.bin"
+
+# column types of the store
+MINUTE_TYPE   = np.dtype('<i8')
+LOCATION_TYPE = np.dtype('<i4')
+INDEX_TYPE    = [('Caller', '<i8'), ('IsRefugee', '<i1'), ('Offset', '<i8'), ('Length', '<i8')]
+
+"""
+Writer of a persistent trajectory store
+The time sorted calls of every user are appended to flat minute and location files, the index of
+(caller, isRefugee, offset, length) entries is sorted by caller and written when the writer is closed.
+Users may be added in any order, but every user only once.
+"""
+class TrajectoryStoreWriter(object):
+    """
+    Constructor for the trajectory store writer
+    folder => Folder of the store (created if it does not exist)
+    """
+    def __init__(self, folder):
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.Folder    = folder
+        self.Minutes   = open(join(folder, MINUTE_FILE), "wb")
+        self.Locations = open(join(folder, LOCATION_FILE), "wb")
+        self.Entries   = []
+        self.Offset    = 0
+
+    """
+    Append the trajectory of a single user
+    callerId  => Id of the caller (integer)
+    isRefugee => Shows whether the user is a refugee (boolean)
+    minutes   => Time ordered call times as minutes passed since the beginning date
+    locations => Locations of the calls in the same order
+    """
+    def AddUser(self, callerId, isRefugee, minutes, locations):
+        minutes   = np.asarray(minutes, dtype=MINUTE_TYPE)
+        locations = np.asarray(locations, dtype=LOCATION_TYPE)
+        self.Minutes.write(minutes.tobytes())
+        self.Locations.write(locations.tobytes())
+        self.Entries.append((callerId, isRefugee, self.Offset, len(minutes)))
+        self.Offset += len(minutes)
+
+    """
+    Write the index and close the store files
+    """
+    def Close(self):
+        if self.Minutes is None:
+            return
+        self.Minutes.close()
+        self.Locations.close()
+        self.Minutes = self.Locations = None
+        index = np.array(self.Entries, dtype=INDEX_TYPE)
+        index = index[np.argsort(index['Caller'], kind='stable')]
+        if len(index) > 1 and np.any(index['Caller'][1:] == index['Caller'][:-1]):
+            raise ValueError("Trajectory store " + self.Folder + " has callers added more than once")
+        np.save(join(self.Folder, INDEX_FILE), index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.Close()
+        return False
+
+"""
+Read only random access to a trajectory store
+All files are memory mapped, a query binary searches the caller in the index and only touches
+the pages of that caller, so single users are loaded without reading the rest of the data set.
+"""
+class TrajectoryStore(object):
+    """
+    Constructor for the trajectory store
+    folder => Folder of the store written by TrajectoryStoreWriter
+    """
+    def __init__(self, folder):
+        self.Folder    = folder
+        self.Index     = np.load(join(folder, INDEX_FILE), mmap_mode='r')
+        self.Minutes   = TrajectoryStore.MapColumn(join(folder, MINUTE_FILE), MINUTE_TYPE)
+        self.Locations = TrajectoryStore.MapColumn(join(folder, LOCATION_FILE), LOCATION_TYPE)
+
+    """
+    Memory map a flat column file (empty files can not be mapped)
+    fileName => Full Path of the column file
+    dtype    => Type of the column
+    """
+    @staticmethod
+    def MapColumn(fileName, dtype):
+        if os.path.getsize(fileName) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(fileName, dtype=dtype, mode='r')
+
+    def __len__(self):
+        return len(self.Index)
+
+    def __contains__(self, callerId):
+        return self.Find(callerId) is not None
+
+    """
+    Position of a caller in the index or None if the caller is not in the store
+    callerId => Id of the caller (integer)
+    """
+    def Find(self, callerId):
+        callers  = self.Index['Caller']
+        position = int(np.searchsorted(callers, callerId))
+        if position < len(callers) and callers[position] == callerId:
+            return position
+        return None
+
+    """
+    Trajectory of a caller as (isRefugee, minutes, locations) or None if the caller is not in the store
+    callerId => Id of the caller (integer)
+    """
+    def GetUser(self, callerId):
+        position = self.Find(callerId)
+        if position is None:
+            return None
+        entry  = self.Index[position]
+        offset, length = int(entry['Offset']), int(entry['Length'])
+        return bool(entry['IsRefugee']), np.array(self.Minutes[offset:offset + length]), np.array(self.Locations[offset:offset + length])
+
+    """
+    Ids of all callers in the store (sorted)
+    """
+    def GetCallers(self):
+        return self.Index['Caller']
@@ -0,0 +1,170 @@
+#!/usr/bin/python
+import numpy as np
+from D4RExternalSort import RECORD_TYPE
+
+# speed (km/h) above which a jump between two consecutive calls is impossible
+DEFAULT_MAX_SPEED = 200.0
+
+# jumps shorter than this (km) are never flagged, the cells of neighbouring districts overlap
+DEFAULT_MIN_DISTANCE = 50.0
+
+# reasons a call is flagged for
+SPIKE = "Spike"   # the jumps into and out of the call are both impossible
+JUMP  = "Jump"    # only the jump into the call is impossible
+REASONS = [SPIKE, JUMP]
+
+# counters of the report
+CALLS    = "Calls"
+MOVES    = "Moves"
+UNKNOWN  = "UnknownDistance"
+COUNTERS = [CALLS, MOVES, UNKNOWN] + REASONS
+
+# reason code of a call that is not flagged
+KEPT = 0
+
+# number of calls collected before the groups are filtered
+FILTER_BATCH_SIZE = 1024 * 1024
+
+"""
+Data quality filter of impossible travel
+The lowest speed implied by two consecutive calls of a user is the distance of their districts
+over the minutes between them plus one (call times are cut to the minute). A call is a spike if
+both the jump into it and the jump out of it are faster than the maximum speed, spikes are taken
+out first and the remaining calls are flagged as jumps if the jump into them is still too fast.
+Both passes are array operations over all users of a chunk of records.
+"""
+class TravelFilter(object):
+    """
+    Constructor for the filter
+    maxSpeed    => Speed (km/h) above which a jump is impossible
+    drop        => Drop the flagged calls instead of only counting them (boolean)
+    minDistance => Jumps shorter than this (km) are never flagged
+    distances   => DistanceMatrix of the districts (may be set later), unknown distances are never flagged
+    """
+    def __init__(self, maxSpeed = DEFAULT_MAX_SPEED, drop = True, minDistance = DEFAULT_MIN_DISTANCE, distances = None):
+        self.MaxSpeed    = float(maxSpeed)
+        self.Drop        = drop
+        self.MinDistance = float(minDistance)
+        self.Distances   = distances
+        self.Counts      = dict((counter, np.zeros(2, dtype=np.int64)) for counter in COUNTERS)
+
+    """
+    Lowest implied speed (km/h) of the jump into every call
+    Returns (speeds, moved) where speeds are zero for stays and jumps below the minimum distance and
+    nan for the first call of every user and unknown distances
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def GetSpeeds(self, records):
+        speeds = np.full(len(records), np.nan)
+        moved  = np.zeros(len(records), dtype=bool)
+        if len(records) < 2:
+            return speeds, moved
+        caller, minute, location = records['Caller'], records['Minute'], records['Location']
+        same = caller[1:] == caller[:-1]
+        speeds[1:][same] = 0.0
+        moved[1:] = same & (location[1:] != location[:-1])
+        index    = np.flatnonzero(moved)
+        distance = self.Distances.Lookup(location[index - 1], location[index])
+        hours    = (minute[index] - minute[index - 1] + 1) / 60.0
+        speeds[index] = np.where(distance >= self.MinDistance, distance / hours, np.where(np.isnan(distance), np.nan, 0.0))
+        return speeds, moved
+
+    """
+    Reason code of every call, KEPT or the position of its reason in REASONS plus one
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def GetReasons(self, records):
+        reasons = np.full(len(records), KEPT, dtype=np.int8)
+        speeds, moved = self.GetSpeeds(records)
+        with np.errstate(invalid='ignore'):
+            impossible = speeds > self.MaxSpeed
+
+        # outliers between two possible positions
+        spikes = np.zeros(len(records), dtype=bool)
+        spikes[:-1] = impossible[:-1] & impossible[1:]
+        reasons[spikes] = REASONS.index(SPIKE) + 1
+
+        # jumps that remain once the spikes are gone
+        remaining = np.flatnonzero(~spikes)
+        speeds, moved = self.GetSpeeds(records[remaining])
+        with np.errstate(invalid='ignore'):
+            jumps = remaining[speeds > self.MaxSpeed]
+        reasons[jumps] = REASONS.index(JUMP) + 1
+
+        # report of the checked calls
+        isRefugee = records['IsRefugee'][remaining].astype(np.int64)
+        self.Counts[CALLS]   += np.bincount(records['IsRefugee'].astype(np.int64), minlength=2)
+        self.Counts[MOVES]   += np.bincount(isRefugee[moved], minlength=2)
+        self.Counts[UNKNOWN] += np.bincount(isRefugee[moved & np.isnan(speeds)], minlength=2)
+        for code, reason in enumerate(REASONS, 1):
+            self.Counts[reason] += np.bincount(records['IsRefugee'][reasons == code].astype(np.int64), minlength=2)
+        return reasons
+
+    """
+    Mask of the calls that are kept, every call is kept unless the flagged ones are dropped
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def GetKeptMask(self, records):
+        reasons = self.GetReasons(records)
+        return reasons == KEPT if self.Drop else np.ones(len(records), dtype=bool)
+
+    """
+    Records without the dropped calls
+    records => Numpy array of RECORD_TYPE grouped by caller and ordered by time
+    """
+    def Apply(self, records):
+        return records[self.GetKeptMask(records)]
+
+    """
+    Filter caller groups as they arrive
+    Groups are collected into batches which are filtered together and then passed on, the first
+    call of a user is never flagged so no group disappears
+    groups    => Iterable of (callerId, isRefugee, minutes, locations) with time ordered calls
+    batchSize => Maximum number of calls in a batch
+    """
+    def FilterGroups(self, groups, batchSize = FILTER_BATCH_SIZE):
+        batch, size = [], 0
+        for group in groups:
+            if len(batch) > 0 and size + len(group[2]) > batchSize:
+                for filtered in self.FilterBatch(batch):
+                    yield filtered
+                batch, size = [], 0
+            batch.append(group)
+            size += len(group[2])
+        if len(batch) > 0:
+            for filtered in self.FilterBatch(batch):
+                yield filtered
+
+    """
+    Filter a single batch of caller groups together
+    groups => List of (callerId, isRefugee, minutes, locations) with time ordered calls
+    """
+    def FilterBatch(self, groups):
+        lengths = [len(minutes) for callerId, isRefugee, minutes, locations in groups]
+        records = np.empty(sum(lengths), dtype=RECORD_TYPE)
+        records['Caller']    = np.repeat(np.arange(len(groups)), lengths)
+        records['Minute']    = np.concatenate([minutes for callerId, isRefugee, minutes, locations in groups])
+        records['Location']  = np.concatenate([locations for callerId, isRefugee, minutes, locations in groups])
+        records['IsRefugee'] = np.repeat([isRefugee for callerId, isRefugee, minutes, locations in groups], lengths)
+        kept   = self.GetKeptMask(records)
+        starts = np.concatenate(([0], np.cumsum(np.bincount(records['Caller'][kept], minlength=len(groups)))))
+        minutes, locations = records['Minute'][kept], records['Location'][kept]
+        for i, (callerId, isRefugee, groupMinutes, groupLocations) in enumerate(groups):
+            yield callerId, isRefugee, minutes[starts[i]:starts[i + 1]], locations[starts[i]:starts[i + 1]]
+
+    """
+    Merge the counts of another filter into this one
+    other => TravelFilter
+    """
+    def Merge(self, other):
+        for counter in COUNTERS:
+            self.Counts[counter] += other.Counts[counter]
+
+    """
+    Counts of the checked calls and the flagged calls per reason in csv format
+    """
+    def GetReport(self):
+        out  = "Travel Filter;Max Speed;Min Distance;Dropped;" + ";".join("Non Refugee " + counter + ";Refugee " + counter for counter in COUNTERS) + "\n"
+        out += "Filter;" + str(self.MaxSpeed) + ";" + str(self.MinDistance) + ";" + str(self.Drop) + ";" + \
+               ";".join(str(self.Counts[counter][0]) + ";" + str(self.Counts[counter][1]) for counter in COUNTERS) + "\n"
+        return out
@@ -1,954 +1,2560 @@
-#!/usr/bin/python
-import sys, getopt, traceback, datetime
-from os import listdir
-from os.path import isfile, join
-import numpy as np
-
-# global constants used in program
-# Related with day
-NUMBER_OF_HOURS_IN_A_DAY   = 24
-NUMBER_OF_MONTHS_IN_A_YEAR = 12
-NUMBER_OF_DAYS_IN_A_YEAR   = 365
-
-# location of each ID
-CALLER_ID   = 0
-TIME        = 1
-LOCATION_ID = 2
-CITY        = 3
-
-# format of the supported time
-DATE_FORMAT = '%d-%m-%Y %H:%M'
-
-# Ids of the unknown locations in the disctrict mapping file
-UnknownLocationIds = [738, 762, 776]
-
-# log levels
-DEBUG   = 2
-WARNING = 1
-ERROR   = 0
-
-# log names
-LogNames = {"Error: ", "Warning: ", "Debug: "}
-
-"""
-Log Entry Type
-"""
-class LogEntry(object):
-
-    """
-    Constructor for the Log Entry class
-    log   => Log to be stored
-    level => level of the log
-    """
-    def __init__(self, log, level):
-        self.Log   = log
-        self.Level = level
-        
-    def __repr__(self):
-        out = LogNames[self.Level] + self.Log
-        return out
-
-    def __str__(self):
-        out = LogNames[self.Level] + self.Log
-        return out
-
-"""
-Logger
-"""    
-class Logger(object):
-    """
-    Constructor for the Log Entry class
-    fileName   => Full Path of the Log File Name
-    """
-    def __init__(self, fileName):
-        self.Log      = []
-        self.Level    = DEBUG
-        self.FileName = fileName
-
-    def AddLog(self, log, level):
-        curTime = str(datetime.datetime.now().time())
-        newLog = LogEntry(curTime+":"+log, level)
-
-    """
-    Add an error log
-    log => Log to be stored
-    """
-    def AddError(self, log):
-        self.AddLog(log, ERROR)
-    
-    """
-    Add a warning log
-    log => Log to be stored
-    """    
-    def AddWarning(self, log):
-        self.AddLog(log, WARNING)
-    
-    """
-    Add a debug log
-    log => Log to be stored
-    """    
-    def AddDebug(self, log):
-        self.AddLog(log, DEBUG)
-
-    """
-    Set print level to DEBUG
-    """
-    def SetOutDebug(self):
-        self.Level = DEBUG
-
-    """
-    Set print level to WARNING
-    """
-    def SetOutWarning(self):
-        self.Level = WARNING
-
-    """
-    Set print level to ERROR
-    """
-    def SetOutError(self):
-        self.Level = ERROR
-        
-    def __repr__(self):
-        out = ""
-        for log in self.Log:
-            if self.Level >= log.Level:
-                out += Logger.LogNames[i]+log 
-        return out
-    
-    """
-    Print the contents of the Logs based on the set level
-    """
-    def Logout(self):
-        with open(self.FileName, "w+") as f:
-            f.write(self.__repr__())
-
-"""
-Class to store the date from the file
-"""
-class TimeLocation(object):
-    BeginningDate = datetime.datetime.strptime('01-01-2017 00:00', DATE_FORMAT)
-    """
-    Constructor to set the time format
-    time => Formatted time string '%d-%m-%Y %H:%M'
-    """
-    def __init__(self, time, location):
-        # always assume invalid format
-        self.ValidFormat   = False
-        self.Year          = -1
-        self.Month         = -1
-        self.Day           = -1
-        self.Hour          = -1
-        self.Minute        = -1
-        self.Location      = location
-        self.NumberOfDays  = -1
-        try:
-            # read the supported time format from file
-            Time = datetime.datetime.strptime(time, DATE_FORMAT)
-
-            # store only what makes sense
-            self.ValidFormat = True
-            self.Year        = Time.year
-            self.Month       = Time.month
-            self.Day         = Time.day
-            self.Hour        = Time.hour
-            self.Minute      = Time.minute
-            self.Location    = location
-
-            # calculate the number of days passed
-            self.NumberOfDays = abs((Time-TimeLocation.BeginningDate).days)
-            
-        except Exception as e:
-            print("ERROR ", str(e))
-            print(traceback.format_exc())
-            pass
-        
-    def __repr__(self): 
-        TimeInStringFormat = str(self.Location)
-        TimeInStringFormat += ": "
-		# only if it is valid
-        if self.ValidFormat:
-            TimeInStringFormat += str(self.Year)
-            TimeInStringFormat += "-"
-            TimeInStringFormat += str(self.Month)
-            TimeInStringFormat += "-"
-            TimeInStringFormat += str(self.Day)
-            TimeInStringFormat += " "
-            TimeInStringFormat += str(self.Hour)
-            TimeInStringFormat += ":"
-            TimeInStringFormat += str(self.Minute)
-        else :
-            TimeInStringFormat += "XXXX-XX-XX XX:XX"
-        return TimeInStringFormat
-
-    def __lt__(self, other):
-        ret = False
-        # check if both are valid
-        if self.ValidFormat and other.ValidFormat:
-            # just check which happens before
-            if self.Year < other.Year :
-                ret = True
-            elif self.Year == other.Year:
-                if self.Month < other.Month :
-                    ret = True
-                elif self.Month == other.Month:
-                    if self.Day < other.Day :
-                        ret = True
-                    elif self.Day == other.Day:
-                        if self.Hour < other.Hour :
-                            ret = True
-                        elif self.Hour == other.Hour:
-                            if self.Minute < other.Minute :
-                                ret = True
-                                
-        # if other is not valid and self is valid then it is smaller
-        if self.ValidFormat and other.ValidFormat == False:
-            ret = True
-        return ret
-
-class UserTimeSortedLocationData(object):
-    """
-    Constructor for the user centric storage data
-    callerId  => Id of the caller (integer)
-    isRefugee => Shows whether the user is a refugee (boolean)
-    """
-    def __init__(self, callerId, isRefugee):
-        self.Id                        = callerId
-        self.IsRefugee                 = isRefugee
-        self.UserData                  = []
-        self.NumberOfCalls             = 0
-        self.InvalidTimeFormattedCalls = 0
-        self.HourlyNumberOfCalls       = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MonthlyNumberOfCalls      = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.DailyNumberOfCalls        = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MarkovMatrice             = {}
-        self.HourlyNumberOfTrans       = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MonthlyNumberOfTrans      = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.DailyNumberOfTrans        = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.Sorted                    = False
-
-    """
-    Add a new location and time of call to the existing user
-    time => Time and location of the call (TimeLocation)
-    """    
-    def AddNewTimeLocation(self, time):
-        # append self user data
-        self.UserData.append(time)
-
-        # increment total number of calls
-        self.NumberOfCalls = self.NumberOfCalls + 1
-
-        # set the corresponding calls
-        if time.ValidFormat :
-            self.HourlyNumberOfCalls[time.Hour - 1]    = self.HourlyNumberOfCalls[time.Hour - 1] + 1
-            self.MonthlyNumberOfCalls[time.Month - 1]  = self.MonthlyNumberOfCalls[time.Month - 1] + 1
-            self.DailyNumberOfCalls[time.NumberOfDays] = self.DailyNumberOfCalls[time.NumberOfDays] + 1
-        else :
-            self.InvalidTimeFormattedCalls = self.InvalidTimeFormattedCalls + 1     
-
-    """
-    Calculate the number of daily and monthly user state transitions (location changes)
-    """
-    def CalculateTransitionStatistics(self):
-        if self.Sorted == False:
-            # first sort according to call time
-            self.UserData.sort()
-            self.Sorted = True
-            
-        # first just find a location transition
-        prevLocationId = -1
-        
-        # go through all possible locations
-        for timeLocation in self.UserData:
-            # now get the location Id from time location
-            if prevLocationId != timeLocation.Location:
-                prevLocation = timeLocation.Location
-                self.HourlyNumberOfTrans[timeLocation.Hour - 1]    = self.HourlyNumberOfTrans[timeLocation.Hour - 1] + 1
-                self.MonthlyNumberOfTrans[timeLocation.Month - 1]  = self.MonthlyNumberOfTrans[timeLocation.Month - 1] + 1
-                self.DailyNumberOfTrans[timeLocation.NumberOfDays] = self.DailyNumberOfTrans[timeLocation.NumberOfDays] + 1
-            
-
-    """
-    Create a transition matrix between states (Districts in our case) for user
-    This is done for each user for each entry
-    """
-    def CreateTransitionMatrix(self):
-        if self.Sorted == False:
-            # first sort according to call time
-            self.UserData.sort()
-            self.Sorted = True
-        
-        # go through all possible locations
-        for timeLocation in self.UserData:
-            # now get the location Id from time location
-            locationId = timeLocation.Location
-                
-            # check if it is already processed
-            if locationId not in self.MarkovMatrice:
-                # add this location to the matrice
-                self.MarkovMatrice[locationId] = {}
-
-                # tricky call to get all of the members with the same location id and then getting the
-                # next elements since they are the next state thus members of the transition matrix
-                locations = [i+1 for i,x in enumerate(self.UserData) if x.Location == locationId]
-
-                # for every transition
-                for nextLocationIdx in locations:
-                    # check if it is the last element
-                    if nextLocationIdx < len(self.UserData):
-                        # check if already in the map
-                        if self.UserData[nextLocationIdx].Location in self.MarkovMatrice[locationId]:
-                            self.MarkovMatrice[locationId][self.UserData[nextLocationIdx].Location] = \
-                                self.MarkovMatrice[locationId][self.UserData[nextLocationIdx].Location] + 1
-                        # the first occurence
-                        else :
-                            self.MarkovMatrice[locationId][self.UserData[nextLocationIdx].Location] = 1
-                    # last element in the known universe
-                    elif nextLocationIdx == len(self.UserData):
-                        # if already in the row
-                        if locationId in self.MarkovMatrice[locationId]:
-                            self.MarkovMatrice[locationId][locationId] = \
-                                self.MarkovMatrice[locationId][locationId] + 1
-                        # the first occurence
-                        else:
-                            self.MarkovMatrice[locationId][locationId] = 1
-                            
-                # now normalize with the length
-                for nextLocationIdx in self.MarkovMatrice[locationId]:
-                    self.MarkovMatrice[locationId][nextLocationIdx] /= len(locations)
-        
-"""
-Class to read the Data Set Three
-"""
-class DataSetThree(object):
-    """
-    Constructor for data storage class
-    logFileName => Full Path of the Log File
-    """
-    def __init__(self, logFileName = "DataSet3Log.txt"):
-        self.UserLocationData          = {}
-        self.Distances                 = {}
-        self.Logger                    = Logger(logFileName)
-
-        # data statistics
-        # Mean
-        self.MeanTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MeanTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.MeanTotalDailyNumberOfCalls   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MeanRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MeanRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.MeanRefDailyNumberOfCalls     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MeanTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MeanTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MeanTotalDailyNumberOfTrans   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MeanRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MeanRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MeanRefDailyNumberOfTrans     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-
-        # Standard Deviation
-        self.StdTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.StdTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.StdTotalDailyNumberOfCalls   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.StdRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.StdRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.StdRefDailyNumberOfCalls     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.StdTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.StdTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.StdTotalDailyNumberOfTrans   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.StdRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.StdRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.StdRefDailyNumberOfTrans     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-
-        # Min
-        self.MinTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MinTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.MinTotalDailyNumberOfCalls   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MinRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MinRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.MinRefDailyNumberOfCalls     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MinTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MinTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MinTotalDailyNumberOfTrans   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MinRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MinRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MinRefDailyNumberOfTrans     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-
-        # Max
-        self.MaxTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MaxTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.MaxTotalDailyNumberOfCalls   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MaxRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MaxRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
-        self.MaxRefDailyNumberOfCalls     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MaxTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MaxTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MaxTotalDailyNumberOfTrans   = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-        self.MaxRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MaxRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_HOURS_IN_A_DAY
-        self.MaxRefDailyNumberOfTrans     = [0] * NUMBER_OF_DAYS_IN_A_YEAR
-
-    """
-    Parse and store the data in file
-    fileName => Full Path of the dataset three file
-    """
-    def ParseData(self, fileName):
-        # open the file
-        with open(fileName) as f:
-            # begin counting lines 
-            lineNumber = 1
-            # parse each line seperately
-            for line in f:
-                # split comma seperated data and strip contents from white spaces and enter characters
-                data = [x.strip('\n ') for x in line.split(",")]
-                
-                # parsing errors shall not stop us from parsing the file
-                try:
-                    # assign variables
-                    locationId         = int(data[LOCATION_ID]) # id of the location of the caller
-                    callerId           = int(data[CALLER_ID][1:]) # id of the caller or callee
-                    time               = data[TIME] # time of the call
-                    isRefugee          = (data[CALLER_ID][0] == '1') # ids shall begin with a 1:Refugee and 2:Non-Refugee
-                    checkRefugeeSanity = ((data[CALLER_ID][0] == '1') or (data[CALLER_ID][0] == '2')) # just check if everything is valid
-
-                    # parse the time
-                    timeLocation = TimeLocation(time, locationId)
-                    
-                    # just a small piece of error handling for the file to check if it is a valid line to be processed
-                    process = True
-                    # dismiss unknown locations
-                    if locationId in UnknownLocationIds:
-                        self.Logger.AddError("Unknown Location Ids: ", locationId, " at line ", lineNumber, " in file ", fileName)
-                        process = False
-
-                    # dismiss faulty ids
-                    if checkRefugeeSanity == False:
-                        self.Logger.AddError("Problem with Caller id: ", data[CALLER_ID], " at line ", lineNumber, " in file ", fileName)
-                        process = False
-
-                    # dismiss invalid time entries
-                    if timeLocation.ValidFormat == False:
-                        self.Logger.AddError("Problem with Time Format: ", data[TIME], " at line ", lineNumber, " in file ", fileName)
-                        process = False
-
-                    # process valid entries only
-                    if process :
-                        # check if the user is already inside the data
-                        if callerId not in self.UserLocationData :
-                            self.UserLocationData[callerId] = UserTimeSortedLocationData(callerId, isRefugee)
-                        self.UserLocationData[callerId].AddNewTimeLocation(timeLocation)
-                        
-                # exceptions shall be logged and parsing shall continue   
-                except Exception as e:
-                    # just log the exception
-                    self.Logger.AddError(str(e))
-                    self.Logger.AddError(traceback.format_exc())
-                    pass
-
-                # increment line number
-                lineNumber += 1
-        
-    """
-    Get the distance between two districts
-    id1 => id of the first district
-    id2 => id of the second district
-    """
-    def GetDistanceInBetween(self, id1, id2):
-        dist = 0
-        if id1 != id2 :
-            dist = -1
-            if id1 in self.Distances and id2 in self.Distances:
-                if id2 in self.Distances[id1]:
-                    dist = self.Distances[id1][id2]
-                elif id1 in self.Distances[id2]:
-                    dist = self.Distances[id2][id1]
-            elif id1 in self.Distances:
-                if id2 in self.Distances[id1]:
-                    dist = self.Distances[id1][id2]
-            elif id2 in self.Distances:
-                if id1 in self.Distances[id2]:
-                    dist = self.Distances[id2][id1]
-        return dist
-
-    """
-    Parse the contents of distance data between given districts in Turkey
-    fileName => Full Path of the district distances file 
-    """
-    def ParseDistanceData(self, fileName):
-        with open(fileName) as f:
-            lineNumber = 1
-            for line in f:
-                data = [x.strip('\n ') for x in line.split(",") if x.strip('\n ') != '']
-                if len(data) > 1:
-                    self.Distances[int(data[0])] = {}
-                    for d in data[1:]:
-                        s = [x.strip('\n ') for x in d.split(":")]
-                        if len(s) == 2:
-                            self.Distances[int(data[0])][int(s[0])] = float(s[1])
-                        else:
-                            self.Logger.AddError("Wrong input at line: ", lineNumber, " for input: ", s)
-                    lineNumber += 1
-                    
-
-    """
-    Print either to a file or system out
-    fileName => Name of the file (if left blank direct to sys out)
-    """
-    def PrintUserLocationData(self, fileName = None):
-        out = ""
-        for userId,user in self.UserLocationData:
-            out += str(userId) + "=>" + str(user.UserData)
-            out += str(userId) + "=>" + str(user.MarkovMatrice)
-        if fileName == None:
-            print(out)
-        else:
-            with open(fileName) as f:
-                f.write(out)
-
-    """
-    Print either to a file or system out in csv format
-    fileName => Name of the file (if left blank direct to sys out)
-    """
-    def PrintUserStatistics(self, fileName = None):
-        # print out monthly statistics
-        out = "Monthly Statistics;January;February;March;April;May,June;July;August;September;October;November;December\n"
-        out += "Total Mean Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MeanTotalMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Mean Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MeanRefMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Mean Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MeanTotalMonthlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Mean Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MeanRefMonthlyNumberOfTrans[i])
-        out += "\n"
-        out += "Total Std Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.StdTotalMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Std Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.StdRefMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Std Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.StdTotalMonthlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Std Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.StdRefMonthlyNumberOfTrans[i])
-        out += "Total Min Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MinTotalMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Min Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MinRefMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Min Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MinTotalMonthlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Min Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MinRefMonthlyNumberOfTrans[i])
-        out += "Total Max Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MaxTotalMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Max Number Of Calls"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MaxRefMonthlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Max Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MaxTotalMonthlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Max Number Of Transitions"
-        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
-            out += ";" + str(self.MaxRefMonthlyNumberOfTrans[i])
-        out += "\n"
-        out += "\n"
-        out += "\n"
-                
-        # print out daily statistics
-        out += "Daily Statistics"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(i)
-        out += "\n"
-        out += "Total Mean Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MeanTotalDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Mean Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MeanRefDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Mean Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MeanTotalDailyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Mean Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MeanRefDailyNumberOfTrans[i])
-        out += "\n"
-        out += "Total Std Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.StdTotalDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Std Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.StdRefDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Std Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.StdTotalDailyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Std Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.StdRefDailyNumberOfTrans[i])
-        out += "\n"
-        out += "Total Min Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MinTotalDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Std Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MinRefDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Min Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MinTotalDailyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Min Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MinRefDailyNumberOfTrans[i])
-        out += "\n"
-        out += "Total Max Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MaxTotalDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Max Number Of Calls"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MaxRefDailyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Max Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MaxTotalDailyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Max Number Of Transitions"
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            out += ";" + str(self.MaxRefDailyNumberOfTrans[i])
-        out += "\n"
-        out += "\n"
-        out += "\n"
-
-        # print out hourly statistics
-        out += "Hourly Statistics"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(i) + "-" + str(i+1)
-        out += "\n"
-        out += "Total Mean Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MeanTotalHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Mean Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MeanRefHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Mean Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MeanTotalHourlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Mean Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MeanRefHourlyNumberOfTrans[i])
-        out += "\n"
-        out += "Total Std Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.StdTotalHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Std Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.StdRefHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Std Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.StdTotalHourlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Std Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.StdRefHourlyNumberOfTrans[i])
-        out += "\n"
-        out += "Total Min Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MinTotalHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Min Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MinRefHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Min Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MinTotalHourlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Min Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MinRefHourlyNumberOfTrans[i])
-        out += "\n"
-        out += "Total Max Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MaxTotalHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Refugee Max Number Of Calls"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MaxRefHourlyNumberOfCalls[i])
-        out += "\n"
-        out += "Total Max Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MaxTotalHourlyNumberOfTrans[i])
-        out += "\n"
-        out += "Refugee Max Number Of Transitions"
-        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
-            out += ";" + str(self.MaxRefHourlyNumberOfTrans[i])
-
-        # print out the contents
-        if fileName == None:
-            print(out)
-        else:
-            with open(fileName, "w+") as f:
-                f.write(out)
-
-    """
-    Create the transition matrix for each user
-    """ 
-    def CreateTransitionMatrix(self):
-        for userId,user in self.UserLocationData:
-            user.CreateTransitionMatrix()
-    """
-    Calculate some of the user statistics such as
-    Mean of Daily Number of Calls
-    Standard Deviation of Daily Number Of Calls
-    Mean of Monthly Number Of Calls
-    Standard Deviation of Monthly Number Of Calls
-    Mean Of Number Of Daily and Monthly User Transitions
-    """
-    def CalculateUserStatistics(self):
-        # first calculate the number of transitions
-        for userId, user in self.UserLocationData.items():
-            user.CalculateTransitionStatistics()
-  
-        # get monthly and daily statistics
-        for i in range(NUMBER_OF_DAYS_IN_A_YEAR):
-            if i < NUMBER_OF_MONTHS_IN_A_YEAR:
-                # multi use
-                numberOfCalls = [user.MonthlyNumberOfCalls[i] for userId,user in self.UserLocationData.items()]
-                numberOfTrans = [user.MonthlyNumberOfTrans[i] for userId,user in self.UserLocationData.items()]
-                numberOfRefCalls = [user.MonthlyNumberOfCalls[i] for userId,user in self.UserLocationData.items() if user.IsRefugee == True]
-                numberOfRefTrans = [user.MonthlyNumberOfTrans[i] for userId,user in self.UserLocationData.items() if user.IsRefugee == True]
-                
-                # calculate monthly mean
-                self.MeanTotalMonthlyNumberOfCalls[i] = np.mean(numberOfCalls)
-                self.MeanTotalMonthlyNumberOfTrans[i] = np.mean(numberOfTrans)
-                self.MeanRefMonthlyNumberOfCalls[i]   = np.mean(numberOfRefCalls )
-                self.MeanRefMonthlyNumberOfTrans[i]   = np.mean(numberOfRefTrans )
-
-                # calculate monthly standard deviation
-                self.StdTotalMonthlyNumberOfCalls[i] = np.std(numberOfCalls)
-                self.StdTotalMonthlyNumberOfTrans[i] = np.std(numberOfTrans)
-                self.StdRefMonthlyNumberOfCalls[i]   = np.std(numberOfRefCalls)
-                self.StdRefMonthlyNumberOfTrans[i]   = np.std(numberOfRefTrans)
-
-                # calculate monthly min
-                self.MinTotalMonthlyNumberOfCalls[i] = min(numberOfCalls)
-                self.MinTotalMonthlyNumberOfTrans[i] = min(numberOfTrans)
-                self.MinRefMonthlyNumberOfCalls[i]   = min(numberOfRefCalls)
-                self.MinRefMonthlyNumberOfTrans[i]   = min(numberOfRefTrans)
-
-                # calculate monthly min
-                self.MaxTotalMonthlyNumberOfCalls[i] = max(numberOfCalls)
-                self.MaxTotalMonthlyNumberOfTrans[i] = max(numberOfTrans)
-                self.MaxRefMonthlyNumberOfCalls[i]   = max(numberOfRefCalls)
-                self.MaxRefMonthlyNumberOfTrans[i]   = max(numberOfRefTrans)
-
-            if i < NUMBER_OF_HOURS_IN_A_DAY:
-                # multi use
-                numberOfCalls = [user.HourlyNumberOfCalls[i] for userId,user in self.UserLocationData.items()]
-                numberOfTrans = [user.HourlyNumberOfTrans[i] for userId,user in self.UserLocationData.items()]
-                numberOfRefCalls = [user.HourlyNumberOfCalls[i] for userId,user in self.UserLocationData.items() if user.IsRefugee == True]
-                numberOfRefTrans = [user.HourlyNumberOfTrans[i] for userId,user in self.UserLocationData.items() if user.IsRefugee == True]
-                # calculate hourly mean
-                self.MeanTotalHourlyNumberOfCalls[i] = np.mean(numberOfCalls)
-                self.MeanTotalHourlyNumberOfTrans[i] = np.mean(numberOfTrans)
-                self.MeanRefHourlyNumberOfCalls[i]   = np.mean(numberOfRefCalls)
-                self.MeanRefHourlyNumberOfTrans[i]   = np.mean(numberOfRefTrans)
-
-                # calculate hourly standard deviation
-                self.StdTotalHourlyNumberOfCalls[i] = np.std(numberOfCalls)
-                self.StdTotalHourlyNumberOfTrans[i] = np.std(numberOfTrans)
-                self.StdRefHourlyNumberOfCalls[i]   = np.std(numberOfRefCalls)
-                self.StdRefHourlyNumberOfTrans[i]   = np.std(numberOfRefTrans)
-
-                # calculate monthly min
-                self.MinTotalHourlyNumberOfCalls[i] = min(numberOfCalls)
-                self.MinTotalHourlyNumberOfTrans[i] = min(numberOfTrans)
-                self.MinRefHourlyNumberOfCalls[i]   = min(numberOfRefCalls)
-                self.MinRefHourlyNumberOfTrans[i]   = min(numberOfRefTrans)
-
-                # calculate monthly min
-                self.MaxTotalHourlyNumberOfCalls[i] = max(numberOfCalls)
-                self.MaxTotalHourlyNumberOfTrans[i] = max(numberOfTrans)
-                self.MaxRefHourlyNumberOfCalls[i]   = max(numberOfRefCalls)
-                self.MaxRefHourlyNumberOfTrans[i]   = max(numberOfRefTrans)
-
-            # multi use
-            numberOfCalls = [user.DailyNumberOfCalls[i] for userId,user in self.UserLocationData.items()]
-            numberOfTrans = [user.DailyNumberOfTrans[i] for userId,user in self.UserLocationData.items()]
-            numberOfRefCalls = [user.DailyNumberOfCalls[i] for userId,user in self.UserLocationData.items() if user.IsRefugee == True]
-            numberOfRefTrans = [user.DailyNumberOfTrans[i] for userId,user in self.UserLocationData.items() if user.IsRefugee == True]
-                
-            # calculate daily mean
-            self.MeanTotalDailyNumberOfCalls[i] = np.mean(numberOfCalls)
-            self.MeanTotalDailyNumberOfTrans[i] = np.mean(numberOfTrans)
-            self.MeanRefDailyNumberOfCalls[i]   = np.mean(numberOfRefCalls)
-            self.MeanRefDailyNumberOfTrans[i]   = np.mean(numberOfRefTrans)
-
-            # calculate daily standard deviation
-            self.StdTotalDailyNumberOfCalls[i] = np.std(numberOfCalls)
-            self.StdTotalDailyNumberOfTrans[i] = np.std(numberOfTrans)
-            self.StdRefDailyNumberOfCalls[i]   = np.std(numberOfRefCalls)
-            self.StdRefDailyNumberOfTrans[i]   = np.std(numberOfRefTrans)
-            
-            # calculate monthly min
-            self.MinTotalDailyNumberOfCalls[i] = min(numberOfCalls)
-            self.MinTotalDailyNumberOfTrans[i] = min(numberOfTrans)
-            self.MinRefDailyNumberOfCalls[i]   = min(numberOfRefCalls)
-            self.MinRefDailyNumberOfTrans[i]   = min(numberOfRefTrans)
-
-            # calculate monthly min
-            self.MaxTotalDailyNumberOfCalls[i] = max(numberOfCalls)
-            self.MaxTotalDailyNumberOfTrans[i] = max(numberOfTrans)
-            self.MaxRefDailyNumberOfCalls[i]   = max(numberOfRefCalls)
-            self.MaxRefDailyNumberOfTrans[i]   = max(numberOfRefTrans)
-          
-    """
-    Log Out
-    """
-    def Logout(self):
-        self.Logger.Logout()
-
-"""
-Main script to run the Data Set Three
-"""
-class MainDataSetThreeScript(object):
-    """
-    Run the algorithm
-    The following will be done in the given order:
-     - Parse the distances file and store the distance between two districts
-     - Parse each data set 3 file and store them
-     - Create state transition diagram
-     - Print Location data if requested by user
-     - Print Logs
-    Usage:
-     D4R.py -i <Data Set Three Files Folder Path> -d <Distances File Path> -p <Yes/No> -P <File To Print Markov Out>
-     -p and -P are optional
-    """
-    def Run(argv):
-        inputfile = None
-        distances = None
-        markovOut = None
-        printOut  = False
-        out = 'D4R.py -i <Data Set Three Files Folder Path> -d <Distances File Path> -p <Yes/No> -P <File To Print Markov Out>'
-        try:
-           opts, args = getopt.getopt(argv,"hi:d:p:P:",["ifile=dfile=pfile=Pfile="])
-        except getopt.GetoptError:
-           print (out)
-           sys.exit(2)
-        for opt, arg in opts:
-            if opt == '-h':
-                print (out)
-                sys.exit()
-            elif opt in ("-i", "--ifile"):
-                inputfile = arg
-            elif opt in ("-d", "--dfile"):
-                distances = arg
-            elif opt in ("-p", "--pfile"):
-                printOut = (arg.strip().lower == "yes")
-            elif opt in ("-P", "--Pfile"):
-                markovOut = arg
-                
-        # check if the file exists
-        if inputfile is not None and distances is not None:  
-            # parse and process data
-            MainDataSetThreeScript.MainRun(inputfile, distances, printOut, markovOut)
-        else:
-            print (out)
-    """
-    Main Run
-    inputfolder => full path of the folder containing Data Set 3 files
-    distances   => full path of the distances file
-    printOut    => Flag to select whether user data and transition matrix shall be printed (optional default = No)
-    outFile     => full path of the file if user data is to be written out
-    """
-    def MainRun(inputfolder, distances, printOut=False, outFile = None):
-        # create a new set
-        DataSet = DataSetThree()
-        DataSet.ParseDistanceData(distances)
-
-        # get the list of files only
-        files = [join(inputfolder, f) for f in listdir(inputfolder) if isfile(join(inputfolder, f)) ]
-        
-        # iterate through all files
-        for inputfile in files:
-            print("Processing file ", inputfile, " started")
-            DataSet.ParseData(inputfile)
-            print("Processing file ", inputfile, " finished")
-
-        # create per user state transition matrix
-        DataSet.CreateTransitionMatrix()
-
-        # create the transition statistics
-
-        if printOut :
-            # print out the data
-            DataSet.PrintUserLocationData(outFile)
-
-        # log everything
-        DataSet.Logout()
-
-    def StatisticsRun(inputfolder, distances, printOut=False, outFile = None):
-         # create a new set
-        DataSet = DataSetThree()
-        DataSet.ParseDistanceData(distances)
-
-        # get the list of files only
-        files = [join(inputfolder, f) for f in listdir(inputfolder) if isfile(join(inputfolder, f)) ]
-        
-        # iterate through all files
-        for inputfile in files:
-            print("Processing file ", inputfile, " started")
-            DataSet.ParseData(inputfile)
-            print("Processing file ", inputfile, " finished")
-
-        # create the transition statistics
-        DataSet.CalculateUserStatistics()
-
-        if printOut :
-            # print out the data
-            DataSet.PrintUserStatistics(outFile)
-
-        # log everything
-        DataSet.Logout()
-
-# run the code
-if len(sys.argv) > 1:
-    MainDataSetThreeScript.Run(sys.argv[1:])
-else:
-    # MainDataSetThreeScript.MainRun("D:\\work\\D4R\\Dataset3New", "distances.txt", True, "Markov.out")
-    MainDataSetThreeScript.StatisticsRun("D:\\work\\D4R\\Dataset3New", "distances.txt", True, "Statistics.csv")
-print("Operation Finished")
-
+#!/usr/bin/python
+import sys, getopt, traceback, datetime, io, zlib
+from os import listdir
+from os.path import isfile, join, splitext
+import numpy as np
+from D4RExternalSort import ExternalSorter, DEFAULT_MEMORY_BUDGET
+from D4RStatistics import BucketStatistics, SparseBucketStatistics, SparseDailyCounter
+from D4RPipeline import ChunkRecords, GroupCallerChunks, DEFAULT_CHUNK_SIZE
+from D4RExternalSort import RECORD_TYPE
+from D4RColumnar import ColumnarData, BEGINNING_DATE, MINUTES_IN_AN_HOUR, MinutesToMonths, MonthOfYear
+from D4ROriginDestination import OriginDestinationMatrix, TransitionTensor, HOUR_OF_DAY, MONTH_OF_YEAR, DAILY
+from D4RMarkovAnalysis import MarkovBatches, DEFAULT_BATCH_SIZE
+from D4RParallel import ParallelCountTransitions, TransitionStore
+from D4RSampling import CallerSampler, StandardError, StratifiedEstimate
+from D4RTrajectoryStore import TrajectoryStore, TrajectoryStoreWriter
+from D4RDistances import DistanceMatrix, LoadCompletedDistances
+from D4RStayLocations import StayLocations, DistrictPopulation, HOME, WORK, DEFAULT_STAY_BATCH_SIZE
+from D4RRanking import Rankings, DEFAULT_TOP_K
+from D4RAnomaly import ActivityAnomalies, ActivityTensor
+from D4RCentrality import DistrictCentrality
+from D4RClustering import UserClusters, DEFAULT_CLUSTERS
+from D4RSimilarity import TransitionIndex
+from D4RDwellTimes import TimeDistributions
+from D4RHierarchy import RegionHierarchy, PROVINCE
+from D4RSharedData import SharedDataServer, SharedDataSet, StopSharedDataServer, ParseAddress
+from D4RTravelFilter import TravelFilter, DEFAULT_MAX_SPEED, COUNTERS as TRAVEL_COUNTERS
+from D4RRunLength import RunLengthTrajectory, CountCallTimes
+from D4RCheckpoint import Checkpoint
+from D4RPrefetch import PrefetchReader, OpenInput, GetCompression, DEFAULT_BLOCK_SIZE, DEFAULT_QUEUE_SIZE
+
+# global constants used in program
+# Related with day
+NUMBER_OF_HOURS_IN_A_DAY   = 24
+NUMBER_OF_MONTHS_IN_A_YEAR = 12
+
+# location of each ID
+CALLER_ID   = 0
+TIME        = 1
+LOCATION_ID = 2
+CITY        = 3
+
+# format of the supported time
+DATE_FORMAT = '%d-%m-%Y %H:%M'
+
+# format of the dates limiting the daily statistics
+DAY_FORMAT = '%d-%m-%Y'
+
+# Ids of the unknown locations in the disctrict mapping file
+UnknownLocationIds = [738, 762, 776]
+
+# user counters that are summarized by the population statistics
+StatisticsCounterNames = ["HourlyNumberOfCalls", "MonthlyNumberOfCalls", "DailyNumberOfCalls",
+                          "HourlyNumberOfTrans", "MonthlyNumberOfTrans", "DailyNumberOfTrans"]
+
+# user counters which are stored sparsely per calendar day
+DailyCounterNames = ["DailyNumberOfCalls", "DailyNumberOfTrans"]
+
+# population groups of the statistics (Total => all users, Ref => refugees only)
+StatisticsGroupNames = ["Total", "Ref"]
+
+# percentiles calculated from the quantile sketches and printed with the statistics
+PrintedPercentiles = [50, 90, 99]
+
+# phases of the runs whose state is checkpointed
+PARSED_PHASE     = "Parsed"      # columnar data after parsing (and filtering) all files
+STATISTICS_PHASE = "Statistics"  # running statistics of all users
+
+# log levels
+DEBUG   = 2
+WARNING = 1
+ERROR   = 0
+
+# log names
+LogNames = {"Error: ", "Warning: ", "Debug: "}
+
+"""
+Log Entry Type
+"""
+class LogEntry(object):
+
+    """
+    Constructor for the Log Entry class
+    log   => Log to be stored
+    level => level of the log
+    """
+    def __init__(self, log, level):
+        self.Log   = log
+        self.Level = level
+        
+    def __repr__(self):
+        out = LogNames[self.Level] + self.Log
+        return out
+
+    def __str__(self):
+        out = LogNames[self.Level] + self.Log
+        return out
+
+"""
+Logger
+"""    
+class Logger(object):
+    """
+    Constructor for the Log Entry class
+    fileName   => Full Path of the Log File Name
+    """
+    def __init__(self, fileName):
+        self.Log      = []
+        self.Level    = DEBUG
+        self.FileName = fileName
+
+    def AddLog(self, log, level):
+        curTime = str(datetime.datetime.now().time())
+        newLog = LogEntry(curTime+":"+log, level)
+
+    """
+    Add an error log
+    log => Log to be stored
+    """
+    def AddError(self, log):
+        self.AddLog(log, ERROR)
+    
+    """
+    Add a warning log
+    log => Log to be stored
+    """    
+    def AddWarning(self, log):
+        self.AddLog(log, WARNING)
+    
+    """
+    Add a debug log
+    log => Log to be stored
+    """    
+    def AddDebug(self, log):
+        self.AddLog(log, DEBUG)
+
+    """
+    Set print level to DEBUG
+    """
+    def SetOutDebug(self):
+        self.Level = DEBUG
+
+    """
+    Set print level to WARNING
+    """
+    def SetOutWarning(self):
+        self.Level = WARNING
+
+    """
+    Set print level to ERROR
+    """
+    def SetOutError(self):
+        self.Level = ERROR
+        
+    def __repr__(self):
+        out = ""
+        for log in self.Log:
+            if self.Level >= log.Level:
+                out += Logger.LogNames[i]+log 
+        return out
+    
+    """
+    Print the contents of the Logs based on the set level
+    """
+    def Logout(self):
+        with open(self.FileName, "w+") as f:
+            f.write(self.__repr__())
+
+"""
+Class to store the date from the file
+"""
+class TimeLocation(object):
+    BeginningDate = BEGINNING_DATE
+    """
+    Constructor to set the time format
+    time => Formatted time string '%d-%m-%Y %H:%M'
+    """
+    def __init__(self, time, location):
+        # always assume invalid format
+        self.ValidFormat     = False
+        self.Year            = -1
+        self.Month           = -1
+        self.Day             = -1
+        self.Hour            = -1
+        self.Minute          = -1
+        self.Location        = location
+        self.NumberOfDays    = -1
+        self.NumberOfMinutes = -1
+        # time may be left blank when the time is set later on
+        if time is None:
+            return
+        try:
+            # read the supported time format from file
+            self.SetTime(datetime.datetime.strptime(time, DATE_FORMAT))
+            
+        except Exception as e:
+            print("ERROR ", str(e))
+            print(traceback.format_exc())
+            pass
+
+    """
+    Set the time fields from a parsed time
+    Time => Time of the call (datetime)
+    """
+    def SetTime(self, Time):
+        # store only what makes sense
+        self.ValidFormat = True
+        self.Year        = Time.year
+        self.Month       = Time.month
+        self.Day         = Time.day
+        self.Hour        = Time.hour
+        self.Minute      = Time.minute
+
+        # calculate the number of days and minutes passed (negative before the beginning date)
+        self.NumberOfDays    = (Time-TimeLocation.BeginningDate).days
+        self.NumberOfMinutes = int((Time-TimeLocation.BeginningDate).total_seconds()) // 60
+
+    """
+    Create a time location from the number of minutes passed since the beginning date
+    minutes  => Number of minutes passed since the beginning date (integer)
+    location => Id of the location of the call (integer)
+    """
+    @staticmethod
+    def FromMinutes(minutes, location):
+        timeLocation = TimeLocation(None, location)
+        timeLocation.SetTime(TimeLocation.BeginningDate + datetime.timedelta(minutes=int(minutes)))
+        return timeLocation
+
+    """
+    Day index (number of days passed since the beginning date) of the given date
+    date => Formatted date string '%d-%m-%Y'
+    """
+    @staticmethod
+    def DayIndexOf(date):
+        return (datetime.datetime.strptime(date, DAY_FORMAT) - TimeLocation.BeginningDate).days
+        
+    def __repr__(self): 
+        TimeInStringFormat = str(self.Location)
+        TimeInStringFormat += ": "
+		# only if it is valid
+        if self.ValidFormat:
+            TimeInStringFormat += str(self.Year)
+            TimeInStringFormat += "-"
+            TimeInStringFormat += str(self.Month)
+            TimeInStringFormat += "-"
+            TimeInStringFormat += str(self.Day)
+            TimeInStringFormat += " "
+            TimeInStringFormat += str(self.Hour)
+            TimeInStringFormat += ":"
+            TimeInStringFormat += str(self.Minute)
+        else :
+            TimeInStringFormat += "XXXX-XX-XX XX:XX"
+        return TimeInStringFormat
+
+    def __lt__(self, other):
+        ret = False
+        # check if both are valid
+        if self.ValidFormat and other.ValidFormat:
+            # just check which happens before
+            if self.Year < other.Year :
+                ret = True
+            elif self.Year == other.Year:
+                if self.Month < other.Month :
+                    ret = True
+                elif self.Month == other.Month:
+                    if self.Day < other.Day :
+                        ret = True
+                    elif self.Day == other.Day:
+                        if self.Hour < other.Hour :
+                            ret = True
+                        elif self.Hour == other.Hour:
+                            if self.Minute < other.Minute :
+                                ret = True
+                                
+        # if other is not valid and self is valid then it is smaller
+        if self.ValidFormat and other.ValidFormat == False:
+            ret = True
+        return ret
+
+class UserTimeSortedLocationData(object):
+    """
+    Constructor for the user centric storage data
+    callerId  => Id of the caller (integer)
+    isRefugee => Shows whether the user is a refugee (boolean)
+    """
+    def __init__(self, callerId, isRefugee):
+        self.Id                        = callerId
+        self.IsRefugee                 = isRefugee
+        self.UserData                  = []
+        self.NumberOfCalls             = 0
+        self.InvalidTimeFormattedCalls = 0
+        self.HourlyNumberOfCalls       = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MonthlyNumberOfCalls      = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.DailyNumberOfCalls        = SparseDailyCounter()
+        self.TransitionSource          = None
+        self.Transitions               = {}
+        self.MarkovMatrice             = {}
+        self.HourlyMarkovTensor        = {}
+        self.MonthlyMarkovTensor       = {}
+        self.StationaryDistribution    = {}
+        self.ExpectedReturnTimes       = {}
+        self.NStepDistribution         = {}
+        self.HomeLocation              = None
+        self.WorkLocation              = None
+        self.HourlyNumberOfTrans       = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MonthlyNumberOfTrans      = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.DailyNumberOfTrans        = SparseDailyCounter()
+        self.Sorted                    = False
+        self.Runs                      = None
+
+    """
+    Create the user from already time sorted records (e.g. the output of the external sort)
+    callerId  => Id of the caller (integer)
+    isRefugee => Shows whether the user is a refugee (boolean)
+    minutes   => Time ordered call times as minutes passed since the beginning date
+    locations => Locations of the calls in the same order
+    runLength => Store the calls run length encoded instead of one TimeLocation per call (boolean)
+    """
+    @staticmethod
+    def FromSortedRecords(callerId, isRefugee, minutes, locations, runLength = False):
+        user = UserTimeSortedLocationData(callerId, isRefugee)
+        if runLength:
+            user.SetRuns(RunLengthTrajectory(minutes, locations))
+            return user
+        for minute, location in zip(minutes, locations):
+            user.AddNewTimeLocation(TimeLocation.FromMinutes(minute, int(location)))
+        user.Sorted = True
+        return user
+
+    """
+    Store the calls of a new user run length encoded, the call counters are taken from the call times
+    runs => RunLengthTrajectory of the time ordered calls
+    """
+    def SetRuns(self, runs):
+        self.Runs          = runs
+        self.Sorted        = True
+        self.NumberOfCalls = len(runs)
+        hourly, monthly, days, counts = CountCallTimes(runs.Minutes)
+        self.HourlyNumberOfCalls  = hourly
+        self.MonthlyNumberOfCalls = monthly
+        for day, count in zip(days, counts):
+            self.DailyNumberOfCalls.Increment(day, count)
+
+    """
+    Replace the stored calls by their run length encoding, the call counters are kept as they are
+    """
+    def EncodeRunLengths(self):
+        if self.Runs is not None:
+            return
+        records       = self.GetRecords()
+        self.Runs     = RunLengthTrajectory(records['Minute'], records['Location'])
+        self.UserData = []
+
+    """
+    Time sorted calls of the user as a numpy array of RECORD_TYPE
+    """
+    def GetRecords(self):
+        if self.Runs is not None:
+            records = np.empty(len(self.Runs), dtype=RECORD_TYPE)
+            records['Caller']    = self.Id
+            records['Minute']    = self.Runs.Minutes
+            records['Location']  = self.Runs.GetLocations()
+            records['IsRefugee'] = self.IsRefugee
+            return records
+        if self.Sorted == False:
+            # first sort according to call time
+            self.UserData.sort()
+            self.Sorted = True
+        records = np.empty(len(self.UserData), dtype=RECORD_TYPE)
+        records['Caller']    = self.Id
+        records['Minute']    = [timeLocation.NumberOfMinutes for timeLocation in self.UserData]
+        records['Location']  = [timeLocation.Location for timeLocation in self.UserData]
+        records['IsRefugee'] = self.IsRefugee
+        return records
+
+    """
+    Time sorted calls of the user as TimeLocation objects (decoded if the calls are run length encoded)
+    """
+    def GetTimeLocations(self):
+        if self.Runs is not None:
+            return [TimeLocation.FromMinutes(minute, location) for minute, location in zip(self.Runs.Minutes.tolist(), self.Runs.GetLocations().tolist())]
+        return self.UserData
+
+    """
+    Location of the last call of the user (-1 if there is none)
+    """
+    def GetLastLocation(self):
+        if self.Runs is not None:
+            return self.Runs.GetLastLocation()
+        return self.UserData[-1].Location if len(self.UserData) > 0 else -1
+
+    """
+    Add a new location and time of call to the existing user
+    time => Time and location of the call (TimeLocation)
+    """    
+    def AddNewTimeLocation(self, time):
+        # append self user data
+        self.UserData.append(time)
+
+        # increment total number of calls
+        self.NumberOfCalls = self.NumberOfCalls + 1
+
+        # set the corresponding calls
+        if time.ValidFormat :
+            self.HourlyNumberOfCalls[time.Hour - 1]    = self.HourlyNumberOfCalls[time.Hour - 1] + 1
+            self.MonthlyNumberOfCalls[time.Month - 1]  = self.MonthlyNumberOfCalls[time.Month - 1] + 1
+            self.DailyNumberOfCalls.Increment(time.NumberOfDays)
+        else :
+            self.InvalidTimeFormattedCalls = self.InvalidTimeFormattedCalls + 1     
+
+    """
+    Calculate the number of daily and monthly user state transitions (location changes)
+    """
+    def CalculateTransitionStatistics(self):
+        # a transition starts every stay of the run length encoding
+        if self.Runs is not None:
+            hourly, monthly, days, counts = CountCallTimes(self.Runs.GetFirstMinutes())
+            for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+                self.HourlyNumberOfTrans[i] += hourly[i]
+            for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+                self.MonthlyNumberOfTrans[i] += monthly[i]
+            for day, count in zip(days, counts):
+                self.DailyNumberOfTrans.Increment(day, count)
+            return
+
+        if self.Sorted == False:
+            # first sort according to call time
+            self.UserData.sort()
+            self.Sorted = True
+            
+        # first just find a location transition
+        prevLocationId = -1
+        
+        # go through all possible locations
+        for timeLocation in self.UserData:
+            # now get the location Id from time location
+            if prevLocationId != timeLocation.Location:
+                prevLocationId = timeLocation.Location
+                self.HourlyNumberOfTrans[timeLocation.Hour - 1]    = self.HourlyNumberOfTrans[timeLocation.Hour - 1] + 1
+                self.MonthlyNumberOfTrans[timeLocation.Month - 1]  = self.MonthlyNumberOfTrans[timeLocation.Month - 1] + 1
+                self.DailyNumberOfTrans.Increment(timeLocation.NumberOfDays)
+            
+
+    """
+    Transition dict of the user, dicts left to a TransitionStore are built when they are used first
+    name => "Markov", "Hourly" or "Monthly"
+    """
+    def GetTransitions(self, name):
+        if self.Transitions[name] is None:
+            store, userIndex = self.TransitionSource
+            self.Transitions[name] = store.GetTransitions(name, userIndex)
+        return self.Transitions[name]
+
+    """
+    Leave the transition dicts of the user to the counts of a TransitionStore
+    store     => TransitionStore of the counted users
+    userIndex => Position of the user in the counted users
+    """
+    def SetTransitionSource(self, store, userIndex):
+        self.TransitionSource = (store, userIndex)
+        self.Transitions      = {"Markov": None, "Hourly": None, "Monthly": None}
+
+    """
+    Transition probabilities between the locations as {from: {to: probability}}
+    """
+    @property
+    def MarkovMatrice(self):
+        return self.GetTransitions("Markov")
+
+    @MarkovMatrice.setter
+    def MarkovMatrice(self, value):
+        self.Transitions["Markov"] = value
+
+    """
+    Hour of day sliced transition counts as {(hour, from, to): count}
+    """
+    @property
+    def HourlyMarkovTensor(self):
+        return self.GetTransitions("Hourly")
+
+    @HourlyMarkovTensor.setter
+    def HourlyMarkovTensor(self, value):
+        self.Transitions["Hourly"] = value
+
+    """
+    Month of year sliced transition counts as {(month, from, to): count}
+    """
+    @property
+    def MonthlyMarkovTensor(self):
+        return self.GetTransitions("Monthly")
+
+    @MonthlyMarkovTensor.setter
+    def MonthlyMarkovTensor(self, value):
+        self.Transitions["Monthly"] = value
+
+    """
+    Create a transition matrix between states (Districts in our case) for user
+    This is done for each user for each entry
+    In the same pass the hour of day and month sliced transition counts are stored sparsely
+    as {(slice, from, to): count} in HourlyMarkovTensor (hour 0 - 23) and MonthlyMarkovTensor (month 0 - 11)
+    """
+    def CreateTransitionMatrix(self):
+        if self.Sorted == False:
+            # first sort according to call time
+            self.UserData.sort()
+            self.Sorted = True
+
+        self.MarkovMatrice       = {}
+        self.HourlyMarkovTensor  = {}
+        self.MonthlyMarkovTensor = {}
+        occurences               = {}
+
+        # the counts of the run length encoding only walk the stays
+        if self.Runs is not None:
+            occurences, self.MarkovMatrice = self.Runs.GetTransitions()
+            minutes = self.Runs.Minutes
+            self.HourlyMarkovTensor  = self.Runs.GetSlicedTransitions((minutes // MINUTES_IN_AN_HOUR) % NUMBER_OF_HOURS_IN_A_DAY)
+            self.MonthlyMarkovTensor = self.Runs.GetSlicedTransitions(MonthOfYear(MinutesToMonths(minutes)) - 1)
+        else:
+            # single pass over the consecutive calls
+            for i, timeLocation in enumerate(self.UserData):
+                # now get the location Id from time location
+                locationId = timeLocation.Location
+
+                # add this location to the matrice
+                if locationId not in self.MarkovMatrice:
+                    self.MarkovMatrice[locationId] = {}
+                    occurences[locationId] = 0
+                occurences[locationId] += 1
+
+                # the next element is the next state, the last element in the known universe stays where it is
+                if i + 1 < len(self.UserData):
+                    nextLocationId = self.UserData[i + 1].Location
+                    # time sliced counts belong to the time the current state is left
+                    hourlyKey  = (timeLocation.Hour, locationId, nextLocationId)
+                    monthlyKey = (timeLocation.Month - 1, locationId, nextLocationId)
+                    self.HourlyMarkovTensor[hourlyKey]   = self.HourlyMarkovTensor.get(hourlyKey, 0) + 1
+                    self.MonthlyMarkovTensor[monthlyKey] = self.MonthlyMarkovTensor.get(monthlyKey, 0) + 1
+                else:
+                    nextLocationId = locationId
+                self.MarkovMatrice[locationId][nextLocationId] = self.MarkovMatrice[locationId].get(nextLocationId, 0) + 1
+
+        # now normalize with the number of occurences
+        for locationId in self.MarkovMatrice:
+            for nextLocationId in self.MarkovMatrice[locationId]:
+                self.MarkovMatrice[locationId][nextLocationId] /= occurences[locationId]
+        
+"""
+Class to read the Data Set Three
+"""
+class DataSetThree(object):
+    """
+    Constructor for data storage class
+    logFileName  => Full Path of the Log File
+    firstDate    => First date of the daily statistics '%d-%m-%Y' (if left blank first active day is used)
+    lastDate     => Last date of the daily statistics '%d-%m-%Y' (if left blank last active day is used)
+    sampler      => CallerSampler selecting the callers to be parsed (if left blank all callers)
+    travelFilter => TravelFilter of the impossible travel between consecutive calls (if left blank no filter)
+    runLength    => Store the calls of the users run length encoded (boolean)
+    """
+    def __init__(self, logFileName = "DataSet3Log.txt", firstDate = None, lastDate = None, sampler = None, travelFilter = None, runLength = False):
+        self.UserLocationData          = {}
+        self.Distances                 = {}
+        self.Logger                    = Logger(logFileName)
+        self.FirstDay                  = None if firstDate is None else TimeLocation.DayIndexOf(firstDate)
+        self.LastDay                   = None if lastDate is None else TimeLocation.DayIndexOf(lastDate)
+        self.Columnar                  = None
+        self.OriginDestination         = None
+        self.HourlyTransitionTensor    = None
+        self.MonthlyTransitionTensor   = None
+        self.TransitionCounts          = None
+        self.Sampler                   = sampler
+        self.TravelFilter              = travelFilter
+        self.RunLength                 = runLength
+        self.DistanceMatrix            = None
+        self.HomePopulation            = None
+
+        # day indexes covered by the daily statistics
+        self.DailyStatisticsDays       = []
+
+        # data statistics
+        # Mean
+        self.MeanTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MeanTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MeanTotalDailyNumberOfCalls   = []
+        self.MeanRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MeanRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MeanRefDailyNumberOfCalls     = []
+        self.MeanTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MeanTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MeanTotalDailyNumberOfTrans   = []
+        self.MeanRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MeanRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MeanRefDailyNumberOfTrans     = []
+
+        # Standard Deviation
+        self.StdTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.StdTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.StdTotalDailyNumberOfCalls   = []
+        self.StdRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.StdRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.StdRefDailyNumberOfCalls     = []
+        self.StdTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.StdTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.StdTotalDailyNumberOfTrans   = []
+        self.StdRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.StdRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.StdRefDailyNumberOfTrans     = []
+
+        # Min
+        self.MinTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MinTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MinTotalDailyNumberOfCalls   = []
+        self.MinRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MinRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MinRefDailyNumberOfCalls     = []
+        self.MinTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MinTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MinTotalDailyNumberOfTrans   = []
+        self.MinRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MinRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MinRefDailyNumberOfTrans     = []
+
+        # Max
+        self.MaxTotalHourlyNumberOfCalls  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MaxTotalMonthlyNumberOfCalls = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MaxTotalDailyNumberOfCalls   = []
+        self.MaxRefHourlyNumberOfCalls    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MaxRefMonthlyNumberOfCalls   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MaxRefDailyNumberOfCalls     = []
+        self.MaxTotalHourlyNumberOfTrans  = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MaxTotalMonthlyNumberOfTrans = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MaxTotalDailyNumberOfTrans   = []
+        self.MaxRefHourlyNumberOfTrans    = [0] * NUMBER_OF_HOURS_IN_A_DAY
+        self.MaxRefMonthlyNumberOfTrans   = [0] * NUMBER_OF_MONTHS_IN_A_YEAR
+        self.MaxRefDailyNumberOfTrans     = []
+
+        # running statistics used while users are processed one at a time
+        self.ResetUserStatistics()
+
+    """
+    Parse a single line of a dataset three file
+    Returns (callerId, isRefugee, timeLocation) for valid lines and None otherwise
+    line       => Line to be parsed
+    lineNumber => Number of the line in the file (for logging)
+    fileName   => Full Path of the dataset three file (for logging)
+    """
+    def ParseLine(self, line, lineNumber, fileName):
+        # callers out of the sample are rejected before anything else is parsed
+        if self.Sampler is not None and not self.Sampler.IsSampledField(line.split(",", CALLER_ID + 1)[CALLER_ID].strip('\n ')):
+            return None
+
+        # split comma seperated data and strip contents from white spaces and enter characters
+        data = [x.strip('\n ') for x in line.split(",")]
+
+        # parsing errors shall not stop us from parsing the file
+        try:
+            # assign variables
+            locationId         = int(data[LOCATION_ID]) # id of the location of the caller
+            callerId           = int(data[CALLER_ID][1:]) # id of the caller or callee
+            time               = data[TIME] # time of the call
+            isRefugee          = (data[CALLER_ID][0] == '1') # ids shall begin with a 1:Refugee and 2:Non-Refugee
+            checkRefugeeSanity = ((data[CALLER_ID][0] == '1') or (data[CALLER_ID][0] == '2')) # just check if everything is valid
+
+            # parse the time
+            timeLocation = TimeLocation(time, locationId)
+
+            # just a small piece of error handling for the file to check if it is a valid line to be processed
+            process = True
+            # dismiss unknown locations
+            if locationId in UnknownLocationIds:
+                self.Logger.AddError("Unknown Location Ids: " + str(locationId) + " at line " + str(lineNumber) + " in file " + fileName)
+                process = False
+
+            # dismiss faulty ids
+            if checkRefugeeSanity == False:
+                self.Logger.AddError("Problem with Caller id: " + data[CALLER_ID] + " at line " + str(lineNumber) + " in file " + fileName)
+                process = False
+
+            # dismiss invalid time entries
+            if timeLocation.ValidFormat == False:
+                self.Logger.AddError("Problem with Time Format: " + data[TIME] + " at line " + str(lineNumber) + " in file " + fileName)
+                process = False
+
+            # process valid entries only
+            if process :
+                return callerId, isRefugee, timeLocation
+
+        # exceptions shall be logged and parsing shall continue
+        except Exception as e:
+            # just log the exception
+            self.Logger.AddError(str(e))
+            self.Logger.AddError(traceback.format_exc())
+            pass
+        return None
+
+    """
+    Parse and store the data in file
+    fileName => Full Path of the dataset three file (gzip, bz2 and xz files are decompressed while read)
+    """
+    def ParseData(self, fileName):
+        # open the file
+        with io.TextIOWrapper(OpenInput(fileName)) as f:
+            self.ParseLines(f, fileName)
+
+    """
+    Parse and store the lines of a dataset three file
+    lines    => Iterable of the lines of the file
+    fileName => Full Path of the dataset three file (for logging)
+    records  => List receiving the (caller, minute, location, isRefugee) tuples of the stored lines (optional)
+    """
+    def ParseLines(self, lines, fileName, records = None):
+        # columnar copy shall be rebuilt with the new data
+        self.Columnar = None
+        # begin counting lines
+        lineNumber = 1
+        # parse each line seperately
+        for line in lines:
+            parsed = self.ParseLine(line, lineNumber, fileName)
+            if parsed is not None:
+                callerId, isRefugee, timeLocation = parsed
+                # check if the user is already inside the data
+                if callerId not in self.UserLocationData :
+                    self.UserLocationData[callerId] = UserTimeSortedLocationData(callerId, isRefugee)
+                self.UserLocationData[callerId].AddNewTimeLocation(timeLocation)
+                if records is not None:
+                    records.append((callerId, timeLocation.NumberOfMinutes, timeLocation.Location, isRefugee))
+
+            # increment line number
+            lineNumber += 1
+
+    """
+    Parse and store the data in files
+    The next blocks are read (and decompressed) in the background while the current one is parsed
+    files      => List of Full Paths of the dataset three files
+    blockSize  => Number of bytes read at once
+    queueSize  => Maximum number of blocks read ahead (0 disables prefetching)
+    checkpoint => Checkpoint the completed files are taken from and every parsed file is added to (optional)
+    """
+    def ParseFiles(self, files, blockSize = DEFAULT_BLOCK_SIZE, queueSize = DEFAULT_QUEUE_SIZE, checkpoint = None):
+        if checkpoint is not None:
+            for fileName, state in checkpoint.IterateFiles():
+                print("Processing file ", fileName, " resumed from checkpoint")
+                self.AddRecords(state['Records'])
+                self.SetCounterState(state)
+            files = [fileName for fileName in files if not checkpoint.IsCompleted(fileName)]
+
+        reader = PrefetchReader(files, blockSize, queueSize)
+        for fileName, lines in reader:
+            print("Processing file ", fileName, " started")
+            records = [] if checkpoint is not None else None
+            self.ParseLines(lines, fileName, records)
+            if checkpoint is not None:
+                self.CheckpointFile(checkpoint, fileName, records)
+            print("Processing file ", fileName, " finished")
+        self.ReportReader(reader)
+
+    """
+    Store already parsed calls (e.g. of a checkpoint) as if their lines were parsed again
+    records => Numpy array of RECORD_TYPE in the order of the lines
+    """
+    def AddRecords(self, records):
+        # columnar copy shall be rebuilt with the new data
+        self.Columnar = None
+        for callerId, minute, location, isRefugee in zip(records['Caller'].tolist(), records['Minute'].tolist(),
+                                                         records['Location'].tolist(), records['IsRefugee'].tolist()):
+            if callerId not in self.UserLocationData:
+                self.UserLocationData[callerId] = UserTimeSortedLocationData(callerId, bool(isRefugee))
+            self.UserLocationData[callerId].AddNewTimeLocation(TimeLocation.FromMinutes(minute, location))
+
+    """
+    Add the parsed calls of a completed file to the checkpoints
+    checkpoint => Checkpoint
+    fileName   => Full Path of the dataset three file
+    records    => List of (caller, minute, location, isRefugee) tuples of the file
+    """
+    def CheckpointFile(self, checkpoint, fileName, records):
+        # the travel filter counts the calls later on, only the sampler counts belong to the file
+        state = dict((name, value) for name, value in self.GetCounterState().items() if name != 'TravelFilter')
+        state['Records'] = np.array(records, dtype=RECORD_TYPE)
+        checkpoint.AddFile(fileName, state)
+
+    """
+    Print how much of the reading time was hidden behind parsing
+    reader => PrefetchReader that read the files
+    """
+    def ReportReader(self, reader):
+        print(reader.GetReport())
+        self.Logger.AddDebug(reader.GetReport())
+
+    """
+    Parse the given files lazily without storing the data
+    Yields (caller, minute, location, isRefugee) tuples of the valid lines
+    files      => List of Full Paths of the dataset three files
+    blockSize  => Number of bytes read at once
+    queueSize  => Maximum number of blocks read ahead (0 disables prefetching)
+    checkpoint => Checkpoint the completed files are taken from and every parsed file is added to (optional)
+    """
+    def ReadRecords(self, files, blockSize = DEFAULT_BLOCK_SIZE, queueSize = DEFAULT_QUEUE_SIZE, checkpoint = None):
+        if checkpoint is not None:
+            for fileName, state in checkpoint.IterateFiles():
+                print("Processing file ", fileName, " resumed from checkpoint")
+                records = state['Records']
+                for record in zip(records['Caller'].tolist(), records['Minute'].tolist(), records['Location'].tolist(), records['IsRefugee'].tolist()):
+                    yield record
+                self.SetCounterState(state)
+            files = [fileName for fileName in files if not checkpoint.IsCompleted(fileName)]
+
+        reader = PrefetchReader(files, blockSize, queueSize)
+        for fileName, lines in reader:
+            print("Processing file ", fileName, " started")
+            records = []
+            lineNumber = 1
+            for line in lines:
+                parsed = self.ParseLine(line, lineNumber, fileName)
+                if parsed is not None:
+                    callerId, isRefugee, timeLocation = parsed
+                    record = (callerId, timeLocation.NumberOfMinutes, timeLocation.Location, isRefugee)
+                    if checkpoint is not None:
+                        records.append(record)
+                    yield record
+                lineNumber += 1
+            if checkpoint is not None:
+                self.CheckpointFile(checkpoint, fileName, records)
+            print("Processing file ", fileName, " finished")
+        self.ReportReader(reader)
+
+    """
+    Parse the given files lazily into fixed size record chunks
+    files      => List of Full Paths of the dataset three files
+    chunkSize  => Maximum number of records in a chunk
+    checkpoint => Checkpoint of the completed files (optional, see ReadRecords)
+    """
+    def ReadRecordChunks(self, files, chunkSize = DEFAULT_CHUNK_SIZE, checkpoint = None):
+        return ChunkRecords(self.ReadRecords(files, checkpoint = checkpoint), chunkSize)
+
+    """
+    Build the users one at a time from caller groups (filtered by the travel filter if given)
+    groups => Iterable of (callerId, isRefugee, minutes, locations) with time ordered calls
+    """
+    def BuildUsers(self, groups):
+        if self.TravelFilter is not None:
+            groups = self.TravelFilter.FilterGroups(groups)
+        for callerId, isRefugee, minutes, locations in groups:
+            yield UserTimeSortedLocationData.FromSortedRecords(callerId, isRefugee, minutes, locations, self.RunLength)
+
+    """
+    Build the users one at a time from a caller grouped and time ordered sorter output
+    Only the current user is held in memory
+    sorter => ExternalSorter containing all records
+    """
+    def IterateSortedUsers(self, sorter):
+        return self.BuildUsers(sorter.GroupByCaller())
+
+    """
+    Build the users one at a time from the user segments of columnar data
+    columnar => ColumnarData sorted by caller and time
+    """
+    def IterateColumnarUsers(self, columnar):
+        starts = columnar.GetUserStarts().tolist()
+        caller, isRefugee, minute, location = columnar.Caller, columnar.IsRefugee, columnar.Minute, columnar.Location
+        return self.BuildUsers((int(caller[begin]), bool(isRefugee[begin]), minute[begin:end], location[begin:end])
+                               for begin, end in zip(starts[:-1], starts[1:]))
+
+    """
+    Create the transition matrix and statistics of the users as they arrive
+    Users are passed on after being added to the running statistics, their calls are collected into
+    batches of complete users that are added to the aggregates together, so the vectorized aggregates
+    run once per batch instead of once per user
+    users      => Iterable of UserTimeSortedLocationData
+    aggregates => List of population aggregates (e.g. OriginDestinationMatrix) that shall receive the calls (optional)
+    batchSize  => Number of calls from which a batch is added to the aggregates
+    """
+    def ProcessUsers(self, users, aggregates = None, batchSize = DEFAULT_CHUNK_SIZE):
+        batch, size = [], 0
+        for user in users:
+            user.CreateTransitionMatrix()
+            user.CalculateTransitionStatistics()
+            self.AccumulateUserStatistics(user)
+            if aggregates:
+                batch.append(user.GetRecords())
+                size += len(batch[-1])
+                if size >= batchSize:
+                    DataSetThree.AddToAggregates(batch, aggregates)
+                    batch, size = [], 0
+            yield user
+        if len(batch) > 0:
+            DataSetThree.AddToAggregates(batch, aggregates)
+
+    """
+    Add a batch of complete users to the aggregates
+    batch      => List of numpy arrays of RECORD_TYPE, one per user
+    aggregates => List of population aggregates
+    """
+    @staticmethod
+    def AddToAggregates(batch, aggregates):
+        records = np.concatenate(batch) if len(batch) > 1 else batch[0]
+        for aggregate in aggregates:
+            aggregate.AddRecords(records)
+
+    """
+    Write the trajectories of the users to a trajectory store as they arrive
+    The index of the store is written once all users have passed
+    users       => Iterable of UserTimeSortedLocationData
+    storeFolder => Folder of the trajectory store
+    """
+    def StoreUsers(self, users, storeFolder):
+        with TrajectoryStoreWriter(storeFolder) as writer:
+            for user in users:
+                records = user.GetRecords()
+                writer.AddUser(user.Id, user.IsRefugee, records['Minute'], records['Location'])
+                yield user
+
+    """
+    Load a single user from a trajectory store with its counters and transition matrix
+    Returns None if the caller is not in the store
+    store    => TrajectoryStore
+    callerId => Id of the caller (integer)
+    """
+    @staticmethod
+    def LoadUser(store, callerId):
+        trajectory = store.GetUser(callerId)
+        if trajectory is None:
+            return None
+        isRefugee, minutes, locations = trajectory
+        user = UserTimeSortedLocationData.FromSortedRecords(callerId, isRefugee, minutes, locations)
+        user.CreateTransitionMatrix()
+        user.CalculateTransitionStatistics()
+        return user
+
+    """
+    Calculate the stationary distribution, expected return times and the n step distribution
+    (starting from the last known location) of the users' transition matrices as they arrive
+    Users are collected into block diagonal batches (see MarkovBatches) which are solved together and then passed on
+    users     => Iterable of UserTimeSortedLocationData with their transition matrix created
+    nSteps    => Number of steps of the predicted distribution
+    batchSize => Maximum number of non zero transition probabilities in a batch
+    """
+    def AnalyseUsers(self, users, nSteps = 1, batchSize = DEFAULT_BATCH_SIZE):
+        for batch in MarkovBatches(((user, user.MarkovMatrice) for user in users), batchSize):
+            DataSetThree.AnalyseBatch(batch, nSteps)
+            for user in batch.UserIds:
+                yield user
+
+    """
+    Solve a single batch of users together
+    batch  => MarkovBatch whose user ids are the UserTimeSortedLocationData of the users
+    nSteps => Number of steps of the predicted distribution
+    """
+    @staticmethod
+    def AnalyseBatch(batch, nSteps):
+        stationary  = batch.GetStationaryDistributions()
+        returnTimes = batch.GetExpectedReturnTimes(stationary)
+        start       = batch.GetStartDistribution([user.GetLastLocation() for user in batch.UserIds])
+        nStep       = batch.GetNStepDistributions(nSteps, start)
+        stationary, returnTimes, nStep = batch.ToDicts(stationary), batch.ToDicts(returnTimes), batch.ToDicts(nStep)
+        for user in batch.UserIds:
+            user.StationaryDistribution = stationary[user]
+            user.ExpectedReturnTimes    = returnTimes[user]
+            user.NStepDistribution      = nStep[user]
+
+    """
+    Detect the home and work districts of the users as they arrive
+    Users are collected into batches whose calls are counted together by (user, location) in the
+    night and weekday office hour windows, the home districts are added to the population
+    users      => Iterable of UserTimeSortedLocationData
+    population => DistrictPopulation of the home districts (optional)
+    batchSize  => Maximum number of calls in a batch
+    """
+    def DetectStayUsers(self, users, population = None, batchSize = DEFAULT_STAY_BATCH_SIZE):
+        batch, size = [], 0
+        for user in users:
+            if len(batch) > 0 and size + user.NumberOfCalls > batchSize:
+                DataSetThree.DetectStayBatch(batch, population)
+                for batchUser in batch:
+                    yield batchUser
+                batch, size = [], 0
+            batch.append(user)
+            size += user.NumberOfCalls
+        if len(batch) > 0:
+            DataSetThree.DetectStayBatch(batch, population)
+            for batchUser in batch:
+                yield batchUser
+
+    """
+    Detect the home and work districts of a single batch of users together
+    users      => List of UserTimeSortedLocationData
+    population => DistrictPopulation of the home districts (optional)
+    """
+    @staticmethod
+    def DetectStayBatch(users, population = None):
+        stays = StayLocations.Detect(ColumnarData.FromChunks([user.GetRecords() for user in users], True))
+        homes, works = stays.Locations[HOME].tolist(), stays.Locations[WORK].tolist()
+        for i, user in enumerate(users):
+            user.HomeLocation = homes[i] if homes[i] >= 0 else None
+            user.WorkLocation = works[i] if works[i] >= 0 else None
+        if population is not None:
+            population.Add(stays)
+
+    """
+    Detect the home and work districts of all users (see DetectStayUsers)
+    Returns the DistrictPopulation of the home districts
+    """
+    def DetectStayLocations(self):
+        self.HomePopulation = DistrictPopulation(HOME)
+        for user in self.DetectStayUsers(self.UserLocationData.values(), self.HomePopulation):
+            pass
+        return self.HomePopulation
+
+    """
+    Analyse the transition matrices of all users (see AnalyseUsers)
+    nSteps    => Number of steps of the predicted distribution
+    batchSize => Maximum number of non zero transition probabilities in a batch
+    """
+    def AnalyseTransitionMatrices(self, nSteps = 1, batchSize = DEFAULT_BATCH_SIZE):
+        for user in self.AnalyseUsers(self.UserLocationData.values(), nSteps, batchSize):
+            pass
+
+    """
+    Columnar copy of the parsed data sorted by caller and time (built once and cached)
+    """
+    def GetColumnarData(self):
+        if self.Columnar is None:
+            chunks = [user.GetRecords() for userId, user in self.UserLocationData.items()]
+            self.Columnar = ColumnarData.FromChunks(chunks)
+        return self.Columnar
+
+    """
+    Drop (or only count) the calls of impossible travel of all parsed users in a single pass over the
+    columnar data, the users that lost calls are rebuilt from their remaining calls
+    """
+    def FilterImpossibleTravel(self):
+        if self.TravelFilter is None:
+            return
+        columnar = self.GetColumnarData()
+        kept     = self.TravelFilter.GetKeptMask(columnar.Records)
+        if kept.all():
+            return
+        records = columnar.Records[kept]
+        changed = np.isin(records['Caller'], np.unique(columnar.Caller[~kept]))
+        for callerId, isRefugee, minutes, locations in GroupCallerChunks([records[changed]]):
+            self.UserLocationData[callerId] = UserTimeSortedLocationData.FromSortedRecords(callerId, isRefugee, minutes, locations, self.RunLength)
+        self.Columnar = ColumnarData(records, True)
+
+    """
+    Run length encode the calls of all parsed users if the data set stores them run length encoded
+    """
+    def EncodeRunLengths(self):
+        if self.RunLength == False:
+            return
+        for userId, user in self.UserLocationData.items():
+            user.EncodeRunLengths()
+
+    """
+    Open the checkpoints of a run, the checkpoints of a previous run with other settings are dropped
+    Returns None if no folder is given
+    folder => Folder of the checkpoints
+    files  => List of Full Paths of the dataset three files of the run
+    """
+    def OpenCheckpoint(self, folder, files):
+        if folder is None:
+            return None
+        settings = ""
+        if self.Sampler is not None:
+            settings += "Sampler;" + str(self.Sampler.GetFraction(False)) + ";" + str(self.Sampler.GetFraction(True)) + ";" + str(self.Sampler.Seed) + "\n"
+        if self.TravelFilter is not None:
+            # the filter depends on the distances as well
+            distances = self.TravelFilter.Distances
+            settings += "Travel Filter;" + str(self.TravelFilter.MaxSpeed) + ";" + str(self.TravelFilter.MinDistance) + ";" + str(self.TravelFilter.Drop) + ";" + \
+                        str(zlib.crc32(distances.Districts.tobytes() + distances.Matrix.tobytes())) + "\n"
+        return Checkpoint(folder, files, settings)
+
+    """
+    Counters of the sampler and the travel filter as a dict of numpy arrays (for the checkpoints)
+    """
+    def GetCounterState(self):
+        state = {}
+        if self.Sampler is not None:
+            state['SampledLines'] = np.array([self.Sampler.KeptLines, self.Sampler.SkippedLines], dtype=np.int64)
+        if self.TravelFilter is not None:
+            state['TravelFilter'] = np.array([self.TravelFilter.Counts[counter] for counter in TRAVEL_COUNTERS], dtype=np.int64)
+        return state
+
+    """
+    Restore the counters of the sampler and the travel filter from a state returned by GetCounterState
+    state => Dict of numpy arrays
+    """
+    def SetCounterState(self, state):
+        if self.Sampler is not None and 'SampledLines' in state:
+            self.Sampler.KeptLines, self.Sampler.SkippedLines = state['SampledLines'].tolist()
+        if self.TravelFilter is not None and 'TravelFilter' in state:
+            for counter, counts in zip(TRAVEL_COUNTERS, state['TravelFilter']):
+                self.TravelFilter.Counts[counter] = counts.copy()
+
+    """
+    Store the columnar data of all parsed (and filtered) users with the order the users were parsed in
+    checkpoint => Checkpoint (nothing is stored if left blank)
+    """
+    def CheckpointParsedData(self, checkpoint):
+        if checkpoint is None:
+            return
+        state = self.GetCounterState()
+        state['Records'] = self.GetColumnarData().Records
+        state['Callers'] = np.array(list(self.UserLocationData.keys()), dtype=np.int64)
+        checkpoint.SavePhase(PARSED_PHASE, state)
+
+    """
+    Restore the parsed users from the checkpoint written by CheckpointParsedData
+    Returns False if there is no such checkpoint
+    checkpoint => Checkpoint (optional)
+    """
+    def RestoreParsedData(self, checkpoint):
+        state = checkpoint.GetPhase(PARSED_PHASE) if checkpoint is not None else None
+        if state is None:
+            return False
+        print("Parsed data resumed from checkpoint")
+        users = {}
+        for callerId, isRefugee, minutes, locations in GroupCallerChunks([state['Records']]):
+            users[callerId] = UserTimeSortedLocationData.FromSortedRecords(callerId, isRefugee, minutes, locations, self.RunLength)
+        self.UserLocationData = dict((callerId, users[callerId]) for callerId in state['Callers'].tolist())
+        self.Columnar = ColumnarData(state['Records'], True)
+        self.SetCounterState(state)
+        return True
+
+    """
+    Create the population level district to district origin destination matrix
+    period       => "Daily", "Monthly" or None (no time slicing)
+    includeStays => Count consecutive calls from the same district as well (boolean)
+    """
+    def CreateOriginDestinationMatrix(self, period = None, includeStays = False):
+        self.OriginDestination = OriginDestinationMatrix.Build(self.GetColumnarData(), period, includeStays)
+        return self.OriginDestination
+
+    """
+    Create the hour of day and month of year sliced transition tensors of the whole population
+    Returns (hourly, monthly) TransitionTensor
+    """
+    def CreateTransitionTensors(self):
+        columnar = self.GetColumnarData()
+        self.HourlyTransitionTensor  = TransitionTensor.Build(columnar, HOUR_OF_DAY)
+        self.MonthlyTransitionTensor = TransitionTensor.Build(columnar, MONTH_OF_YEAR)
+        return self.HourlyTransitionTensor, self.MonthlyTransitionTensor
+
+    """
+    Get the distance between two districts
+    Pairs missing from the distances file are taken from the completed matrix if it was created
+    id1 => id of the first district
+    id2 => id of the second district
+    """
+    def GetDistanceInBetween(self, id1, id2):
+        dist = 0
+        if id1 != id2 :
+            dist = -1
+            if id1 in self.Distances and id2 in self.Distances:
+                if id2 in self.Distances[id1]:
+                    dist = self.Distances[id1][id2]
+                elif id1 in self.Distances[id2]:
+                    dist = self.Distances[id2][id1]
+            elif id1 in self.Distances:
+                if id2 in self.Distances[id1]:
+                    dist = self.Distances[id1][id2]
+            elif id2 in self.Distances:
+                if id1 in self.Distances[id2]:
+                    dist = self.Distances[id2][id1]
+            # fall back to the shortest path over the known distances
+            if dist == -1 and self.DistanceMatrix is not None:
+                dist = self.DistanceMatrix.Get(id1, id2)
+        return dist
+
+    """
+    Distance matrix of the districts (the completed one if the distances are completed)
+    """
+    def GetDistanceMatrix(self):
+        if self.DistanceMatrix is not None:
+            return self.DistanceMatrix
+        return DistanceMatrix.FromDict(self.Distances)
+
+    """
+    Parse the contents of distance data between given districts in Turkey
+    fileName    => Full Path of the district distances file 
+    complete    => Complete the missing pairs with shortest paths over the known distances (boolean)
+    cacheFolder => Folder of the cached completed matrix (if left blank the folder of the distances file)
+    """
+    def ParseDistanceData(self, fileName, complete = False, cacheFolder = None):
+        with open(fileName) as f:
+            lineNumber = 1
+            for line in f:
+                data = [x.strip('\n ') for x in line.split(",") if x.strip('\n ') != '']
+                if len(data) > 1:
+                    self.Distances[int(data[0])] = {}
+                    for d in data[1:]:
+                        s = [x.strip('\n ') for x in d.split(":")]
+                        if len(s) == 2:
+                            self.Distances[int(data[0])][int(s[0])] = float(s[1])
+                        else:
+                            self.Logger.AddError("Wrong input at line: ", lineNumber, " for input: ", s)
+                    lineNumber += 1
+
+        # all pairs shortest paths are calculated once per distances file and cached
+        if complete:
+            self.DistanceMatrix = LoadCompletedDistances(fileName, self.Distances, cacheFolder)
+
+        # jumps are measured on the same distances
+        if self.TravelFilter is not None:
+            self.TravelFilter.Distances = self.GetDistanceMatrix()
+                    
+
+    """
+    Print either to a file or system out
+    fileName => Name of the file (if left blank direct to sys out)
+    """
+    def PrintUserLocationData(self, fileName = None):
+        out = ""
+        for userId,user in self.UserLocationData.items():
+            out += DataSetThree.UserLocationDataString(user)
+        if fileName == None:
+            print(out)
+        else:
+            with open(fileName, "w+") as f:
+                f.write(out)
+
+    """
+    Location data and transition matrix of a single user in printable format
+    user => UserTimeSortedLocationData
+    """
+    @staticmethod
+    def UserLocationDataString(user):
+        out  = str(user.Id) + "=>" + str(user.GetTimeLocations()) + "\n"
+        out += str(user.Id) + "=>" + str(user.MarkovMatrice) + "\n"
+        # analysis results are only printed when they are calculated
+        if len(user.StationaryDistribution) > 0:
+            out += str(user.Id) + "=>" + str(user.StationaryDistribution) + "\n"
+            out += str(user.Id) + "=>" + str(user.ExpectedReturnTimes) + "\n"
+            out += str(user.Id) + "=>" + str(user.NStepDistribution) + "\n"
+        # stay locations are only printed when they are detected
+        if user.HomeLocation is not None or user.WorkLocation is not None:
+            out += str(user.Id) + "=>" + str({HOME: user.HomeLocation, WORK: user.WorkLocation}) + "\n"
+        return out
+
+    """
+    Call and transition counters of a single user in printable format
+    user => UserTimeSortedLocationData with its transition statistics calculated
+    """
+    @staticmethod
+    def UserCountersString(user):
+        out = ""
+        for name in StatisticsCounterNames:
+            out += str(user.Id) + "=>" + name + "=>" + str(getattr(user, name)) + "\n"
+        return out
+
+    """
+    Print either to a file or system out in csv format
+    fileName => Name of the file (if left blank direct to sys out)
+    """
+    def PrintUserStatistics(self, fileName = None):
+        # print out monthly statistics
+        out = "Monthly Statistics;January;February;March;April;May,June;July;August;September;October;November;December\n"
+        out += "Total Mean Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MeanTotalMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Mean Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MeanRefMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Mean Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MeanTotalMonthlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Mean Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MeanRefMonthlyNumberOfTrans[i])
+        out += "\n"
+        out += "Total Std Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.StdTotalMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Std Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.StdRefMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Std Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.StdTotalMonthlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Std Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.StdRefMonthlyNumberOfTrans[i])
+        out += "Total Min Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MinTotalMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Min Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MinRefMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Min Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MinTotalMonthlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Min Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MinRefMonthlyNumberOfTrans[i])
+        out += "Total Max Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MaxTotalMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Max Number Of Calls"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MaxRefMonthlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Max Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MaxTotalMonthlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Max Number Of Transitions"
+        for i in range(NUMBER_OF_MONTHS_IN_A_YEAR):
+            out += ";" + str(self.MaxRefMonthlyNumberOfTrans[i])
+        out += "\n"
+        out += self.PercentileRowsString("Monthly", NUMBER_OF_MONTHS_IN_A_YEAR)
+        out += self.StandardErrorRowsString("Monthly", NUMBER_OF_MONTHS_IN_A_YEAR)
+        out += "\n"
+        out += "\n"
+                
+        # print out daily statistics
+        out += "Daily Statistics"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.DailyStatisticsDays[i])
+        out += "\n"
+        out += "Total Mean Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MeanTotalDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Mean Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MeanRefDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Mean Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MeanTotalDailyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Mean Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MeanRefDailyNumberOfTrans[i])
+        out += "\n"
+        out += "Total Std Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.StdTotalDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Std Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.StdRefDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Std Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.StdTotalDailyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Std Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.StdRefDailyNumberOfTrans[i])
+        out += "\n"
+        out += "Total Min Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MinTotalDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Std Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MinRefDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Min Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MinTotalDailyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Min Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MinRefDailyNumberOfTrans[i])
+        out += "\n"
+        out += "Total Max Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MaxTotalDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Max Number Of Calls"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MaxRefDailyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Max Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MaxTotalDailyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Max Number Of Transitions"
+        for i in range(len(self.DailyStatisticsDays)):
+            out += ";" + str(self.MaxRefDailyNumberOfTrans[i])
+        out += "\n"
+        out += self.PercentileRowsString("Daily", len(self.DailyStatisticsDays))
+        out += self.StandardErrorRowsString("Daily", len(self.DailyStatisticsDays))
+        out += "\n"
+        out += "\n"
+
+        # print out hourly statistics
+        out += "Hourly Statistics"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(i) + "-" + str(i+1)
+        out += "\n"
+        out += "Total Mean Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MeanTotalHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Mean Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MeanRefHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Mean Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MeanTotalHourlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Mean Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MeanRefHourlyNumberOfTrans[i])
+        out += "\n"
+        out += "Total Std Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.StdTotalHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Std Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.StdRefHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Std Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.StdTotalHourlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Std Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.StdRefHourlyNumberOfTrans[i])
+        out += "\n"
+        out += "Total Min Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MinTotalHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Min Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MinRefHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Min Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MinTotalHourlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Min Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MinRefHourlyNumberOfTrans[i])
+        out += "\n"
+        out += "Total Max Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MaxTotalHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Refugee Max Number Of Calls"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MaxRefHourlyNumberOfCalls[i])
+        out += "\n"
+        out += "Total Max Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MaxTotalHourlyNumberOfTrans[i])
+        out += "\n"
+        out += "Refugee Max Number Of Transitions"
+        for i in range(NUMBER_OF_HOURS_IN_A_DAY):
+            out += ";" + str(self.MaxRefHourlyNumberOfTrans[i])
+        out += "\n"
+        out += self.PercentileRowsString("Hourly", NUMBER_OF_HOURS_IN_A_DAY)
+        out += self.StandardErrorRowsString("Hourly", NUMBER_OF_HOURS_IN_A_DAY)
+        out += self.SamplingString()
+        out += self.TravelFilterString()
+
+        # print out the contents
+        if fileName == None:
+            print(out)
+        else:
+            with open(fileName, "w+") as f:
+                f.write(out)
+
+    """
+    Percentile rows of a period in csv format (one row per percentile, group and counter)
+    period => Period of the statistics (Hourly, Monthly or Daily)
+    length => Number of columns of the period
+    """
+    def PercentileRowsString(self, period, length):
+        out = ""
+        for percentile in PrintedPercentiles:
+            for counter, counterName in [("Calls", "Calls"), ("Trans", "Transitions")]:
+                for group, groupName in [("Total", "Total"), ("Ref", "Refugee")]:
+                    values = getattr(self, "P" + str(percentile) + group + period + "NumberOf" + counter)
+                    out += groupName + " P" + str(percentile) + " Number Of " + counterName
+                    for i in range(length):
+                        out += ";" + str(values[i])
+                    out += "\n"
+        return out
+
+    """
+    Standard error rows of the means of a period in csv format, empty unless the callers are sampled
+    period => Period of the statistics (Hourly, Monthly or Daily)
+    length => Number of columns of the period
+    """
+    def StandardErrorRowsString(self, period, length):
+        out = ""
+        if self.Sampler is None:
+            return out
+        for counter, counterName in [("Calls", "Calls"), ("Trans", "Transitions")]:
+            for group, groupName in [("Total", "Total"), ("Ref", "Refugee")]:
+                values = getattr(self, "SE" + group + period + "NumberOf" + counter)
+                out += groupName + " Mean Std Error Number Of " + counterName
+                for i in range(length):
+                    out += ";" + str(values[i])
+                out += "\n"
+        return out
+
+    """
+    Sampling fractions and the number of kept and skipped lines in csv format, empty unless the callers are sampled
+    """
+    def SamplingString(self):
+        if self.Sampler is None:
+            return ""
+        out  = "\n\nSampling;Non Refugee Fraction;Refugee Fraction;Kept Lines;Skipped Lines\n"
+        out += "Sample;" + str(self.Sampler.GetFraction(False)) + ";" + str(self.Sampler.GetFraction(True)) + ";" + \
+               str(self.Sampler.KeptLines) + ";" + str(self.Sampler.SkippedLines) + "\n"
+        return out
+
+    """
+    Counts of the travel filter in csv format, empty unless the calls are filtered
+    """
+    def TravelFilterString(self):
+        if self.TravelFilter is None:
+            return ""
+        return "\n\n" + self.TravelFilter.GetReport()
+
+    """
+    Create the transition matrix for each user
+    numberOfWorkers => Number of worker processes, more than one counts the transitions in parallel
+    """ 
+    def CreateTransitionMatrix(self, numberOfWorkers = 1):
+        if numberOfWorkers > 1:
+            self.CreateTransitionMatrixParallel(numberOfWorkers)
+            return
+        for userId,user in self.UserLocationData.items():
+            user.CreateTransitionMatrix()
+
+    """
+    Create the transition matrix and the time sliced tensors of each user with a pool of workers
+    Sorted trajectories are shared with the workers, each counts the transitions of a range of users.
+    The concatenated sparse counts are kept in TransitionCounts and the per user dicts are built from
+    them when a user's dicts are used first, in the same order as the single process version.
+    numberOfWorkers => Number of worker processes
+    """
+    def CreateTransitionMatrixParallel(self, numberOfWorkers):
+        # the calls of every user in its own time order (calls in the same minute keep the file order)
+        users    = [self.UserLocationData[userId] for userId in sorted(self.UserLocationData)]
+        columnar = ColumnarData.FromChunks([user.GetRecords() for user in users], True)
+        self.TransitionCounts = ParallelCountTransitions(columnar, numberOfWorkers)
+        store = TransitionStore(self.TransitionCounts, len(users))
+        for userIndex, user in enumerate(users):
+            user.SetTransitionSource(store, userIndex)
+
+    """
+    Reset the running statistics of the users
+    """
+    def ResetUserStatistics(self):
+        self.Statistics = {}
+        for name in StatisticsCounterNames:
+            for group in StatisticsGroupNames:
+                if name in DailyCounterNames:
+                    self.Statistics[(name, group)] = SparseBucketStatistics()
+                else:
+                    self.Statistics[(name, group)] = BucketStatistics(len(getattr(self, "Mean" + group + name)))
+
+    """
+    Add the counters of a single user to the running statistics
+    Transition statistics of the user shall already be calculated
+    user => UserTimeSortedLocationData
+    """
+    def AccumulateUserStatistics(self, user):
+        for name in StatisticsCounterNames:
+            values = getattr(user, name)
+            self.Statistics[(name, "Total")].Add(values)
+            if user.IsRefugee == True:
+                self.Statistics[(name, "Ref")].Add(values)
+
+    """
+    Merge the running statistics of another data set (e.g. calculated by another worker)
+    other => DataSetThree
+    """
+    def MergeUserStatistics(self, other):
+        for key, statistics in other.Statistics.items():
+            self.Statistics[key].Merge(statistics)
+
+    """
+    Calculate mean, standard deviation, min and max from the running statistics
+    """
+    def FinalizeUserStatistics(self):
+        # daily statistics cover the requested dates or the active days of the whole population
+        firstDay, lastDay = self.GetDailyStatisticsRange()
+        self.DailyStatisticsDays = list(range(firstDay, lastDay + 1))
+
+        for (name, group), statistics in self.Statistics.items():
+            if name in DailyCounterNames:
+                setattr(self, "Mean" + group + name, statistics.GetMean(firstDay, lastDay))
+                setattr(self, "Std" + group + name, statistics.GetStd(firstDay, lastDay))
+                setattr(self, "Min" + group + name, statistics.GetMin(firstDay, lastDay))
+                setattr(self, "Max" + group + name, statistics.GetMax(firstDay, lastDay))
+                for percentile in PrintedPercentiles:
+                    setattr(self, "P" + str(percentile) + group + name, statistics.GetQuantile(percentile / 100.0, firstDay, lastDay))
+            else:
+                setattr(self, "Mean" + group + name, statistics.GetMean())
+                setattr(self, "Std" + group + name, statistics.GetStd())
+                setattr(self, "Min" + group + name, statistics.GetMin())
+                setattr(self, "Max" + group + name, statistics.GetMax())
+                for percentile in PrintedPercentiles:
+                    setattr(self, "P" + str(percentile) + group + name, statistics.GetQuantile(percentile / 100.0))
+
+        # sampled callers are weighted by their strata and the means get standard errors
+        if self.Sampler is not None:
+            self.EstimateSampledStatistics()
+
+    """
+    Stratified estimates of the total means and standard deviations of a sampled data set
+    Non refugee strata are what remains of the total after the refugees are taken out, both strata
+    are weighted by their estimated sizes. Standard errors of the means are stored as SE<Group><Counter>.
+    """
+    def EstimateSampledStatistics(self):
+        refugeeFraction    = self.Sampler.GetFraction(True)
+        nonRefugeeFraction = self.Sampler.GetFraction(False)
+        for name in StatisticsCounterNames:
+            countTotal = self.Statistics[(name, "Total")].Count
+            countRef   = self.Statistics[(name, "Ref")].Count
+            meanTotal  = np.array(getattr(self, "MeanTotal" + name), dtype=np.float64)
+            stdTotal   = np.array(getattr(self, "StdTotal" + name), dtype=np.float64)
+            meanRef    = np.nan_to_num(np.array(getattr(self, "MeanRef" + name), dtype=np.float64))
+            stdRef     = np.nan_to_num(np.array(getattr(self, "StdRef" + name), dtype=np.float64))
+
+            # first and second moments of the non refugees
+            countNonRef = countTotal - countRef
+            meanNonRef  = np.zeros(len(meanTotal))
+            stdNonRef   = np.zeros(len(meanTotal))
+            if countNonRef > 0:
+                meanNonRef = (countTotal * meanTotal - countRef * meanRef) / countNonRef
+                moment     = (countTotal * (stdTotal * stdTotal + meanTotal * meanTotal) - countRef * (stdRef * stdRef + meanRef * meanRef)) / countNonRef
+                stdNonRef  = np.sqrt(np.maximum(moment - meanNonRef * meanNonRef, 0))
+
+            mean, std, error = StratifiedEstimate([(countNonRef, meanNonRef, stdNonRef, nonRefugeeFraction), (countRef, meanRef, stdRef, refugeeFraction)])
+            # with equal fractions the weighted estimates are the plain ones
+            if refugeeFraction != nonRefugeeFraction:
+                setattr(self, "MeanTotal" + name, list(np.broadcast_to(mean, meanTotal.shape)))
+                setattr(self, "StdTotal" + name, list(np.broadcast_to(std, meanTotal.shape)))
+            setattr(self, "SETotal" + name, list(np.broadcast_to(error, meanTotal.shape)))
+            setattr(self, "SERef" + name, list(StandardError(countRef, stdRef, refugeeFraction)))
+
+    """
+    Day range of the daily statistics
+    Returns the requested first and last days, missing ones are taken from the active days
+    """
+    def GetDailyStatisticsRange(self):
+        firstDay, lastDay = self.FirstDay, self.LastDay
+        if firstDay is None or lastDay is None:
+            activeFirstDay, activeLastDay = self.Statistics[("DailyNumberOfCalls", "Total")].GetRange()
+            # no activity at all, fall back to the first day
+            if activeFirstDay is None:
+                activeFirstDay = activeLastDay = 0 if firstDay is None else firstDay
+            firstDay = activeFirstDay if firstDay is None else firstDay
+            lastDay  = activeLastDay if lastDay is None else lastDay
+        return firstDay, max(firstDay, lastDay)
+
+    """
+    Calculate some of the user statistics such as
+    Mean of Daily Number of Calls
+    Standard Deviation of Daily Number Of Calls
+    Mean of Monthly Number Of Calls
+    Standard Deviation of Monthly Number Of Calls
+    Mean Of Number Of Daily and Monthly User Transitions
+    """
+    def CalculateUserStatistics(self):
+        self.ResetUserStatistics()
+        for userId, user in self.UserLocationData.items():
+            # first calculate the number of transitions
+            user.CalculateTransitionStatistics()
+            self.AccumulateUserStatistics(user)
+
+        # get hourly, monthly and daily statistics
+        self.FinalizeUserStatistics()
+
+    """
+    Store the running statistics of all users
+    checkpoint => Checkpoint (nothing is stored if left blank)
+    """
+    def CheckpointUserStatistics(self, checkpoint):
+        if checkpoint is None:
+            return
+        state = self.GetCounterState()
+        for (name, group), statistics in self.Statistics.items():
+            for field, value in statistics.GetState().items():
+                state[name + group + field] = value
+        checkpoint.SavePhase(STATISTICS_PHASE, state)
+
+    """
+    Restore and finalize the running statistics from the checkpoint written by CheckpointUserStatistics
+    Returns False if there is no such checkpoint
+    checkpoint => Checkpoint (optional)
+    """
+    def RestoreUserStatistics(self, checkpoint):
+        state = checkpoint.GetPhase(STATISTICS_PHASE) if checkpoint is not None else None
+        if state is None:
+            return False
+        print("User statistics resumed from checkpoint")
+        self.ResetUserStatistics()
+        for (name, group), statistics in self.Statistics.items():
+            statistics.SetState(dict((field[len(name + group):], value) for field, value in state.items() if field.startswith(name + group)))
+        self.SetCounterState(state)
+        self.FinalizeUserStatistics()
+        return True
+
+    """
+    Log Out
+    """
+    def Logout(self):
+        if self.TravelFilter is not None:
+            print(self.TravelFilter.GetReport())
+            self.Logger.AddDebug(self.TravelFilter.GetReport())
+        self.Logger.Logout()
+
+"""
+Main script to run the Data Set Three
+"""
+class MainDataSetThreeScript(object):
+    """
+    Run the algorithm
+    The following will be done in the given order:
+     - Parse the distances file and store the distance between two districts
+     - Parse each data set 3 file and store them
+     - Create state transition diagram
+     - Print Location data if requested by user
+     - Print Logs
+    Usage:
+     D4R.py -i <Data Set Three Files Folder Path> -d <Distances File Path> -p <Yes/No> -P <File To Print Markov Out>
+            -m <Memory Budget In MB> -t <Temporary Folder> -S <File To Print Statistics Out> -c <Chunk Size>
+            -o <File To Print Origin Destination Matrix Out> -s <Daily/Monthly> -x <File To Print Transition Tensors Out>
+            -n <Number Of Prediction Steps> -w <Number Of Worker Processes> -f <Sample Fraction> -F <Refugee Sample Fraction>
+            -T <Trajectory Store Folder> -q <Caller Ids To Query> -D <Yes/No> -H <File To Print Home Population Out>
+            -K <File To Print Rankings Out> -k <Number Of Top Entries> -a <File To Print Anomalies Out> -A <Daily/Hourly>
+            -g <File To Print District Centrality Out> -u <File To Print User Clusters Out> -U <Number Of Clusters>
+            -L <Similarity Index File> -l <Caller Ids To Match> -G <File To Print Time Distributions Out>
+            -r <District Hierarchy File> -R <Province/Region> -e <Yes/No> -z <Shared Data Address>
+            -Z <Shared Data Address To Stop> -v <Maximum Speed In Km/h> -V <Drop/Flag> -E <Yes/No> -C <Checkpoint Folder>
+            -y <Shared Data Key File>
+     -p and -P are optional
+     -m switches to the out of core (external sort) run, -t is only used by it
+     -c alone switches to the streaming run for caller grouped input files, a caller that shows up again after
+        its group was closed stops the run
+     -S is used by both of these runs, without -m, -c and -P it switches to the in memory statistics run
+     -o writes the origin destination matrix (long csv for .csv files, binary otherwise), -s slices it by day or month
+     -x writes the hour of day and month sliced transition tensors in the same formats
+     -n adds stationary distributions, expected return times and n step predictions to the printed user data
+     -w counts the transition matrices of the in memory run with the given number of worker processes
+     -f keeps a deterministic hash based fraction of the callers, -F sets another fraction for the refugees
+     -T writes the sorted trajectories and a caller index to the folder, with -q (comma separated ids)
+        the given users are loaded from an existing store instead and nothing else is parsed
+     -D completes the distances missing from the distances file with shortest paths (cached next to the file)
+     -H detects the home (night) and work (weekday office hours) districts of the users and writes the
+        home population of the districts split by refugee status
+     -K writes the top users by calls, transitions, active days and districts and the top districts by
+        calls and users (in total and per day), -k sets the number of entries of every ranking
+     -a writes the district days (-A Hourly for district hours) whose calls or users of the refugees or
+        the non refugees depart from the rolling window or exponentially weighted baseline, the activity tensor
+        is written next to it with "Activity.npz" in place of the extension
+     -g writes the in and out strength, PageRank and random walk betweenness of the districts in the
+        transition graphs of the refugees and the non refugees
+     -u clusters the users by hourly call profile, calls per day, transition rate, districts and travelled
+        distance with mini batch k-means and writes the cluster of every user and the centroid profiles,
+        -U sets the number of clusters
+     -L writes a locality sensitive hashing index of the users' transition matrices, with -l (comma separated
+        ids) the -k most similar users of the given users are found in an existing index instead and nothing
+        else is parsed
+     -G writes log binned histograms and summary statistics of the inter-call gaps and the dwell times in
+        the districts of the refugees and the non refugees
+     -r rolls the origin destination matrix (-o), the transition tensors (-x) and the activity of the anomalies
+        (-a, the anomalies of the level are detected again) up to the provinces (-R Region for the regions) of the
+        "District;Province;Region" hierarchy file and writes them with the level appended to the name, without
+        -i the files of a previous run are rolled up and nothing is parsed, -e yes drops the transitions within
+        the same province or region
+     -z with -i parses and sorts the data set once into shared memory and serves it at the address ("port",
+        "host:port" or a unix socket path) until -Z stops the server, without -i the served data set is
+        attached read only and processed like the -c run, so concurrent analyses share one copy of the data
+        the server writes a random key to a file only its user can read (~/.D4RSharedData/<address>.key or -y),
+        attaching and stopping read the key from the same file (-y for another key file), the shared memory is
+        only accessible to the user running the server, so only that user can attach
+     -v drops the calls reached from the previous call of the user faster than the given speed (spikes and
+        jumps above 50 km between districts), -V Flag only counts them, the counts per reason are logged and
+        added to the statistics
+     -E yes stores the trajectories run length encoded as stays of consecutive calls from the same district,
+        the call and transition counters and the transition matrices are counted from the stays
+     -C writes the parsed calls of every completed file and the state after parsing (and after the statistics
+        of the statistics run) to the folder, a restarted run with the same settings resumes from them without
+        parsing the completed files again, the -m and -c runs only resume the files, the checkpoints are
+        removed once the run is complete
+    """
+    def Run(argv):
+        inputfile    = None
+        distances    = None
+        markovOut    = None
+        printOut     = False
+        memoryBudget = None
+        tempFolder   = None
+        statsOut     = None
+        chunkSize    = None
+        odOut        = None
+        odPeriod     = None
+        tensorOut    = None
+        nSteps       = None
+        workers      = 1
+        fraction     = None
+        refFraction  = None
+        storeFolder  = None
+        queryIds     = None
+        complete     = False
+        homeOut      = None
+        rankOut      = None
+        topK         = DEFAULT_TOP_K
+        anomalyOut   = None
+        anomalyStep  = DAILY
+        graphOut     = None
+        clusterOut   = None
+        clusters     = DEFAULT_CLUSTERS
+        indexOut     = None
+        matchIds     = None
+        timesOut     = None
+        hierarchy    = None
+        level        = PROVINCE
+        collapse     = False
+        sharedAt     = None
+        stopAt       = None
+        maxSpeed     = None
+        travelMode   = None
+        runLength    = False
+        checkpoints  = None
+        keyFile      = None
+        out = ('D4R.py -i <Data Set Three Files Folder Path> -d <Distances File Path> -p <Yes/No> -P <File To Print Markov Out>\n'
+               '       -m <Memory Budget In MB> -t <Temporary Folder> -S <File To Print Statistics Out> -c <Chunk Size>\n'
+               '       -o <File To Print Origin Destination Matrix Out> -s <Daily/Monthly> -x <File To Print Transition Tensors Out>\n'
+               '       -n <Number Of Prediction Steps> -w <Number Of Worker Processes> -f <Sample Fraction> -F <Refugee Sample Fraction>\n'
+               '       -T <Trajectory Store Folder> -q <Caller Ids To Query> -D <Yes/No> -H <File To Print Home Population Out>\n'
+               '       -K <File To Print Rankings Out> -k <Number Of Top Entries> -a <File To Print Anomalies Out> -A <Daily/Hourly>\n'
+               '       -g <File To Print District Centrality Out> -u <File To Print User Clusters Out> -U <Number Of Clusters>\n'
+               '       -L <Similarity Index File> -l <Caller Ids To Match> -G <File To Print Time Distributions Out>\n'
+               '       -r <District Hierarchy File> -R <Province/Region> -e <Yes/No> -z <Shared Data Address>\n'
+               '       -Z <Shared Data Address To Stop> -v <Maximum Speed In Km/h> -V <Drop/Flag> -E <Yes/No> -C <Checkpoint Folder>\n'
+               '       -y <Shared Data Key File>')
+        try:
+           opts, args = getopt.getopt(argv,"hi:d:p:P:m:t:S:c:o:s:x:n:w:"
+                                           "f:F:T:q:D:H:K:k:a:A:g:u:U:L:l:G:r:R:e:z:Z:v:V:E:C:y:",["ifile=dfile=pfile=Pfile="])
+        except getopt.GetoptError:
+           print (out)
+           sys.exit(2)
+        for opt, arg in opts:
+            if opt == '-h':
+                print (out)
+                sys.exit()
+            elif opt in ("-i", "--ifile"):
+                inputfile = arg
+            elif opt in ("-d", "--dfile"):
+                distances = arg
+            elif opt in ("-p", "--pfile"):
+                printOut = (arg.strip().lower() == "yes")
+            elif opt in ("-P", "--Pfile"):
+                markovOut = arg
+            elif opt == "-m":
+                memoryBudget = int(float(arg) * 1024 * 1024)
+            elif opt == "-t":
+                tempFolder = arg
+            elif opt == "-S":
+                statsOut = arg
+            elif opt == "-c":
+                chunkSize = int(arg)
+            elif opt == "-o":
+                odOut = arg
+            elif opt == "-s":
+                odPeriod = arg.strip().capitalize()
+            elif opt == "-x":
+                tensorOut = arg
+            elif opt == "-n":
+                nSteps = int(arg)
+            elif opt == "-w":
+                workers = int(arg)
+            elif opt == "-f":
+                fraction = float(arg)
+            elif opt == "-F":
+                refFraction = float(arg)
+            elif opt == "-T":
+                storeFolder = arg
+            elif opt == "-q":
+                queryIds = [int(x) for x in arg.split(",") if x.strip() != ""]
+            elif opt == "-D":
+                complete = (arg.strip().lower() == "yes")
+            elif opt == "-H":
+                homeOut = arg
+            elif opt == "-K":
+                rankOut = arg
+            elif opt == "-k":
+                topK = int(arg)
+            elif opt == "-a":
+                anomalyOut = arg
+            elif opt == "-A":
+                anomalyStep = arg.strip().capitalize()
+            elif opt == "-g":
+                graphOut = arg
+            elif opt == "-u":
+                clusterOut = arg
+            elif opt == "-U":
+                clusters = int(arg)
+            elif opt == "-L":
+                indexOut = arg
+            elif opt == "-l":
+                matchIds = [int(x) for x in arg.split(",") if x.strip() != ""]
+            elif opt == "-G":
+                timesOut = arg
+            elif opt == "-r":
+                hierarchy = arg
+            elif opt == "-R":
+                level = arg.strip().capitalize()
+            elif opt == "-e":
+                collapse = (arg.strip().lower() == "yes")
+            elif opt == "-z":
+                sharedAt = ParseAddress(arg)
+            elif opt == "-Z":
+                stopAt = ParseAddress(arg)
+            elif opt == "-v":
+                maxSpeed = float(arg)
+            elif opt == "-V":
+                travelMode = arg.strip().lower()
+            elif opt == "-E":
+                runLength = (arg.strip().lower() == "yes")
+            elif opt == "-C":
+                checkpoints = arg
+            elif opt == "-y":
+                keyFile = arg
+
+        # sample the callers if requested
+        sampler = None
+        if fraction is not None or refFraction is not None:
+            sampler = CallerSampler(1.0 if fraction is None else fraction, refFraction)
+
+        # filter the impossible travel if requested
+        travelFilter = None
+        if maxSpeed is not None or travelMode is not None:
+            travelFilter = TravelFilter(DEFAULT_MAX_SPEED if maxSpeed is None else maxSpeed, travelMode != "flag")
+                
+        # check if the file exists
+        if stopAt is not None:
+            # stop a shared data server
+            StopSharedDataServer(stopAt, keyFile)
+        elif sharedAt is not None and inputfile is not None:
+            # parse once and serve the data set to other processes
+            MainDataSetThreeScript.ServeRun(inputfile, sharedAt, sampler, keyFile)
+        elif sharedAt is not None and distances is not None:
+            # process the data set of a shared data server
+            MainDataSetThreeScript.SharedRun(sharedAt, distances, printOut, markovOut, statsOut, odOut, odPeriod, tensorOut,
+                                             nSteps, storeFolder, complete, homeOut, rankOut, topK, anomalyOut, anomalyStep,
+                                             graphOut, clusterOut, clusters, indexOut, timesOut, travelFilter, runLength, keyFile)
+        elif storeFolder is not None and queryIds is not None:
+            # load single users from the trajectory store
+            MainDataSetThreeScript.QueryRun(storeFolder, queryIds, markovOut)
+        elif indexOut is not None and matchIds is not None:
+            # find similar users in the similarity index
+            MainDataSetThreeScript.SimilarityRun(indexOut, matchIds, topK, markovOut)
+        elif inputfile is not None and distances is not None and memoryBudget is not None:
+            # parse and process data with bounded memory
+            MainDataSetThreeScript.ExternalSortRun(inputfile, distances, printOut, markovOut, statsOut, memoryBudget, tempFolder,
+                                                   DEFAULT_CHUNK_SIZE if chunkSize is None else chunkSize, odOut, odPeriod,
+                                                   tensorOut, nSteps, sampler, storeFolder, complete, homeOut, rankOut, topK,
+                                                   anomalyOut, anomalyStep, graphOut, clusterOut, clusters, indexOut, timesOut,
+                                                   travelFilter, runLength, checkpoints)
+        elif inputfile is not None and distances is not None and chunkSize is not None:
+            # parse and process caller grouped data as a stream
+            MainDataSetThreeScript.PipelineRun(inputfile, distances, printOut, markovOut, statsOut, chunkSize, odOut, odPeriod,
+                                               tensorOut, nSteps, sampler, storeFolder, complete, homeOut, rankOut, topK,
+                                               anomalyOut, anomalyStep, graphOut, clusterOut, clusters, indexOut, timesOut,
+                                               travelFilter, runLength, checkpoints)
+        elif inputfile is not None and distances is not None and statsOut is not None and markovOut is None:
+            # calculate the statistics only
+            MainDataSetThreeScript.StatisticsRun(inputfile, distances, True, statsOut, sampler, complete, travelFilter, runLength,
+                                                 checkpoints)
+        elif inputfile is not None and distances is not None:  
+            # parse and process data
+            MainDataSetThreeScript.MainRun(inputfile, distances, printOut, markovOut, odOut, odPeriod, tensorOut, nSteps, workers,
+                                           sampler, storeFolder, complete, homeOut, rankOut, topK, anomalyOut, anomalyStep,
+                                           graphOut, clusterOut, clusters, indexOut, timesOut, travelFilter, runLength,
+                                           checkpoints)
+        elif hierarchy is None:
+            print (out)
+
+        # roll the district level outputs up the hierarchy
+        if hierarchy is not None:
+            MainDataSetThreeScript.RollUpRun(hierarchy, level, collapse, odOut, tensorOut, anomalyOut)
+    """
+    Main Run
+    inputfolder  => full path of the folder containing Data Set 3 files
+    distances    => full path of the distances file
+    printOut     => Flag to select whether user data and transition matrix shall be printed (optional default = No)
+    outFile      => full path of the file if user data is to be written out
+    odFile       => full path of the origin destination matrix file, long csv for .csv and binary otherwise (optional)
+    odPeriod     => Slicing of the origin destination matrix "Daily", "Monthly" or None (optional)
+    tensorFile   => full path of the transition tensor files, "Hourly" and "Monthly" are appended to the name (optional)
+    nSteps       => Number of steps of the predicted distribution, the transition matrices are only analysed if given (optional)
+    workers      => Number of worker processes creating the transition matrices (optional default = 1)
+    sampler      => CallerSampler selecting the callers to be processed (optional)
+    storeFolder  => Folder the trajectory store is written to (optional)
+    complete     => Flag to complete the missing distances with shortest paths (optional default = No)
+    homeFile     => full path of the home population file, home and work districts are only detected if given (optional)
+    rankFile     => full path of the rankings file, the top users and districts are only ranked if given (optional)
+    topK         => Number of entries of every ranking (optional default = DEFAULT_TOP_K)
+    anomalyFile  => full path of the activity anomalies file, anomalies are only detected if given (optional)
+    anomalyStep  => Slicing of the activity "Daily" or "Hourly" (optional default = Daily)
+    graphFile    => full path of the district centrality file, the transition graphs are only analysed if given (optional)
+    clusterFile  => full path of the user clusters file, the users are only clustered if given (optional)
+    clusters     => Number of user clusters (optional default = DEFAULT_CLUSTERS)
+    indexFile    => full path of the similarity index file, the index is only built if given (optional)
+    timesFile    => full path of the time distributions file, the gaps and dwell times are only measured if given (optional)
+    travelFilter => TravelFilter of the impossible travel between consecutive calls (optional)
+    runLength    => Flag to store the trajectories run length encoded (optional default = No)
+    checkpoints  => Folder of the checkpoints the run resumes from and writes to (optional)
+    """
+    def MainRun(inputfolder, distances, printOut=False, outFile = None, odFile = None, odPeriod = None, tensorFile = None,
+                nSteps = None, workers = 1, sampler = None, storeFolder = None, complete = False, homeFile = None,
+                rankFile = None, topK = DEFAULT_TOP_K, anomalyFile = None, anomalyStep = DAILY, graphFile = None,
+                clusterFile = None, clusters = DEFAULT_CLUSTERS, indexFile = None, timesFile = None, travelFilter = None,
+                runLength = False, checkpoints = None):
+        # create a new set
+        DataSet = DataSetThree(sampler = sampler, travelFilter = travelFilter, runLength = runLength)
+        DataSet.ParseDistanceData(distances, complete)
+
+        # get the list of files only
+        files = MainDataSetThreeScript.ListInputFiles(inputfolder)
+        checkpoint = DataSet.OpenCheckpoint(checkpoints, files)
+        
+        # iterate through all files, reading ahead while parsing (or resume from the checkpoints)
+        if not DataSet.RestoreParsedData(checkpoint):
+            DataSet.ParseFiles(files, checkpoint = checkpoint)
+            DataSet.FilterImpossibleTravel()
+            DataSet.CheckpointParsedData(checkpoint)
+        DataSet.EncodeRunLengths()
+
+        # store the trajectories for later queries
+        if storeFolder is not None:
+            for user in DataSet.StoreUsers(DataSet.UserLocationData.values(), storeFolder):
+                pass
+
+        # create per user state transition matrix
+        DataSet.CreateTransitionMatrix(workers)
+
+        # stationary distributions, return times and predictions of the transition matrices
+        if nSteps is not None:
+            DataSet.AnalyseTransitionMatrices(nSteps)
+
+        # home and work districts
+        if homeFile is not None:
+            DataSet.DetectStayLocations().WriteCsv(homeFile)
+
+        # create the population aggregates
+        for aggregate, fileName in MainDataSetThreeScript.CreateAggregates(odFile, odPeriod, tensorFile, rankFile, topK,
+                                                                           anomalyFile, anomalyStep, graphFile, clusterFile,
+                                                                           clusters, indexFile, timesFile,
+                                                                           DataSet.GetDistanceMatrix() if clusterFile is not None else None):
+            aggregate.AddRecords(DataSet.GetColumnarData().Records)
+            aggregate.Write(fileName)
+
+        # create the transition statistics
+
+        if printOut :
+            # print out the data
+            DataSet.PrintUserLocationData(outFile)
+
+        # log everything
+        DataSet.Logout()
+
+        # the run is complete, so the checkpoints are not needed anymore
+        if checkpoint is not None:
+            checkpoint.Remove()
+
+    """
+    Statistics Run
+    inputfolder  => full path of the folder containing Data Set 3 files
+    distances    => full path of the distances file
+    printOut     => Flag to select whether the statistics shall be printed (optional default = No)
+    outFile      => full path of the file if the statistics are to be written out
+    sampler      => CallerSampler selecting the callers to be processed, the means get standard errors (optional)
+    complete     => Flag to complete the missing distances with shortest paths (optional default = No)
+    travelFilter => TravelFilter of the impossible travel between consecutive calls (optional)
+    runLength    => Flag to store the trajectories run length encoded (optional default = No)
+    checkpoints  => Folder of the checkpoints the run resumes from and writes to (optional)
+    """
+    def StatisticsRun(inputfolder, distances, printOut=False, outFile = None, sampler = None, complete = False,
+                      travelFilter = None, runLength = False, checkpoints = None):
+         # create a new set
+        DataSet = DataSetThree(sampler = sampler, travelFilter = travelFilter, runLength = runLength)
+        DataSet.ParseDistanceData(distances, complete)
+
+        # get the list of files only
+        files = MainDataSetThreeScript.ListInputFiles(inputfolder)
+        checkpoint = DataSet.OpenCheckpoint(checkpoints, files)
+
+        # the statistics of a previous run are finalized right away
+        if not DataSet.RestoreUserStatistics(checkpoint):
+            # iterate through all files, reading ahead while parsing (or resume from the checkpoints)
+            if not DataSet.RestoreParsedData(checkpoint):
+                DataSet.ParseFiles(files, checkpoint = checkpoint)
+                DataSet.FilterImpossibleTravel()
+                DataSet.CheckpointParsedData(checkpoint)
+            DataSet.EncodeRunLengths()
+
+            # create the transition statistics
+            DataSet.CalculateUserStatistics()
+            DataSet.CheckpointUserStatistics(checkpoint)
+
+        if printOut :
+            # print out the data
+            DataSet.PrintUserStatistics(outFile)
+
+        # log everything
+        DataSet.Logout()
+
+        # the run is complete, so the checkpoints are not needed anymore
+        if checkpoint is not None:
+            checkpoint.Remove()
+
+    """
+    Query Run
+    Loads single users from a trajectory store written by one of the other runs, nothing else is read
+    storeFolder => Folder of the trajectory store
+    callerIds   => List of caller ids (integers without the refugee prefix)
+    outFile     => full path of the file if the users are to be written out (if left blank direct to sys out)
+    """
+    def QueryRun(storeFolder, callerIds, outFile = None):
+        store = TrajectoryStore(storeFolder)
+        out   = ""
+        for callerId in callerIds:
+            user = DataSetThree.LoadUser(store, callerId)
+            if user is None:
+                out += str(callerId) + "=>Not Found\n"
+            else:
+                out += DataSetThree.UserLocationDataString(user) + DataSetThree.UserCountersString(user)
+
+        # print out the contents
+        if outFile is None:
+            print(out)
+        else:
+            with open(outFile, "w+") as f:
+                f.write(out)
+
+    """
+    Similarity Run
+    Finds the users with the most similar transition matrices in a similarity index written by one
+    of the other runs, nothing else is read
+    indexFile => full path of the similarity index file
+    callerIds => List of caller ids (integers without the refugee prefix)
+    k         => Number of similar users of every caller
+    outFile   => full path of the file if the similar users are to be written out (if left blank direct to sys out)
+    """
+    def SimilarityRun(indexFile, callerIds, k = DEFAULT_TOP_K, outFile = None):
+        index = TransitionIndex.Read(indexFile)
+        out   = ""
+        for callerId in callerIds:
+            similar = index.Query(callerId, k)
+            if similar is None:
+                out += str(callerId) + "=>Not Found\n"
+            else:
+                out += str(callerId) + "=>" + str(similar) + "\n"
+
+        # print out the contents
+        if outFile is None:
+            print(out)
+        else:
+            with open(outFile, "w+") as f:
+                f.write(out)
+
+    """
+    Roll Up Run
+    Re-aggregates the origin destination matrix, the transition tensors and the activity of the anomalies
+    written by one of the other runs to a level of the district hierarchy, the rolled up files get the level appended to the name
+    hierarchyFile    => full path of the district hierarchy file
+    level            => Level of the hierarchy "Province" or "Region"
+    collapseInternal => Drop the transitions within the same province or region (boolean)
+    odFile           => full path of the origin destination matrix file (optional)
+    tensorFile       => full path of the transition tensor files, "Hourly" and "Monthly" are appended to the name (optional)
+    anomalyFile      => full path of the activity anomalies file, its activity tensor is rolled up and the anomalies of
+                        the level are detected (optional)
+    """
+    def RollUpRun(hierarchyFile, level = PROVINCE, collapseInternal = False, odFile = None, tensorFile = None, anomalyFile = None):
+        hierarchy = RegionHierarchy.Read(hierarchyFile)
+        if anomalyFile is not None:
+            activityFile = ActivityAnomalies.GetTensorFile(anomalyFile)
+            if isfile(activityFile):
+                tensor    = ActivityTensor.ReadBinary(activityFile)
+                anomalies = ActivityAnomalies(tensor.Period)
+                anomalies.Tensor = hierarchy.RollUpActivity(tensor, level)
+                name, extension  = splitext(anomalyFile)
+                anomalies.Write(name + level + extension)
+            else:
+                print(activityFile, " does not exist and is not rolled up")
+        fileNames = [] if odFile is None else [(odFile, OriginDestinationMatrix)]
+        if tensorFile is not None:
+            name, extension = splitext(tensorFile)
+            fileNames += [(name + "Hourly" + extension, TransitionTensor), (name + "Monthly" + extension, TransitionTensor)]
+        for fileName, matrixType in fileNames:
+            if not isfile(fileName):
+                print(fileName, " does not exist and is not rolled up")
+                continue
+            name, extension = splitext(fileName)
+            matrix = matrixType.Read(fileName)
+            hierarchy.RollUpMatrix(matrix, level, collapseInternal).Write(name + level + extension)
+
+    """
+    List the data files of a folder, plain and compressed (gzip, bz2, xz) files are both accepted
+    inputfolder => full path of the folder containing Data Set 3 files
+    """
+    def ListInputFiles(inputfolder):
+        # get the list of files only
+        files = [join(inputfolder, f) for f in listdir(inputfolder) if isfile(join(inputfolder, f)) ]
+        compressed = [f for f in files if GetCompression(f) is not None]
+        if len(compressed) > 0:
+            print(len(compressed), " of ", len(files), " files are compressed and decompressed while read")
+        return files
+
+    """
+    Create the requested population aggregates
+    Returns a list of (aggregate, fileName) pairs, every aggregate is filled with AddRecords
+    odFile      => full path of the origin destination matrix file (optional)
+    odPeriod    => Slicing of the origin destination matrix "Daily", "Monthly" or None (optional)
+    tensorFile  => full path of the transition tensor files, "Hourly" and "Monthly" are appended to the name (optional)
+    rankFile    => full path of the rankings file (optional)
+    topK        => Number of entries of every ranking
+    anomalyFile => full path of the activity anomalies file (optional)
+    anomalyStep => Slicing of the activity "Daily" or "Hourly"
+    graphFile   => full path of the district centrality file (optional)
+    clusterFile => full path of the user clusters file (optional)
+    clusters    => Number of user clusters
+    indexFile   => full path of the similarity index file (optional)
+    timesFile   => full path of the time distributions file (optional)
+    distances   => DistanceMatrix of the districts for the travelled distance of the users (optional)
+    """
+    def CreateAggregates(odFile = None, odPeriod = None, tensorFile = None, rankFile = None, topK = DEFAULT_TOP_K,
+                         anomalyFile = None, anomalyStep = DAILY, graphFile = None, clusterFile = None,
+                         clusters = DEFAULT_CLUSTERS, indexFile = None, timesFile = None, distances = None):
+        aggregates = []
+        if odFile is not None:
+            aggregates.append((OriginDestinationMatrix(odPeriod), odFile))
+        if tensorFile is not None:
+            name, extension = splitext(tensorFile)
+            aggregates.append((TransitionTensor(HOUR_OF_DAY), name + "Hourly" + extension))
+            aggregates.append((TransitionTensor(MONTH_OF_YEAR), name + "Monthly" + extension))
+        if rankFile is not None:
+            aggregates.append((Rankings(topK), rankFile))
+        if anomalyFile is not None:
+            aggregates.append((ActivityAnomalies(anomalyStep), anomalyFile))
+        if graphFile is not None:
+            aggregates.append((DistrictCentrality(), graphFile))
+        if clusterFile is not None:
+            aggregates.append((UserClusters(clusters, distances), clusterFile))
+        if indexFile is not None:
+            aggregates.append((TransitionIndex(), indexFile))
+        if timesFile is not None:
+            aggregates.append((TimeDistributions(), timesFile))
+        return aggregates
+
+    """
+    Consume the processed users and print them if requested
+    users    => Iterable of UserTimeSortedLocationData
+    printOut => Flag to select whether user data and transition matrix shall be printed
+    outFile  => full path of the file if user data is to be written out (if left blank direct to sys out)
+    """
+    def WriteUsers(users, printOut=False, outFile = None):
+        out = None
+        if printOut and outFile is not None:
+            out = open(outFile, "w+")
+        try:
+            for user in users:
+                if printOut:
+                    if out is None:
+                        print(DataSetThree.UserLocationDataString(user))
+                    else:
+                        out.write(DataSetThree.UserLocationDataString(user))
+        finally:
+            if out is not None:
+                out.close()
+
+    """
+    Out of core run for data sets that do not fit into memory
+    Records are external sorted by caller and time, then transitions, transition matrices and
+    statistics are calculated one user at a time
+    inputfolder  => full path of the folder containing Data Set 3 files
+    distances    => full path of the distances file
+    printOut     => Flag to select whether user data and transition matrix shall be printed (optional default = No)
+    outFile      => full path of the file if user data is to be written out
+    statsFile    => full path of the file if statistics are to be written out (optional)
+    memoryBudget => Number of bytes the sorter may keep in memory
+    tempFolder   => Folder of the temporary sorted runs (optional)
+    chunkSize    => Number of records parsed at once before they are passed to the sorter
+    odFile       => full path of the origin destination matrix file (optional)
+    odPeriod     => Slicing of the origin destination matrix "Daily", "Monthly" or None (optional)
+    tensorFile   => full path of the transition tensor files (optional)
+    nSteps       => Number of steps of the predicted distribution, the transition matrices are only analysed if given (optional)
+    sampler      => CallerSampler selecting the callers to be processed (optional)
+    storeFolder  => Folder the trajectory store is written to (optional)
+    complete     => Flag to complete the missing distances with shortest paths (optional default = No)
+    homeFile     => full path of the home population file, home and work districts are only detected if given (optional)
+    rankFile     => full path of the rankings file, the top users and districts are only ranked if given (optional)
+    topK         => Number of entries of every ranking (optional default = DEFAULT_TOP_K)
+    anomalyFile  => full path of the activity anomalies file, anomalies are only detected if given (optional)
+    anomalyStep  => Slicing of the activity "Daily" or "Hourly" (optional default = Daily)
+    graphFile    => full path of the district centrality file, the transition graphs are only analysed if given (optional)
+    clusterFile  => full path of the user clusters file, the users are only clustered if given (optional)
+    clusters     => Number of user clusters (optional default = DEFAULT_CLUSTERS)
+    indexFile    => full path of the similarity index file, the index is only built if given (optional)
+    timesFile    => full path of the time distributions file, the gaps and dwell times are only measured if given (optional)
+    travelFilter => TravelFilter of the impossible travel between consecutive calls (optional)
+    runLength    => Flag to store the trajectories run length encoded (optional default = No)
+    checkpoints  => Folder of the checkpoints the run resumes from and writes to (optional)
+    """
+    def ExternalSortRun(inputfolder, distances, printOut=False, outFile = None, statsFile = None,
+                        memoryBudget = DEFAULT_MEMORY_BUDGET, tempFolder = None, chunkSize = DEFAULT_CHUNK_SIZE, odFile = None,
+                        odPeriod = None, tensorFile = None, nSteps = None, sampler = None, storeFolder = None, complete = False,
+                        homeFile = None, rankFile = None, topK = DEFAULT_TOP_K, anomalyFile = None, anomalyStep = DAILY,
+                        graphFile = None, clusterFile = None, clusters = DEFAULT_CLUSTERS, indexFile = None, timesFile = None,
+                        travelFilter = None, runLength = False, checkpoints = None):
+        # create a new set
+        DataSet = DataSetThree(sampler = sampler, travelFilter = travelFilter, runLength = runLength)
+        DataSet.ParseDistanceData(distances, complete)
+
+        # get the list of files only
+        files = MainDataSetThreeScript.ListInputFiles(inputfolder)
+        checkpoint = DataSet.OpenCheckpoint(checkpoints, files)
+
+        with ExternalSorter(memoryBudget, tempFolder) as sorter:
+            # iterate through all files (the completed ones are resumed from the checkpoints)
+            for chunk in DataSet.ReadRecordChunks(files, chunkSize, checkpoint):
+                sorter.AddRecords(chunk)
+
+            # process one user at a time
+            DataSet.ResetUserStatistics()
+            aggregates = MainDataSetThreeScript.CreateAggregates(odFile, odPeriod, tensorFile, rankFile, topK, anomalyFile,
+                                                                 anomalyStep, graphFile, clusterFile, clusters, indexFile,
+                                                                 timesFile,
+                                                                 DataSet.GetDistanceMatrix() if clusterFile is not None else None)
+            users = DataSet.ProcessUsers(DataSet.IterateSortedUsers(sorter), [aggregate for aggregate, fileName in aggregates])
+            if nSteps is not None:
+                users = DataSet.AnalyseUsers(users, nSteps)
+            population = DistrictPopulation(HOME)
+            if homeFile is not None:
+                users = DataSet.DetectStayUsers(users, population)
+            if storeFolder is not None:
+                users = DataSet.StoreUsers(users, storeFolder)
+            MainDataSetThreeScript.WriteUsers(users, printOut, outFile)
+
+        for aggregate, fileName in aggregates:
+            aggregate.Write(fileName)
+        if homeFile is not None:
+            population.WriteCsv(homeFile)
+
+        # create the population statistics
+        DataSet.FinalizeUserStatistics()
+        if statsFile is not None:
+            DataSet.PrintUserStatistics(statsFile)
+
+        # log everything
+        DataSet.Logout()
+
+        # the run is complete, so the checkpoints are not needed anymore
+        if checkpoint is not None:
+            checkpoint.Remove()
+
+    """
+    Streaming run for data sets whose files keep the calls of a caller together
+    Every stage is a generator, records flow in chunks of chunkSize and users are written out
+    as soon as their last call is read, so peak memory is bounded by the chunk size and the
+    largest user instead of the data set
+    inputfolder  => full path of the folder containing Data Set 3 files
+    distances    => full path of the distances file
+    printOut     => Flag to select whether user data and transition matrix shall be printed (optional default = No)
+    outFile      => full path of the file if user data is to be written out
+    statsFile    => full path of the file if statistics are to be written out (optional)
+    chunkSize    => Number of records passed between the stages at once
+    odFile       => full path of the origin destination matrix file (optional)
+    odPeriod     => Slicing of the origin destination matrix "Daily", "Monthly" or None (optional)
+    tensorFile   => full path of the transition tensor files (optional)
+    nSteps       => Number of steps of the predicted distribution, the transition matrices are only analysed if given (optional)
+    sampler      => CallerSampler selecting the callers to be processed (optional)
+    storeFolder  => Folder the trajectory store is written to (optional)
+    complete     => Flag to complete the missing distances with shortest paths (optional default = No)
+    homeFile     => full path of the home population file, home and work districts are only detected if given (optional)
+    rankFile     => full path of the rankings file, the top users and districts are only ranked if given (optional)
+    topK         => Number of entries of every ranking (optional default = DEFAULT_TOP_K)
+    anomalyFile  => full path of the activity anomalies file, anomalies are only detected if given (optional)
+    anomalyStep  => Slicing of the activity "Daily" or "Hourly" (optional default = Daily)
+    graphFile    => full path of the district centrality file, the transition graphs are only analysed if given (optional)
+    clusterFile  => full path of the user clusters file, the users are only clustered if given (optional)
+    clusters     => Number of user clusters (optional default = DEFAULT_CLUSTERS)
+    indexFile    => full path of the similarity index file, the index is only built if given (optional)
+    timesFile    => full path of the time distributions file, the gaps and dwell times are only measured if given (optional)
+    travelFilter => TravelFilter of the impossible travel between consecutive calls (optional)
+    runLength    => Flag to store the trajectories run length encoded (optional default = No)
+    checkpoints  => Folder of the checkpoints the run resumes from and writes to (optional)
+    """
+    def PipelineRun(inputfolder, distances, printOut=False, outFile = None, statsFile = None, chunkSize = DEFAULT_CHUNK_SIZE,
+                    odFile = None, odPeriod = None, tensorFile = None, nSteps = None, sampler = None, storeFolder = None,
+                    complete = False, homeFile = None, rankFile = None, topK = DEFAULT_TOP_K, anomalyFile = None,
+                    anomalyStep = DAILY, graphFile = None, clusterFile = None, clusters = DEFAULT_CLUSTERS, indexFile = None,
+                    timesFile = None, travelFilter = None, runLength = False, checkpoints = None):
+        # create a new set
+        DataSet = DataSetThree(sampler = sampler, travelFilter = travelFilter, runLength = runLength)
+        DataSet.ParseDistanceData(distances, complete)
+
+        # get the list of files only (sorted so that callers spanning two files stay together)
+        files = sorted(MainDataSetThreeScript.ListInputFiles(inputfolder))
+        checkpoint = DataSet.OpenCheckpoint(checkpoints, files)
+
+        # chain the stages, nothing is read before the last stage asks for a user
+        # (the completed files are resumed from the checkpoints)
+        DataSet.ResetUserStatistics()
+        chunks = DataSet.ReadRecordChunks(files, chunkSize, checkpoint)
+        aggregates = MainDataSetThreeScript.CreateAggregates(odFile, odPeriod, tensorFile, rankFile, topK, anomalyFile,
+                                                             anomalyStep, graphFile, clusterFile, clusters, indexFile, timesFile,
+                                                             DataSet.GetDistanceMatrix() if clusterFile is not None else None)
+        users  = DataSet.ProcessUsers(DataSet.BuildUsers(GroupCallerChunks(chunks)),
+                                      [aggregate for aggregate, fileName in aggregates])
+        if nSteps is not None:
+            users = DataSet.AnalyseUsers(users, nSteps)
+        population = DistrictPopulation(HOME)
+        if homeFile is not None:
+            users = DataSet.DetectStayUsers(users, population)
+        if storeFolder is not None:
+            users = DataSet.StoreUsers(users, storeFolder)
+        MainDataSetThreeScript.WriteUsers(users, printOut, outFile)
+        for aggregate, fileName in aggregates:
+            aggregate.Write(fileName)
+        if homeFile is not None:
+            population.WriteCsv(homeFile)
+
+        # create the population statistics
+        DataSet.FinalizeUserStatistics()
+        if statsFile is not None:
+            DataSet.PrintUserStatistics(statsFile)
+
+        # log everything
+        DataSet.Logout()
+
+        # the run is complete, so the checkpoints are not needed anymore
+        if checkpoint is not None:
+            checkpoint.Remove()
+
+    """
+    Serve Run
+    Parses and sorts the data set once and serves it from shared memory to the shared runs of other
+    processes until a stop request arrives, the parsed users are dropped once the records are shared
+    inputfolder => full path of the folder containing Data Set 3 files
+    address     => Address of the handshake (see ParseAddress)
+    sampler     => CallerSampler selecting the callers to be served (optional)
+    keyFile     => full path of the key file written for the attaching runs (optional, see GetKeyFile)
+    """
+    def ServeRun(inputfolder, address, sampler = None, keyFile = None):
+        # create a new set
+        DataSet = DataSetThree(sampler = sampler)
+
+        # iterate through all files, reading ahead while parsing
+        DataSet.ParseFiles(MainDataSetThreeScript.ListInputFiles(inputfolder))
+
+        with SharedDataServer(DataSet.GetColumnarData(), address, keyFile) as server:
+            DataSet.UserLocationData = {}
+            DataSet.Columnar         = None
+            print("Serving ", server.Records, " records of ", server.Users, " users at ", address, " with the key in ", server.KeyFile)
+            try:
+                server.Serve()
+            except KeyboardInterrupt:
+                pass
+            print("Served ", server.Attached, " attached runs")
+
+        # log everything
+        DataSet.Logout()
+
+    """
+    Shared Run
+    Processes the data set served by a ServeRun like the streaming run, the records are read from
+    the shared memory of the server one user at a time instead of being parsed and sorted again
+    address      => Address of the shared data server (see ParseAddress)
+    distances    => full path of the distances file
+    printOut     => Flag to select whether user data and transition matrix shall be printed (optional default = No)
+    outFile      => full path of the file if user data is to be written out
+    statsFile    => full path of the file if statistics are to be written out (optional)
+    odFile       => full path of the origin destination matrix file (optional)
+    odPeriod     => Slicing of the origin destination matrix "Daily", "Monthly" or None (optional)
+    tensorFile   => full path of the transition tensor files (optional)
+    nSteps       => Number of steps of the predicted distribution, the transition matrices are only analysed if given (optional)
+    storeFolder  => Folder the trajectory store is written to (optional)
+    complete     => Flag to complete the missing distances with shortest paths (optional default = No)
+    homeFile     => full path of the home population file, home and work districts are only detected if given (optional)
+    rankFile     => full path of the rankings file, the top users and districts are only ranked if given (optional)
+    topK         => Number of entries of every ranking (optional default = DEFAULT_TOP_K)
+    anomalyFile  => full path of the activity anomalies file, anomalies are only detected if given (optional)
+    anomalyStep  => Slicing of the activity "Daily" or "Hourly" (optional default = Daily)
+    graphFile    => full path of the district centrality file, the transition graphs are only analysed if given (optional)
+    clusterFile  => full path of the user clusters file, the users are only clustered if given (optional)
+    clusters     => Number of user clusters (optional default = DEFAULT_CLUSTERS)
+    indexFile    => full path of the similarity index file, the index is only built if given (optional)
+    timesFile    => full path of the time distributions file, the gaps and dwell times are only measured if given (optional)
+    travelFilter => TravelFilter of the impossible travel between consecutive calls (optional)
+    runLength    => Flag to store the trajectories run length encoded (optional default = No)
+    keyFile      => full path of the key file of the server (optional, see GetKeyFile)
+    """
+    def SharedRun(address, distances, printOut=False, outFile = None, statsFile = None, odFile = None, odPeriod = None,
+                  tensorFile = None, nSteps = None, storeFolder = None, complete = False, homeFile = None, rankFile = None,
+                  topK = DEFAULT_TOP_K, anomalyFile = None, anomalyStep = DAILY, graphFile = None, clusterFile = None,
+                  clusters = DEFAULT_CLUSTERS, indexFile = None, timesFile = None, travelFilter = None, runLength = False,
+                  keyFile = None):
+        # create a new set
+        DataSet = DataSetThree(travelFilter = travelFilter, runLength = runLength)
+        DataSet.ParseDistanceData(distances, complete)
+
+        # attach to the sorted records of the server
+        shared = SharedDataSet(address, keyFile)
+        print("Attached to ", len(shared), " records at ", address)
+
+        # chain the stages, nothing is read before the last stage asks for a user
+        DataSet.ResetUserStatistics()
+        aggregates = MainDataSetThreeScript.CreateAggregates(odFile, odPeriod, tensorFile, rankFile, topK, anomalyFile,
+                                                             anomalyStep, graphFile, clusterFile, clusters, indexFile, timesFile,
+                                                             DataSet.GetDistanceMatrix() if clusterFile is not None else None)
+        users = DataSet.ProcessUsers(DataSet.IterateColumnarUsers(shared.Columnar),
+                                     [aggregate for aggregate, fileName in aggregates])
+        if nSteps is not None:
+            users = DataSet.AnalyseUsers(users, nSteps)
+        population = DistrictPopulation(HOME)
+        if homeFile is not None:
+            users = DataSet.DetectStayUsers(users, population)
+        if storeFolder is not None:
+            users = DataSet.StoreUsers(users, storeFolder)
+        MainDataSetThreeScript.WriteUsers(users, printOut, outFile)
+        shared.Close()
+        for aggregate, fileName in aggregates:
+            aggregate.Write(fileName)
+        if homeFile is not None:
+            population.WriteCsv(homeFile)
+
+        # create the population statistics
+        DataSet.FinalizeUserStatistics()
+        if statsFile is not None:
+            DataSet.PrintUserStatistics(statsFile)
+
+        # log everything
+        DataSet.Logout()
+
+# run the code (guarded so that worker processes importing the script do not run it again)
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        MainDataSetThreeScript.Run(sys.argv[1:])
+    else:
+        # MainDataSetThreeScript.MainRun("D:\\work\\D4R\\Dataset3New", "distances.txt", True, "Markov.out")
+        MainDataSetThreeScript.StatisticsRun("D:\\work\\D4R\\Dataset3New", "distances.txt", True, "Statistics.csv")
+    print("Operation Finished")
+
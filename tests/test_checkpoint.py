@@ -0,0 +1,98 @@
+#!/usr/bin/python
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from D4RWholeData3 import DataSetThree
+from tests.test_runs import WriteDistances, WriteDataSet, RunScript, ReadLines
+
+"""
+Patch a method of the data set so that the run is interrupted once it was called the given number of times
+name  => Name of the method of DataSetThree
+calls => Number of completed calls before the run is interrupted
+"""
+def InterruptAfter(name, calls):
+    original = getattr(DataSetThree, name)
+    count    = [0]
+    def Interrupted(self, *args, **kwargs):
+        result = original(self, *args, **kwargs)
+        count[0] += 1
+        if count[0] == calls:
+            raise KeyboardInterrupt()
+        return result
+    return mock.patch.object(DataSetThree, name, Interrupted)
+
+class CheckpointResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.Folder      = tempfile.mkdtemp()
+        self.Distances   = os.path.join(self.Folder, "distances.txt")
+        self.Checkpoints = os.path.join(self.Folder, "checkpoints")
+        WriteDistances(self.Distances)
+        WriteDataSet(self.Folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.Folder)
+
+    """
+    Run without checkpoints, then interrupt a run with checkpoints and restart it
+    Returns the output folders of the uninterrupted and the resumed run and what the resumed run printed
+    name  => Name of the method of DataSetThree the run is interrupted after
+    calls => Number of calls of the method before the run is interrupted
+    args  => List of command line arguments besides the distances and the checkpoints
+    """
+    def RunInterrupted(self, name, calls, args):
+        complete = os.path.join(self.Folder, "complete")
+        resumed  = os.path.join(self.Folder, "resumed")
+        args     = ["-d", self.Distances] + args
+        RunScript(complete, args)
+        with InterruptAfter(name, calls):
+            with self.assertRaises(KeyboardInterrupt):
+                RunScript(resumed, args + ["-C", self.Checkpoints])
+        self.assertTrue(len(os.listdir(self.Checkpoints)) > 0)
+        out = RunScript(resumed, args + ["-C", self.Checkpoints])
+        # the checkpoints are removed once the run is complete
+        self.assertEqual(os.listdir(self.Checkpoints), [])
+        return complete, resumed, out
+
+    """
+    Check that the outputs of both runs are the same
+    complete => Output folder of the uninterrupted run
+    resumed  => Output folder of the resumed run
+    files    => List of (file name, sort) pairs, sort if the order of the users does not matter
+    """
+    def AssertSameOutput(self, complete, resumed, files):
+        for fileName, sort in files:
+            self.assertEqual(ReadLines(os.path.join(resumed, fileName), sort), ReadLines(os.path.join(complete, fileName), sort), fileName)
+
+    def test_statistics_run_resumes_the_completed_files(self):
+        args = ["-i", os.path.join(self.Folder, "mixed"), "-S", "st.txt", "-f", "0.7"]
+        complete, resumed, out = self.RunInterrupted("CheckpointFile", 2, args)
+        self.assertEqual(out.count("resumed from checkpoint"), 2)
+        self.assertEqual(out.count("started"), 1)
+        self.AssertSameOutput(complete, resumed, [("st.txt", False)])
+
+    def test_statistics_run_resumes_the_statistics(self):
+        complete, resumed, out = self.RunInterrupted("CheckpointUserStatistics", 1, ["-i", os.path.join(self.Folder, "mixed"), "-S", "st.txt"])
+        self.assertIn("User statistics resumed from checkpoint", out)
+        self.assertEqual(out.count("started"), 0)
+        self.AssertSameOutput(complete, resumed, [("st.txt", False)])
+
+    def test_in_memory_run_resumes_the_parsed_data(self):
+        args = ["-i", os.path.join(self.Folder, "mixed"), "-p", "yes", "-P", "mk.txt", "-n", "2", "-o", "od.csv"]
+        complete, resumed, out = self.RunInterrupted("CheckpointParsedData", 1, args)
+        self.assertIn("Parsed data resumed from checkpoint", out)
+        self.assertEqual(out.count("started"), 0)
+        self.AssertSameOutput(complete, resumed, [("mk.txt", True), ("od.csv", False)])
+
+    def test_streaming_runs_resume_the_completed_files(self):
+        for name, args in [("external", ["-i", os.path.join(self.Folder, "mixed"), "-m", "0.01", "-c", "100"]),
+                           ("pipeline", ["-i", os.path.join(self.Folder, "grouped"), "-c", "7"])]:
+            complete, resumed, out = self.RunInterrupted("CheckpointFile", 1, args + ["-p", "yes", "-P", "mk.txt", "-S", "st.txt"])
+            self.assertEqual(out.count("resumed from checkpoint"), 1, name)
+            self.AssertSameOutput(complete, resumed, [("mk.txt", True), ("st.txt", False)])
+            shutil.rmtree(complete)
+            shutil.rmtree(resumed)
+
+if __name__ == "__main__":
+    unittest.main()
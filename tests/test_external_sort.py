@@ -0,0 +1,78 @@
+#!/usr/bin/python
+import glob, os, tempfile, unittest
+import numpy as np
+from D4RExternalSort import ExternalSorter, SortRecords, RECORD_TYPE
+
+"""
+Random records with many calls of the same caller in the same minute, the location holds the input position
+length => Number of records
+"""
+def RandomRecords(length):
+    random  = np.random.default_rng(7)
+    records = np.zeros(length, dtype=RECORD_TYPE)
+    records['Caller']    = random.integers(0, 200, length)
+    records['Minute']    = random.integers(0, 30, length)
+    records['Location']  = np.arange(length)
+    records['IsRefugee'] = records['Caller'] % 2
+    return records
+
+class ExternalSorterTest(unittest.TestCase):
+    def setUp(self):
+        self.Folder  = tempfile.mkdtemp()
+        self.Records = RandomRecords(10000)
+        # calls of a caller within the same minute keep their input order
+        self.Expected = [tuple(record) for record in self.Records[np.lexsort((self.Records['Minute'], self.Records['Caller']))].tolist()]
+
+    def tearDown(self):
+        os.rmdir(self.Folder)
+
+    """
+    Sort the records with the given settings
+    Returns (merged records, number of runs left for the last merge)
+    memoryBudget   => Maximum number of bytes of the in memory buffer
+    mergeBlockSize => Maximum number of records read from each run at once
+    maxFanIn       => Maximum number of runs merged at once
+    """
+    def Sort(self, memoryBudget, mergeBlockSize, maxFanIn):
+        with ExternalSorter(memoryBudget, self.Folder, mergeBlockSize, maxFanIn) as sorter:
+            for begin in range(0, len(self.Records), 999):
+                sorter.AddRecords(self.Records[begin:begin + 999])
+            merged = list(sorter.Merge())
+            runs   = len(sorter.Runs)
+        self.assertEqual(glob.glob(os.path.join(self.Folder, "*")), [])
+        return merged, runs
+
+    def test_in_memory(self):
+        merged, runs = self.Sort(1024 * 1024, 100, 64)
+        self.assertEqual(runs, 0)
+        self.assertEqual(merged, self.Expected)
+
+    def test_single_pass(self):
+        merged, runs = self.Sort(RECORD_TYPE.itemsize * 1000, 37, 64)
+        self.assertEqual(runs, 10)
+        self.assertEqual(merged, self.Expected)
+
+    def test_several_passes(self):
+        for mergeBlockSize in [1, 13, 4096]:
+            merged, runs = self.Sort(RECORD_TYPE.itemsize * 300, mergeBlockSize, 3)
+            self.assertLessEqual(runs, 3)
+            self.assertEqual(merged, self.Expected)
+
+    def test_group_by_caller(self):
+        with ExternalSorter(RECORD_TYPE.itemsize * 700, self.Folder) as sorter:
+            sorter.AddRecords(self.Records)
+            groups = list(sorter.GroupByCaller())
+        self.assertEqual([group[0] for group in groups], sorted(set(self.Records['Caller'].tolist())))
+        for callerId, isRefugee, minutes, locations in groups:
+            records = self.Records[self.Records['Caller'] == callerId]
+            order   = np.argsort(records['Minute'], kind='stable')
+            self.assertEqual(isRefugee, bool(callerId % 2))
+            self.assertEqual(minutes.tolist(), records['Minute'][order].tolist())
+            self.assertEqual(locations.tolist(), records['Location'][order].tolist())
+
+    def test_sort_records_is_stable(self):
+        records = SortRecords(self.Records)
+        self.assertEqual([tuple(record) for record in records.tolist()], self.Expected)
+
+if __name__ == "__main__":
+    unittest.main()
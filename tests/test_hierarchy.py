@@ -0,0 +1,55 @@
+#!/usr/bin/python
+import unittest
+import numpy as np
+import D4RHierarchy
+from D4RHierarchy import RegionHierarchy, PROVINCE, REGION, UNKNOWN_GROUP
+from D4ROriginDestination import OriginDestinationMatrix, TransitionTensor, HOUR_OF_DAY
+from D4RAnomaly import ActivityTensor
+
+class RegionHierarchyTest(unittest.TestCase):
+    def setUp(self):
+        # districts 1 - 4 are in provinces 10 and 20 of region 100, district 5 is missing
+        self.Hierarchy = RegionHierarchy(np.array([4, 1, 2, 3]), np.array([20, 10, 10, 20]), np.array([100, 100, 100, 100]))
+        self.Rows = (np.array([0, 0, 0, 1, 1]), np.array([0, 0, 1, 0, 0], dtype=np.int8), np.array([1, 2, 1, 3, 5], dtype=np.int32),
+                     np.array([3, 4, 2, 1, 1], dtype=np.int32), np.array([2, 3, 4, 5, 6], dtype=np.int64))
+
+    def test_parents(self):
+        self.assertEqual(self.Hierarchy.GetParents(np.array([1, 2, 3, 4, 5, -7]), PROVINCE).tolist(), [10, 10, 20, 20, UNKNOWN_GROUP, UNKNOWN_GROUP])
+        self.assertEqual(self.Hierarchy.GetParents(np.array([3, 9]), REGION).tolist(), [100, UNKNOWN_GROUP])
+
+    def test_roll_up_matrix(self):
+        # both the dense and the sparse summation of the cells
+        limit = D4RHierarchy.DENSE_CELL_LIMIT
+        for denseLimit in [limit, 0]:
+            D4RHierarchy.DENSE_CELL_LIMIT = denseLimit
+            try:
+                matrix = OriginDestinationMatrix()
+                matrix.SetRows(*self.Rows)
+                result = self.Hierarchy.RollUpMatrix(matrix, PROVINCE)
+                self.assertEqual(type(result), OriginDestinationMatrix)
+                rows = list(zip(result.Slice.tolist(), result.IsRefugee.tolist(), result.Origin.tolist(), result.Destination.tolist(), result.Count.tolist()))
+                self.assertEqual(rows, [(0, 0, 10, 20, 5), (0, 1, 10, 10, 4), (1, 0, -1, 10, 6), (1, 0, 20, 10, 5)])
+                collapsed = self.Hierarchy.RollUpMatrix(matrix, PROVINCE, True)
+                self.assertEqual(collapsed.Count.tolist(), [5, 6, 5])
+            finally:
+                D4RHierarchy.DENSE_CELL_LIMIT = limit
+
+    def test_roll_up_tensor_keeps_type(self):
+        tensor = TransitionTensor(HOUR_OF_DAY)
+        tensor.SetRows(*self.Rows)
+        result = self.Hierarchy.RollUpMatrix(tensor, REGION)
+        self.assertEqual(type(result), TransitionTensor)
+        self.assertEqual(result.Period, HOUR_OF_DAY)
+        self.assertEqual(result.GetSlices().tolist(), [0, 1])
+        self.assertEqual(int(result.Count.sum()), 20)
+
+    def test_roll_up_activity(self):
+        tensor = ActivityTensor()
+        tensor.SetRows(np.array([3, 3, 3, 4]), np.array([1, 1, 1, 0], dtype=np.int8), np.array([1, 2, 3, 5]),
+                       np.array([7, 1, 2, 4]), np.array([2, 1, 1, 1]))
+        result = self.Hierarchy.RollUpActivity(tensor, PROVINCE)
+        rows = list(zip(result.Slice.tolist(), result.IsRefugee.tolist(), result.District.tolist(), result.Calls.tolist(), result.Users.tolist()))
+        self.assertEqual(rows, [(3, 1, 10, 8, 3), (3, 1, 20, 2, 1), (4, 0, -1, 4, 1)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+import unittest
+import numpy as np
+import D4RPipeline
+from D4RPipeline import GroupCallerChunks, ChunkRecords, ClosedCallers
+from D4RExternalSort import RECORD_TYPE
+
+"""
+Records of the given callers, one call per caller in the given order
+callers => List of caller ids
+"""
+def CallerRecords(callers):
+    records = np.zeros(len(callers), dtype=RECORD_TYPE)
+    records['Caller'] = callers
+    records['Minute'] = np.arange(len(callers))
+    return records
+
+class GroupCallerChunksTest(unittest.TestCase):
+    def test_groups_span_chunks(self):
+        records = CallerRecords([5, 5, 3, 3, 3, 9])
+        records['Minute'] = [7, 2, 4, 1, 1, 0]
+        for chunkSize in [1, 2, 4, 100]:
+            groups = list(GroupCallerChunks(ChunkRecords(records, chunkSize)))
+            self.assertEqual([group[0] for group in groups], [5, 3, 9])
+            self.assertEqual(groups[0][2].tolist(), [2, 7])
+            self.assertEqual(groups[1][2].tolist(), [1, 1, 4])
+
+    def test_repeated_caller_fails(self):
+        with self.assertRaises(ValueError):
+            list(GroupCallerChunks([CallerRecords([1, 2, 1])]))
+
+    def test_repeated_caller_without_check(self):
+        groups = list(GroupCallerChunks([CallerRecords([1, 2, 1])], False))
+        self.assertEqual([group[0] for group in groups], [1, 2, 1])
+
+    def test_repeated_caller_after_merge(self):
+        bufferSize = D4RPipeline.CLOSED_BUFFER_SIZE
+        D4RPipeline.CLOSED_BUFFER_SIZE = 7
+        try:
+            callers = np.random.default_rng(0).permutation(1000)
+            self.assertEqual(len(list(GroupCallerChunks([CallerRecords(callers)]))), 1000)
+            for repeated in [callers[0], callers[500]]:
+                with self.assertRaises(ValueError):
+                    list(GroupCallerChunks(ChunkRecords(CallerRecords(np.append(callers, repeated)), 64)))
+        finally:
+            D4RPipeline.CLOSED_BUFFER_SIZE = bufferSize
+
+class ClosedCallersTest(unittest.TestCase):
+    def test_contains(self):
+        closed = ClosedCallers()
+        for callerId in [10, 3, 7]:
+            self.assertFalse(closed.Contains(callerId))
+            closed.Add(callerId)
+        closed.Merge()
+        closed.Add(5)
+        self.assertEqual([closed.Contains(callerId) for callerId in [3, 4, 5, 7, 10, 11]], [True, False, True, True, True, False])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+import numpy as np
+from D4RWholeData3 import MainDataSetThreeScript
+
+# districts of the generated data sets
+NUMBER_OF_DISTRICTS = 12
+
+"""
+Write a distances file of all the districts
+fileName => Full path of the distances file
+"""
+def WriteDistances(fileName):
+    with open(fileName, "w") as f:
+        for source in range(1, NUMBER_OF_DISTRICTS + 1):
+            targets = [str(target) + ":" + str(10.0 * abs(target - source)) for target in range(1, NUMBER_OF_DISTRICTS + 1) if target != source]
+            f.write(str(source) + "," + ",".join(targets) + "\n")
+
+"""
+Split the lines into the files of a new folder
+folder        => Folder to be created
+lines         => List of the lines
+numberOfFiles => Number of files
+"""
+def WriteFiles(folder, lines, numberOfFiles):
+    os.mkdir(folder)
+    for index, part in enumerate(np.array_split(np.arange(len(lines)), numberOfFiles)):
+        with open(os.path.join(folder, "file" + str(index) + ".txt"), "w") as f:
+            f.writelines(lines[i] for i in part.tolist())
+
+"""
+Write the same calls as a data set three folder with the lines shuffled over all files and as one grouped by caller
+Some callers have several calls in the same minute
+folder          => Folder the "mixed" and "grouped" folders are created in
+numberOfCallers => Number of callers (every second one is a refugee)
+numberOfFiles   => Number of files of each folder
+"""
+def WriteDataSet(folder, numberOfCallers = 150, numberOfFiles = 3):
+    random = np.random.RandomState(11)
+    lines  = []
+    for caller in range(numberOfCallers):
+        prefix  = "1" if caller % 2 == 0 else "2"
+        minutes = random.randint(0, 364 * 24 * 60, size=random.randint(1, 40))
+        minutes = np.concatenate([minutes, minutes[:random.randint(0, 3)]])
+        for minute in minutes.tolist():
+            day, minute = divmod(minute, 24 * 60)
+            date = np.datetime64("2017-01-01") + np.timedelta64(day, "D")
+            year, month, dayOfMonth = str(date).split("-")
+            time = dayOfMonth + "-" + month + "-" + year + " " + "%02d:%02d" % divmod(minute, 60)
+            lines.append(prefix + str(1000 + caller) + "," + time + "," + str(random.randint(1, NUMBER_OF_DISTRICTS + 1)) + ",x\n")
+    mixed = [lines[i] for i in random.permutation(len(lines)).tolist()]
+    WriteFiles(os.path.join(folder, "mixed"), mixed, numberOfFiles)
+    # the grouped lines keep the order the mixed files are read in within a caller (calls of the same minute)
+    mixed = []
+    for fileName in MainDataSetThreeScript.ListInputFiles(os.path.join(folder, "mixed")):
+        with open(fileName) as f:
+            mixed.extend(f.readlines())
+    WriteFiles(os.path.join(folder, "grouped"), sorted(mixed, key=lambda line: line.split(",")[0]), numberOfFiles)
+
+"""
+Run the script with the given arguments in the folder
+Returns what the run printed
+folder => Folder the run writes its outputs and log to
+args   => List of command line arguments
+"""
+def RunScript(folder, args):
+    if not os.path.isdir(folder):
+        os.mkdir(folder)
+    out     = io.StringIO()
+    current = os.getcwd()
+    os.chdir(folder)
+    try:
+        with contextlib.redirect_stdout(out):
+            MainDataSetThreeScript.Run(args)
+    finally:
+        os.chdir(current)
+    return out.getvalue()
+
+"""
+Lines of a file, sorted if the order of the users does not matter
+fileName => Full path of the file
+"""
+def ReadLines(fileName, sort = False):
+    with open(fileName) as f:
+        lines = f.read().splitlines()
+    return sorted(lines) if sort else lines
+
+class RunModeTest(unittest.TestCase):
+    def setUp(self):
+        self.Folder    = tempfile.mkdtemp()
+        self.Distances = os.path.join(self.Folder, "distances.txt")
+        self.Mixed     = os.path.join(self.Folder, "mixed")
+        self.Grouped   = os.path.join(self.Folder, "grouped")
+        WriteDistances(self.Distances)
+        WriteDataSet(self.Folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.Folder)
+
+    """
+    Run a mode in its own output folder and return the folder
+    name => Name of the output folder
+    args => List of command line arguments besides the distances
+    """
+    def RunMode(self, name, args):
+        folder = os.path.join(self.Folder, name)
+        RunScript(folder, ["-d", self.Distances] + args)
+        return folder
+
+    def test_markov_output_is_the_same_in_all_modes(self):
+        markov   = ["-p", "yes", "-P", "mk.txt", "-n", "2"]
+        expected = ReadLines(os.path.join(self.RunMode("memory", ["-i", self.Mixed] + markov), "mk.txt"), True)
+        self.assertTrue(len(expected) > 0)
+        for name, args in [("external", ["-i", self.Mixed, "-m", "0.01", "-c", "100", "-S", "st.txt"]),
+                           ("pipeline", ["-i", self.Grouped, "-c", "7", "-S", "st.txt"]),
+                           ("workers", ["-i", self.Mixed, "-w", "2"])]:
+            folder = self.RunMode(name, args + markov)
+            self.assertEqual(ReadLines(os.path.join(folder, "mk.txt"), True), expected, name)
+
+    def test_statistics_are_the_same_in_all_modes(self):
+        expected = ReadLines(os.path.join(self.RunMode("statistics", ["-i", self.Mixed, "-S", "st.txt"]), "st.txt"))
+        self.assertTrue(len(expected) > 0)
+        for name, args in [("external", ["-i", self.Mixed, "-m", "0.01", "-c", "100", "-P", "mk.txt"]),
+                           ("pipeline", ["-i", self.Grouped, "-c", "7", "-P", "mk.txt"])]:
+            folder = self.RunMode(name, args + ["-S", "st.txt"])
+            self.assertEqual(ReadLines(os.path.join(folder, "st.txt")), expected, name)
+
+if __name__ == "__main__":
+    unittest.main()
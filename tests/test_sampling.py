@@ -0,0 +1,49 @@
+#!/usr/bin/python
+import unittest
+import numpy as np
+from D4RSampling import CallerSampler, HashCaller, HashArray, StandardError, StratifiedEstimate
+
+class CallerSamplerTest(unittest.TestCase):
+    def test_smaller_fraction_keeps_a_subset(self):
+        callers = range(20000)
+        kept    = {}
+        for fraction in [0.05, 0.2, 0.5, 1.0]:
+            sampler = CallerSampler(fraction, fraction / 2.0, seed = 3)
+            kept[fraction] = set((callerId, isRefugee) for callerId in callers for isRefugee in [False, True] if sampler.IsSampled(callerId, isRefugee))
+        for smaller, larger in [(0.05, 0.2), (0.2, 0.5), (0.5, 1.0)]:
+            self.assertTrue(kept[smaller] <= kept[larger])
+        self.assertEqual(sum(1 for callerId, isRefugee in kept[1.0] if not isRefugee), 20000)
+        # the share of every stratum is close to its fraction
+        self.assertAlmostEqual(sum(1 for callerId, isRefugee in kept[0.2] if not isRefugee) / 20000.0, 0.2, delta = 0.02)
+        self.assertAlmostEqual(sum(1 for callerId, isRefugee in kept[0.2] if isRefugee) / 20000.0, 0.1, delta = 0.02)
+
+    def test_decision_does_not_depend_on_order(self):
+        fields  = ["1" + str(callerId) for callerId in range(500)] + ["2" + str(callerId) for callerId in range(500)]
+        first   = CallerSampler(0.3, 0.6)
+        second  = CallerSampler(0.3, 0.6)
+        forward = dict((field, first.IsSampledField(field)) for field in fields + fields)
+        for field in reversed(fields):
+            self.assertEqual(second.IsSampledField(field), forward[field])
+        self.assertEqual(first.KeptLines + first.SkippedLines, 2000)
+
+    def test_invalid_fields_are_kept(self):
+        sampler = CallerSampler(0.0)
+        self.assertTrue(sampler.IsSampledField(""))
+        self.assertTrue(sampler.IsSampledField("1abc"))
+        self.assertFalse(sampler.IsSampledField("15"))
+
+    def test_hash_array_matches_hash_caller(self):
+        ids = np.array([0, 1, 2, 12345, 2 ** 40 + 7], dtype=np.int64)
+        self.assertEqual(HashArray(ids, 5).tolist(), [HashCaller(callerId, 5) for callerId in ids.tolist()])
+
+class EstimateTest(unittest.TestCase):
+    def test_full_sample_has_no_error(self):
+        self.assertEqual(StandardError(10, np.array([2.0]), 1.0).tolist(), [0.0])
+
+    def test_stratified_mean(self):
+        mean, std, error = StratifiedEstimate([(10, np.array([1.0]), np.array([0.0]), 0.5), (10, np.array([3.0]), np.array([0.0]), 0.25)])
+        # the second stratum is twice as large as the first one
+        self.assertAlmostEqual(float(mean[0]), (20 * 1.0 + 40 * 3.0) / 60.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python
+import unittest
+import numpy as np
+from D4RStatistics import QuantileSketch
+
+"""
+Exact lower quantile of every column of the values
+values   => Numpy array of the values (users x buckets)
+quantile => Requested quantile between 0 and 1
+"""
+def ExactQuantile(values, quantile):
+    rank = int(np.floor(quantile * (len(values) - 1)))
+    return np.sort(values, axis=0)[rank]
+
+"""
+Sketch of the rows of the values, one Add per user
+values => Numpy array of the values (users x buckets)
+"""
+def SketchRows(values, relativeAccuracy = 0.01, exactLimit = 128):
+    sketch = QuantileSketch(relativeAccuracy, exactLimit)
+    for row in values:
+        sketch.Add(row)
+    return sketch
+
+class QuantileSketchTest(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(7)
+        # heavy tailed counts with many zeros, like the calls of a user per day
+        self.Values = np.floor(random.lognormal(3.0, 2.0, size=(2000, 6)) * (random.rand(2000, 6) < 0.7))
+
+    def test_error_bound(self):
+        for relativeAccuracy in [0.01, 0.05]:
+            sketch = SketchRows(self.Values, relativeAccuracy)
+            for quantile in [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]:
+                exact    = ExactQuantile(self.Values, quantile)
+                reported = np.array(sketch.GetQuantile(quantile, 0, self.Values.shape[1] - 1))
+                small    = exact < sketch.ExactLimit
+                # rank exact below the limit, relative error of at most a above it
+                self.assertEqual(reported[small].tolist(), exact[small].tolist())
+                self.assertTrue(np.all(np.abs(reported[~small] - exact[~small]) <= relativeAccuracy * exact[~small] + 1e-9))
+
+    def test_merge_matches_single_sketch(self):
+        single = SketchRows(self.Values)
+        merged = SketchRows(self.Values[:700])
+        merged.Merge(SketchRows(self.Values[700:]))
+        self.assertEqual(merged.Count, single.Count)
+        self.assertEqual(merged.Bins.tolist(), single.Bins.tolist())
+
+    def test_state_round_trip(self):
+        sketch   = SketchRows(self.Values)
+        restored = QuantileSketch()
+        restored.SetState(sketch.GetState())
+        self.assertEqual(restored.GetQuantile(0.9, 0, 5), sketch.GetQuantile(0.9, 0, 5))
+
+    def test_buckets_outside_the_sketch(self):
+        sketch = QuantileSketch()
+        sketch.Add([0, 200, 3], [5, 6, 7])
+        sketch.Add([1], [6])
+        self.assertEqual(sketch.GetQuantile(1.0, 4, 8)[0], 0)
+        self.assertEqual(sketch.GetQuantile(1.0, 4, 8)[4], 0)
+        self.assertAlmostEqual(sketch.GetQuantile(1.0, 4, 8)[2], 200, delta = 200 * 0.01)
+        self.assertEqual(sketch.GetQuantile(0.0, 4, 8)[2], 1)
+
+if __name__ == "__main__":
+    unittest.main()